@@ -6,9 +6,10 @@ basis set information
 '''
 
 # Just import the basic user API
-from .api import (get_basis, lookup_basis_by_role, get_metadata, get_reference_data, get_all_basis_names,
-                  get_references, get_basis_family, filter_basis_sets, get_families, get_family_notes, get_basis_notes,
-                  get_schema, get_formats, get_reference_formats, get_roles)
+from .api import (get_basis, get_basis_many, get_basis_stream, get_basis_etag, lookup_basis_by_role,
+                  lookup_basis_by_elements, get_metadata, get_reference_data, get_all_basis_names, get_references,
+                  get_basis_family, filter_basis_sets, get_families, get_family_notes, get_basis_notes, get_schema,
+                  get_formats, get_reference_formats, get_roles)
 
 # Handle versioneer
 from ._version import get_versions
@@ -0,0 +1,140 @@
+'''
+Asynchronous versions of the main API functions, for use with asyncio
+
+These take the same arguments as the functions in :mod:`basis_set_exchange.api`, but
+are coroutines that can be awaited without blocking the event loop. Reading files,
+composing, and formatting basis sets is done in a pool of threads, which is shared
+by all event loops.
+
+At most `max_workers` calls are run at once. Other calls wait in a queue, and
+are removed from it if they are cancelled. A call that has already started can't
+be interrupted; if it is cancelled, it finishes in the background and its result
+is discarded. For large output, :func:`async_iter_basis` generates the text in chunks,
+and stops when it is cancelled (or when the caller stops iterating).
+'''
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import api
+
+# Maximum number of calls that are run at the same time
+# (the number of threads in the pool)
+max_workers = 4
+
+_executor = None
+_executor_workers = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    '''Obtain the pool of threads, creating it if needed (or if max_workers has changed)
+
+    A new pool is also created in a forked child process, since the threads
+    of the pool are not copied into it.
+    '''
+
+    global _executor, _executor_workers, _executor_pid
+
+    with _executor_lock:
+        if _executor_pid != os.getpid():
+            _executor = None
+        if _executor is None or _executor_workers != max_workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(max_workers, thread_name_prefix='bse-aio')
+            _executor_workers = max_workers
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def shutdown(wait=True):
+    '''Shut down the pool of threads
+
+    If wait is True, this waits for all calls that were submitted to the pool to finish.
+    A new pool is created by the next call.
+    '''
+
+    global _executor, _executor_workers
+
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+        _executor = None
+        _executor_workers = None
+
+
+async def _run(func, *args, **kwargs):
+    '''Run a function in the pool of threads'''
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def async_get_basis(name, *args, **kwargs):
+    '''Asynchronous version of :func:`basis_set_exchange.get_basis`'''
+
+    return await _run(api.get_basis, name, *args, **kwargs)
+
+
+async def async_get_basis_many(requests, *args, **kwargs):
+    '''Asynchronous version of :func:`basis_set_exchange.get_basis_many`'''
+
+    return await _run(api.get_basis_many, requests, *args, **kwargs)
+
+
+async def async_iter_basis(name, fmt, *args, **kwargs):
+    '''Obtain a basis set in a given format as an asynchronous iterator over chunks of text
+
+    This takes the same arguments as :func:`basis_set_exchange.get_basis_stream` (except `out`).
+    Each chunk is generated in the pool of threads when it is requested, so no more work is done
+    once the caller stops iterating.
+    '''
+
+    chunks = await _run(api.get_basis_stream, name, fmt, None, *args, **kwargs)
+
+    while True:
+        chunk = await _run(next, chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+async def async_get_basis_etag(name, *args, **kwargs):
+    '''Asynchronous version of :func:`basis_set_exchange.get_basis_etag`'''
+
+    return await _run(api.get_basis_etag, name, *args, **kwargs)
+
+
+async def async_get_references(basis_name, *args, **kwargs):
+    '''Asynchronous version of :func:`basis_set_exchange.get_references`'''
+
+    return await _run(api.get_references, basis_name, *args, **kwargs)
+
+
+async def async_get_basis_notes(name, *args, **kwargs):
+    '''Asynchronous version of :func:`basis_set_exchange.get_basis_notes`'''
+
+    return await _run(api.get_basis_notes, name, *args, **kwargs)
+
+
+async def async_get_family_notes(family, *args, **kwargs):
+    '''Asynchronous version of :func:`basis_set_exchange.get_family_notes`'''
+
+    return await _run(api.get_family_notes, family, *args, **kwargs)
+
+
+async def async_get_metadata(*args, **kwargs):
+    '''Asynchronous version of :func:`basis_set_exchange.get_metadata`'''
+
+    return await _run(api.get_metadata, *args, **kwargs)
+
+
+async def async_lookup_basis_by_role(primary_basis, role, *args, **kwargs):
+    '''Asynchronous version of :func:`basis_set_exchange.lookup_basis_by_role`'''
+
+    return await _run(api.lookup_basis_by_role, primary_basis, role, *args, **kwargs)
@@ -3,7 +3,10 @@ Main interface to Basis Set Exchange functionality
 '''
 
 import datetime
+import functools
+import hashlib
 import os
+import pickle
 import textwrap
 
 from collections import OrderedDict
@@ -12,7 +15,9 @@ from . import compose
 from . import converters
 from . import fileio
 from . import manip
+from . import mapped
 from . import memo
+from . import metaindex
 from . import notes
 from . import refconverters
 from . import references
@@ -29,39 +34,289 @@ _default_schema_dir = os.path.join(_my_dir, 'schema')
 _main_url = 'https://www.basissetexchange.org'
 
 
+def get_default_data_dir():
+    '''Obtain the path to the data directory that is part of this installation
+
+    This is the data directory used when `data_dir` is not given to the other functions.
+    '''
+
+    return _default_data_dir
+
+
+def _get_metadata_index(data_dir):
+    '''Get the read-only index of metadata for all basis sets
+
+    The index is only created once for each data directory
+    (see :mod:`basis_set_exchange.metaindex`)
+    '''
+
+    return metaindex.get_index(data_dir)
+
+
 def _get_basis_metadata(name, data_dir):
     '''Get metadata for a single basis set
 
+    The returned metadata is read-only, and is not a copy.
+
     If the basis doesn't exist, an exception is raised
     '''
 
-    # Transform the name into an internal representation
-    tr_name = misc.transform_basis_name(name)
+    return _get_metadata_index(data_dir).get_basis(name)
 
-    # Get the metadata for all basis sets
-    metadata = get_metadata(data_dir)
 
-    if not tr_name in metadata:
-        raise KeyError("Basis set {} does not exist".format(name))
+def _compose_table_basis(file_relpath, data_dir, elements, readonly):
+    '''Obtain a composed table basis from a data directory, bundle, or mapped library
 
-    return metadata[tr_name]
+    For mapped libraries, the data is decoded directly from the shared mapping
+    (and is not memoized). Otherwise, if readonly is True, the shared, read-only data
+    from the cache is returned (see :meth:`bse.memo.BSEMemoize.readonly`).
+    '''
 
+    if fileio.data_backend(data_dir) == 'mapped':
+        return mapped.get_library(data_dir).compose_table_basis(file_relpath, elements)
+    elif readonly:
+        return compose.compose_table_basis.readonly(file_relpath, data_dir, elements)
+    else:
+        return compose.compose_table_basis(file_relpath, data_dir, elements)
 
-def _header_string(basis_dict):
-    '''Creates a header with information about a basis set
 
-    Information includes description, revision, etc, but not references
+def _get_version_metadata(name, version, data_dir):
+    '''Get the metadata for a version of a basis set (the latest, if version is None)'''
+
+    bs_data = _get_basis_metadata(name, data_dir)
+
+    # If version is not specified, use the latest
+    if version is None:
+        version = bs_data['latest_version']
+    else:
+        version = str(version)  # Version may be an int
+
+    return bs_data['versions'][version]
+
+
+def _get_basis_file(name, elements, version, data_dir):
+    '''Find the table file for a version of a basis set, and check the requested elements
+
+    Returned is the path to the table file (relative to the data directory) and
+    the elements (as a sorted tuple of Z numbers as strings, or None for all elements)
     '''
 
-    dt = datetime.datetime.utcnow()
-    timestamp = dt.strftime('%Y-%m-%d %H:%M:%S UTC')
+    ver_data = _get_version_metadata(name, version, data_dir)
+    file_relpath = ver_data['file_relpath']
+
+    # Handle optional arguments
+    if elements is not None:
+        # Convert to purely a list of strings that represent integers
+        elements = misc.expand_elements(elements, True)
+
+        bs_elements = ver_data['elements']
+
+        # Are elements part of this basis set?
+        for el in elements:
+            if not el in bs_elements:
+                elsym = lut.element_sym_from_Z(el)
+                raise KeyError("Element {} (Z={}) not found in basis {}".format(elsym, el, name))
+
+        # Compose only the elements we want. Sorting them here allows
+        # for better reuse of memoized data
+        elements = tuple(sorted(set(elements), key=int))
+
+    return file_relpath, elements
+
+
+def _compose_table_references(file_relpath, data_dir, elements):
+    '''Obtain the references for each element of a table basis from a data directory, bundle, or mapped library'''
+
+    if fileio.data_backend(data_dir) == 'mapped':
+        return mapped.get_library(data_dir).compose_table_references(file_relpath, elements)
+    else:
+        return compose.compose_table_references(file_relpath, data_dir, elements)
+
+
+@memo.BSEMemoize
+def _compact_table_references(file_relpath, data_dir, elements):
+    '''Obtain the compacted references of a table basis (see :func:`bse.references.compact_references`)'''
+
+    # Only the references are needed, not the shell data
+    basis_dict = _compose_table_references(file_relpath, data_dir, elements)
+    all_ref_data = get_reference_data(data_dir)
+    return references.compact_references(basis_dict, all_ref_data)
+
+
+def _get_transforms(uncontract_general, uncontract_spdf, uncontract_segmented, make_general, optimize_general):
+    '''Obtain the list of transformations (see :func:`bse.manip.transform_basis`) for the options of get_basis'''
+
+    transforms = []
+    if optimize_general:
+        transforms.append('optimize_general')
+    if uncontract_general:
+        transforms.append('uncontract_general')
+    if uncontract_spdf:
+        transforms.append('uncontract_spdf')
+    if uncontract_segmented:
+        transforms.append('uncontract_segmented')
+    if make_general:
+        transforms.append('make_general')
+    return transforms
+
+
+def _transform_table_basis(file_relpath, data_dir, elements, transforms, executor):
+    '''Compose a table basis and apply transformations to it, returning new data'''
+
+    basis_dict = _compose_table_basis(file_relpath, data_dir, elements, True)
+    return manip.transform_basis(basis_dict, transforms, executor=executor)
+
+
+@memo.BSEMemoize
+def _transformed_table_basis(file_relpath, data_dir, elements, transforms):
+    '''Obtain a composed table basis with transformations applied (see :func:`_get_transformed_basis`)'''
+
+    return _transform_table_basis(file_relpath, data_dir, elements, transforms, None)
+
+
+def _get_transformed_basis(file_relpath, data_dir, elements, transforms, readonly, executor):
+    '''Compose a table basis and apply transformations to it
+
+    Transformed basis sets are memoized (except for mapped libraries). If readonly is True,
+    the shared, read-only data from the cache is returned.
+    '''
+
+    if transforms and fileio.data_backend(data_dir) != 'mapped':
+        args = (file_relpath, data_dir, elements, tuple(transforms))
+        func = functools.partial(_transform_table_basis, *args, executor)
+        if readonly:
+            return _transformed_table_basis.readonly_with(func, *args)
+        return _transformed_table_basis.call_with(func, *args)
+
+    basis_dict = _compose_table_basis(file_relpath, data_dir, elements, readonly)
+
+    # If the data isn't shared, it can be modified directly
+    if transforms:
+        basis_dict = manip.transform_basis(basis_dict, transforms, inplace=not readonly, executor=executor)
+    return basis_dict
+
+
+def _element_harmonic(element_data):
+    '''Obtain the harmonic types of the shells of an element (None if it has no electron shells)'''
+
+    if not 'element_electron_shells' in element_data:
+        return None
+    return tuple(sorted(set(sh['shell_harmonic_type'] for sh in element_data['element_electron_shells'])))
+
+
+def _whole_basis_harmonic(element_harmonics):
+    '''Combine the harmonic types of each element (see :func:`bse.compose._whole_basis_harmonic`)'''
+
+    all_harm = set()
+    for harm in element_harmonics:
+        if harm is None:
+            return 'none'
+        all_harm.update(harm)
+
+    if len(all_harm) == 0:
+        return 'none'
+    elif len(all_harm) > 1:
+        return 'mixed'
+    else:
+        return all_harm.pop()
+
+
+def _convert_elements(file_relpath, data_dir, elements, transforms, fmt, executor, source=None):
+    '''Compose, transform, and convert the given elements of a table basis
+
+    If source is given, it is a tuple of the harmonic types of the elements of the
+    composed basis (see :func:`_element_harmonic`), and a function that returns the
+    table basis with the transforms and the manipulations needed by the format already
+    applied (containing at least the given elements, see :func:`bse.converters.get_format_transforms`).
+    The elements are then not composed or transformed again.
+
+    Returned is a dictionary of element to the harmonic type(s) of its shells
+    and its blocks of formatted text (see :func:`_convert_element`)
+    '''
+
+    if source is None:
+        basis_dict = _compose_table_basis(file_relpath, data_dir, elements, True)
+
+        # The harmonic type of the basis is that of the composed (not transformed) data
+        harmonics = {k: _element_harmonic(v) for k, v in basis_dict['basis_set_elements'].items()}
+        blocks = converters.convert_element_blocks(basis_dict, fmt, executor, transforms)
+    else:
+        all_harmonics, get_prepared = source
+        harmonics = {k: all_harmonics[k] for k in elements}
+
+        prepared = get_prepared()
+        basis_dict = dict(prepared)
+        basis_dict['basis_set_elements'] = {k: prepared['basis_set_elements'][k] for k in elements}
+        blocks = converters.convert_element_blocks(basis_dict, fmt, executor, format_transforms=False)
+
+    return {k: (v, ) + blocks[k] for k, v in harmonics.items()}
+
+
+# Conversions of elements in progress (see _get_converted_elements)
+_convert_flights = memo.SingleFlight()
+
+
+@memo.BSEMemoize
+def _convert_element(file_relpath, data_dir, transforms, fmt, element):
+    '''Obtain a single element of a table basis, converted to the given format
+
+    Returned is a tuple of the harmonic type(s) of the element's shells
+    (None if it has no electron shells) and its electron basis and ECP blocks
+    (see :func:`bse.converters.convert_element_blocks`).
+
+    Normally, several elements are converted at once, and stored
+    in the cache of this function by :func:`_get_converted_elements`.
+    '''
+
+    return _convert_elements(file_relpath, data_dir, (element, ), transforms, fmt, None)[element]
+
+
+def _get_converted_elements(file_relpath, data_dir, elements, transforms, fmt, executor, source=None):
+    '''Obtain several elements of a table basis, converted to the given format
+
+    The results for each element are cached separately (see :func:`_convert_element`), so
+    any subset of elements can be obtained from the cache. Only the elements not in the cache
+    are composed (or taken from source, see :func:`_convert_elements`) and converted.
+    If other threads request the same missing elements at the same time, they are only converted once.
+
+    Returned is a list of the results for each element, in order
+    '''
+
+    converted = {el: _convert_element.lookup(file_relpath, data_dir, transforms, fmt, el) for el in elements}
+    missing = tuple(el for el, v in converted.items() if v is None)
+
+    if missing:
+
+        def _convert_missing():
+            new_converted = _convert_elements(file_relpath, data_dir, missing, transforms, fmt, executor, source)
+            for el, v in new_converted.items():
+                _convert_element.store(v, file_relpath, data_dir, transforms, fmt, el)
+            return new_converted
+
+        key = (file_relpath, data_dir, missing, transforms, fmt)
+        converted.update(_convert_flights.do(key, _convert_missing))
+
+    return [converted[el] for el in elements]
+
+
+def _header_string(basis_dict, deterministic=False):
+    '''Creates a header with information about a basis set
+
+    Information includes description, revision, etc, but not references.
+    If deterministic is True, the access time is not included.
+    '''
 
     tw = textwrap.TextWrapper(initial_indent='', subsequent_indent=' ' * 20)
 
     header = '-' * 70 + '\n'
     header += ' Basis Set Exchange\n'
     header += ' ' + _main_url + '\n'
-    header += ' Accessed ' + timestamp + '\n'
+
+    if not deterministic:
+        dt = datetime.datetime.utcnow()
+        timestamp = dt.strftime('%Y-%m-%d %H:%M:%S UTC')
+        header += ' Accessed ' + timestamp + '\n'
+
     header += '-' * 70 + '\n'
     header += '   Basis set: ' + basis_dict['basis_set_name'] + '\n'
     header += tw.fill(' Description: ' + basis_dict['basis_set_description']) + '\n'
@@ -83,7 +338,10 @@ def get_basis(name,
               make_general=False,
               optimize_general=False,
               data_dir=None,
-              header=True):
+              header=True,
+              readonly=False,
+              executor=None,
+              deterministic=False):
     '''Obtain a basis set
 
     This is the main function for getting basis set information.
@@ -139,7 +397,23 @@ def get_basis(name,
         functions (see :func:`bse.manip.optimize_general`)
     data_dir : str
         Data directory with all the basis set information. By default,
-        it is in the 'data' subdirectory of this project.
+        it is in the 'data' subdirectory of this project. This may also be the path
+        to a bundle file (see :mod:`bse.bundle`) or a mapped library (see :mod:`bse.mapped`).
+    header : bool
+        If True, a header with information about the basis set is added
+        to the output. Only used if `fmt` is given.
+    readonly : bool
+        If True, and `fmt` is **None**, a read-only (frozen) dictionary is returned
+        (see :func:`bse.misc.freeze`). This is shared with the internal cache, and
+        so is not copied each time this function is called.
+    executor : concurrent.futures.Executor
+        If given, manipulations and conversion to `fmt` are done for each
+        element in parallel, using this executor (a thread or process pool).
+        This is only worthwhile for basis sets with many elements.
+    deterministic : bool
+        If True, the header does not contain the time the basis set was accessed.
+        The output is then the same each time for the same arguments (and data), and
+        can be identified by :func:`get_basis_etag`.
 
     Returns
     -------
@@ -149,56 +423,338 @@ def get_basis(name,
     '''
 
     data_dir = _default_data_dir if data_dir is None else data_dir
-    bs_data = _get_basis_metadata(name, data_dir)
+    file_relpath, elements = _get_basis_file(name, elements, version, data_dir)
 
-    # If version is not specified, use the latest
-    if version is None:
-        version = bs_data['latest_version']
-    else:
-        version = str(version)  # Version may be an int
+    transforms = _get_transforms(uncontract_general, uncontract_spdf, uncontract_segmented, make_general,
+                                 optimize_general)
 
-    # Compose the entire basis set (all elements)
-    file_relpath = bs_data['versions'][version]['file_relpath']
-    basis_dict = compose.compose_table_basis(file_relpath, data_dir)
+    # If possible, assemble the output from the separately-cached elements
+    if fmt is not None and converters.has_element_blocks(fmt):
+        # The format is part of the cache key, so each format is only cached once
+        fmt = fmt.lower()
 
-    # Handle optional arguments
-    if elements is not None:
-        # Convert to purely a list of strings that represent integers
-        elements = misc.expand_elements(elements, True)
+        if elements is None:
+            elements = tuple(_get_version_metadata(name, version, data_dir)['elements'])
 
-        bs_elements = basis_dict['basis_set_elements']
+        converted = _get_converted_elements(file_relpath, data_dir, elements, tuple(transforms), fmt, executor)
+        harmonic_type = _whole_basis_harmonic(x[0] for x in converted)
 
-        # Are elements part of this basis set?
-        for el in elements:
-            if not el in bs_elements:
-                elsym = lut.element_sym_from_Z(el)
-                raise KeyError("Element {} (Z={}) not found in basis {}".format(elsym, el, name))
+        header_str = None
+        if header:
+            # Only the table-level data is needed for the header
+            header_str = _header_string(_compose_table_basis(file_relpath, data_dir, (), True), deterministic)
 
-            # Set to only the elements we want
-            basis_dict['basis_set_elements'] = {k: v for k, v in bs_elements.items() if k in elements}
+        return converters.assemble_basis([x[1:] for x in converted], fmt, harmonic_type, header_str)
 
-    if optimize_general:
-        basis_dict = manip.optimize_general(basis_dict)
-    if uncontract_general:
-        basis_dict = manip.uncontract_general(basis_dict)
-    if uncontract_spdf:
-        basis_dict = manip.uncontract_spdf(basis_dict)
-    if uncontract_segmented:
-        basis_dict = manip.uncontract_segmented(basis_dict)
-    if make_general:
-        basis_dict = manip.make_general(basis_dict)
+    # Converters do not modify the basis set, so the shared read-only
+    # data can be used when converting to a string
+    use_readonly = readonly or fmt is not None
+    basis_dict = _get_transformed_basis(file_relpath, data_dir, elements, transforms, use_readonly, executor)
 
     # If fmt is not specified, return as a python dict
     if fmt is None:
+        if readonly:
+            # Data from mapped libraries is not frozen
+            return misc.freeze(basis_dict)
         return basis_dict
 
     # make converters case insensitive
     if header:
-        header_str = _header_string(basis_dict)
+        header_str = _header_string(basis_dict, deterministic)
     else:
         header_str = None
 
-    return converters.convert_basis(basis_dict, fmt, header_str)
+    return converters.convert_basis(basis_dict, fmt, header_str, executor)
+
+
+def _basis_request(name,
+                   elements=None,
+                   version=None,
+                   fmt=None,
+                   uncontract_general=False,
+                   uncontract_spdf=False,
+                   uncontract_segmented=False,
+                   make_general=False,
+                   optimize_general=False,
+                   data_dir=None,
+                   header=True,
+                   readonly=False,
+                   deterministic=False):
+    '''Check and normalize one request of :func:`get_basis_many` (the arguments are those of :func:`get_basis`)
+
+    Returned is the data directory and table file of the basis set, and a tuple of
+    the elements (None for all), transforms, format, header, readonly, and deterministic options.
+    '''
+
+    data_dir = _default_data_dir if data_dir is None else data_dir
+    file_relpath, elements = _get_basis_file(name, elements, version, data_dir)
+
+    transforms = _get_transforms(uncontract_general, uncontract_spdf, uncontract_segmented, make_general,
+                                 optimize_general)
+
+    # Checks that the format exists
+    if fmt is not None:
+        converters.has_element_blocks(fmt)
+        fmt = fmt.lower()
+
+    return data_dir, file_relpath, (elements, tuple(transforms), fmt, header, readonly, deterministic)
+
+
+def _get_basis_group(file_relpath, data_dir, elements, requests, copy_readonly):
+    '''Obtain the results of all the requests of :func:`get_basis_many` for a single table basis
+
+    The table basis is composed once for all the elements needed by any request (elements,
+    or None for all). Transformations and conversions to each format are done once for all
+    requests with the same options, and the result of each request is taken from these.
+
+    requests is a list of tuples from :func:`_basis_request`. If copy_readonly is True, readonly
+    requests are returned as regular (copied) dictionaries, so they can be returned from another process.
+
+    Returned is a list of the results of the requests, in order
+    '''
+
+    composed = _compose_table_basis(file_relpath, data_dir, elements, True)
+    all_elements = tuple(composed['basis_set_elements'])
+    harmonics = {k: _element_harmonic(v) for k, v in composed['basis_set_elements'].items()}
+
+    # Transformed basis sets, either read-only (shared with the cache) or a
+    # regular dictionary that is copied for each request
+    transformed = {}
+
+    def _get_transformed(transforms, readonly):
+        if (transforms, readonly) not in transformed:
+            transformed[(transforms, readonly)] = _get_transformed_basis(file_relpath, data_dir, elements, transforms,
+                                                                         readonly, None)
+        return transformed[(transforms, readonly)]
+
+    # Transformed basis sets with the manipulations needed by formats also applied.
+    # These are shared by formats that need the same manipulations.
+    prepared = {}
+
+    def _get_prepared(transforms, fmt):
+        fmt_transforms = tuple(converters.get_format_transforms(fmt))
+        if (transforms, fmt_transforms) not in prepared:
+            prepared[(transforms, fmt_transforms)] = manip.transform_basis(_get_transformed(transforms, True),
+                                                                           fmt_transforms)
+        return prepared[(transforms, fmt_transforms)]
+
+    # Convert all elements needed for each (transforms, format) at once.
+    # Elements that are not cached are converted from the shared manipulated basis.
+    needed = {}
+    for req_elements, transforms, fmt, _, _, _ in requests:
+        if fmt is not None and converters.has_element_blocks(fmt):
+            needed.setdefault((transforms, fmt), set()).update(all_elements if req_elements is None else req_elements)
+
+    converted = {}
+    for (transforms, fmt), els in needed.items():
+        els = tuple(k for k in all_elements if k in els)
+        source = (harmonics, functools.partial(_get_prepared, transforms, fmt))
+        blocks = _get_converted_elements(file_relpath, data_dir, els, transforms, fmt, None, source)
+        converted[(transforms, fmt)] = dict(zip(els, blocks))
+
+    results = []
+    for req_elements, transforms, fmt, header, readonly, deterministic in requests:
+        if req_elements is None:
+            req_elements = all_elements
+
+        # Assemble from the converted elements
+        if (transforms, fmt) in converted:
+            blocks = [converted[(transforms, fmt)][k] for k in req_elements]
+            harmonic_type = _whole_basis_harmonic(x[0] for x in blocks)
+            header_str = _header_string(composed, deterministic) if header else None
+            results.append(converters.assemble_basis([x[1:] for x in blocks], fmt, harmonic_type, header_str))
+            continue
+
+        # Otherwise, take the requested elements from the transformed basis
+        use_readonly = fmt is not None or (readonly and not copy_readonly)
+        basis_dict = _get_transformed(transforms, use_readonly)
+        if req_elements != all_elements:
+            basis_dict = dict(basis_dict)
+            basis_dict['basis_set_elements'] = {
+                k: v
+                for k, v in basis_dict['basis_set_elements'].items() if k in req_elements
+            }
+            basis_dict['basis_set_harmonic_type'] = _whole_basis_harmonic(harmonics[k] for k in req_elements)
+
+        if fmt is not None:
+            header_str = _header_string(basis_dict, deterministic) if header else None
+            results.append(converters.convert_basis(basis_dict, fmt, header_str))
+        elif use_readonly:
+            results.append(misc.freeze(basis_dict))
+        else:
+            # Copying via pickle is much faster than copying element by element
+            results.append(pickle.loads(pickle.dumps(basis_dict, pickle.HIGHEST_PROTOCOL)))
+
+    return results
+
+
+def get_basis_many(requests, data_dir=None, executor=None):
+    '''Obtain many basis sets at once
+
+    The results are the same as calling :func:`get_basis` for each request, but work is
+    shared between requests. Each table basis (version of a basis set) is composed once,
+    and requests that differ only in their elements or format share the same manipulated data.
+
+    Parameters
+    ----------
+    requests : list
+        The basis sets to obtain. Each request is either the name of a basis set,
+        or a dictionary of arguments to :func:`get_basis` (which must include 'name').
+        All arguments of :func:`get_basis` except `executor` may be given.
+    data_dir : str
+        Data directory used for requests that do not give their own `data_dir`
+        (see :func:`get_basis`)
+    executor : concurrent.futures.Executor
+        If given, requests for different table basis sets are processed in parallel
+        using this executor (a thread or process pool).
+
+    Returns
+    -------
+    list
+        The result of each request (see :func:`get_basis`), in the same order as the requests
+    '''
+
+    # Check all the requests and group them by table basis
+    groups = OrderedDict()
+    for i, req in enumerate(requests):
+        if isinstance(req, str):
+            req = {'name': req}
+        req = dict(req)
+        req.setdefault('data_dir', data_dir)
+
+        req_data_dir, file_relpath, req_opts = _basis_request(**req)
+        groups.setdefault((file_relpath, req_data_dir), []).append((i, req_opts))
+
+    args = []
+    for (file_relpath, req_data_dir), group in groups.items():
+        all_elements = [x[1][0] for x in group]
+        if any(x is None for x in all_elements):
+            elements = None
+        else:
+            elements = tuple(sorted(set().union(*all_elements), key=int))
+        args.append((file_relpath, req_data_dir, elements, [x[1] for x in group], executor is not None))
+
+    if executor is None:
+        group_results = [_get_basis_group(*x) for x in args]
+    else:
+        group_results = list(executor.map(_get_basis_group, *zip(*args))) if args else []
+
+    results = [None] * len(requests)
+    for group, group_result in zip(groups.values(), group_results):
+        for (i, req_opts), result in zip(group, group_result):
+            # Read-only results were copied so that they could be returned from the executor
+            if executor is not None and req_opts[2] is None and req_opts[4]:
+                result = misc.freeze(result)
+            results[i] = result
+
+    return results
+
+
+def get_basis_stream(name,
+                     fmt,
+                     out=None,
+                     elements=None,
+                     version=None,
+                     uncontract_general=False,
+                     uncontract_spdf=False,
+                     uncontract_segmented=False,
+                     make_general=False,
+                     optimize_general=False,
+                     data_dir=None,
+                     header=True,
+                     executor=None,
+                     deterministic=False):
+    '''Obtain a basis set in a given format, without creating the whole string at once
+
+    The text is generated in chunks (roughly one per element), which are written
+    to the file-like object `out` as soon as they are generated. This can be a file,
+    socket, or compressor opened in text mode. If `out` is None, an iterator over
+    the chunks is returned instead.
+
+    The basis set is composed first, but each element is only transformed (uncontracted,
+    etc.) just before it is converted. If an executor is given, or the format
+    can't be converted per element (json), the whole basis set is transformed first.
+
+    The output is the same as from :func:`get_basis`, which describes
+    the other parameters. Here, `fmt` is required.
+
+    Returns
+    -------
+    iterator or None
+        If `out` is None, an iterator over chunks of text (str). Otherwise,
+        nothing is returned.
+    '''
+
+    data_dir = _default_data_dir if data_dir is None else data_dir
+    file_relpath, elements = _get_basis_file(name, elements, version, data_dir)
+
+    transforms = _get_transforms(uncontract_general, uncontract_spdf, uncontract_segmented, make_general,
+                                 optimize_general)
+    basis_dict = _compose_table_basis(file_relpath, data_dir, elements, True)
+
+    header_str = _header_string(basis_dict, deterministic) if header else None
+
+    if out is None:
+        return converters.iter_basis(basis_dict, fmt, header_str, executor, transforms)
+    converters.write_basis(basis_dict, fmt, out, header_str, executor, transforms)
+
+
+def get_basis_etag(name,
+                   elements=None,
+                   version=None,
+                   fmt=None,
+                   uncontract_general=False,
+                   uncontract_spdf=False,
+                   uncontract_segmented=False,
+                   make_general=False,
+                   optimize_general=False,
+                   data_dir=None,
+                   header=True):
+    '''Obtain a stable hash (ETag) that identifies the output of get_basis
+
+    The hash is of the (normalized) arguments, the version of this library, and the contents of
+    all the data files the basis set is composed from. It changes if any of these change, and is the
+    same for identical output (on any machine). The basis set is not composed or converted, so this is
+    much faster than :func:`get_basis`. This can be used for answering conditional (HTTP) requests.
+
+    The parameters are the same as for :func:`get_basis`. The output that is identified is that with
+    a deterministic header (ie, `deterministic=True` for :func:`get_basis`).
+
+    Returns
+    -------
+    str
+        The hash, as a string of hexadecimal digits
+    '''
+
+    # Imported here, since this module is imported before the version is determined
+    from . import __version__
+
+    data_dir = _default_data_dir if data_dir is None else data_dir
+    file_relpath, elements = _get_basis_file(name, elements, version, data_dir)
+
+    transforms = _get_transforms(uncontract_general, uncontract_spdf, uncontract_segmented, make_general,
+                                 optimize_general)
+
+    if fmt is not None:
+        fmt = fmt.lower()
+        if fmt not in converters.get_formats():
+            raise RuntimeError('Unknown basis set format "{}"'.format(fmt))
+
+    # The header is only used for some formats
+    header = bool(header) and fmt not in (None, 'json')
+
+    h = hashlib.sha256()
+    h.update(repr((__version__, file_relpath, elements, transforms, fmt, header)).encode('utf-8'))
+
+    # Bundles and mapped libraries are a single file containing all the data
+    if os.path.isfile(data_dir):
+        h.update(fileio.file_digest(data_dir).encode('utf-8'))
+    else:
+        for relpath in compose.table_basis_files(file_relpath, data_dir, elements):
+            digest = fileio.file_digest(os.path.join(data_dir, relpath))
+            h.update('{} {}\n'.format(relpath, digest).encode('utf-8'))
+
+    return h.hexdigest()
 
 
 def lookup_basis_by_role(primary_basis, role, data_dir=None):
@@ -259,8 +815,7 @@ def get_metadata(data_dir=None):
     '''
 
     data_dir = _default_data_dir if data_dir is None else data_dir
-    metadata_file = os.path.join(data_dir, "METADATA.json")
-    return fileio.read_metadata(metadata_file)
+    return fileio.read_data_metadata(data_dir)
 
 
 @memo.BSEMemoize
@@ -274,9 +829,7 @@ def get_reference_data(data_dir=None):
     '''
 
     data_dir = _default_data_dir if data_dir is None else data_dir
-    reffile_path = os.path.join(data_dir, 'REFERENCES.json')
-
-    return fileio.read_references(reffile_path)
+    return fileio.read_data_references(data_dir)
 
 
 def get_all_basis_names(data_dir=None):
@@ -293,7 +846,8 @@ def get_all_basis_names(data_dir=None):
         it is in the 'data' subdirectory of this project.
     '''
 
-    return sorted(list(get_metadata(data_dir).keys()))
+    data_dir = _default_data_dir if data_dir is None else data_dir
+    return sorted(_get_metadata_index(data_dir).keys())
 
 
 def get_references(basis_name, elements=None, version=None, fmt=None, data_dir=None):
@@ -333,10 +887,9 @@ def get_references(basis_name, elements=None, version=None, fmt=None, data_dir=N
     '''
 
     data_dir = _default_data_dir if data_dir is None else data_dir
-    basis_dict = get_basis(basis_name, elements=elements, version=version, data_dir=data_dir)
 
-    all_ref_data = get_reference_data(data_dir)
-    ref_data = references.compact_references(basis_dict, all_ref_data)
+    file_relpath, elements = _get_basis_file(basis_name, elements, version, data_dir)
+    ref_data = _compact_table_references(file_relpath, data_dir, elements)
 
     if fmt is None:
         return ref_data
@@ -356,16 +909,10 @@ def get_basis_family(basis_name, data_dir=None):
 def get_families(data_dir=None):
     '''Return a list of all basis set families'''
     data_dir = _default_data_dir if data_dir is None else data_dir
-    metadata = get_metadata(data_dir)
-
-    families = set()
-    for v in metadata.values():
-        families.add(v['family'])
+    return list(_get_metadata_index(data_dir).families)
 
-    return sorted(list(families))
 
-
-def filter_basis_sets(substr=None, family=None, role=None, data_dir=None):
+def filter_basis_sets(substr=None, family=None, role=None, data_dir=None, function_types=None, elements=None):
     '''Filter basis sets by some criteria
 
     All parameters are ANDed together and are not case sensitive.
@@ -381,6 +928,12 @@ def filter_basis_sets(substr=None, family=None, role=None, data_dir=None):
     data_dir : str
         Data directory with all the basis set information. By default,
         it is in the 'data' subdirectory of this project.
+    function_types : str or list
+        Function types (ie, 'gto', 'ecp') that the basis set must contain.
+        If a list is given, the basis set must contain all of them.
+    elements : str or list
+        Elements that the (latest version of the) basis set must contain. This
+        is expanded as in :func:`bse.misc.expand_elements`.
 
     Returns
     -------
@@ -388,25 +941,89 @@ def filter_basis_sets(substr=None, family=None, role=None, data_dir=None):
     '''
 
     data_dir = _default_data_dir if data_dir is None else data_dir
-    metadata = get_metadata(data_dir)
+    md_index = _get_metadata_index(data_dir)
 
     # family and role are required to be lowercase (via schema and validation functions)
 
     if family:
         family = family.lower()
-        if not family in get_families():
+        if not family in md_index.families:
             raise RuntimeError("Family '{}' is not a valid family".format(family))
-        metadata = {k: v for k, v in metadata.items() if v['family'] == family}
     if role:
         role = role.lower()
         if not role in get_roles():
             raise RuntimeError("Role '{}' is not a valid role".format(role))
-        metadata = {k: v for k, v in metadata.items() if v['role'] == role}
+    if function_types:
+        if isinstance(function_types, str):
+            function_types = [function_types]
+        function_types = [x.lower() for x in function_types]
+        for ft in function_types:
+            if not ft in md_index.function_types:
+                raise RuntimeError("Function type '{}' is not a valid function type".format(ft))
+    if elements:
+        elements = misc.expand_elements(elements, True)
     if substr:
         substr = substr.lower()
-        metadata = {k: v for k, v in metadata.items() if substr in k or substr in v['display_name']}
 
-    return metadata
+    names = md_index.filter(substr, family, role, function_types, elements)
+
+    # Only the matching metadata is copied into regular (mutable) dictionaries
+    return {k: misc.thaw(md_index[k]) for k in names}
+
+
+def lookup_basis_by_elements(elements, family=None, role=None, missing=False, data_dir=None, version=None):
+    '''Find basis sets that contain all of the given elements
+
+    The latest version of each basis set is checked, unless a version is given. This uses
+    precomputed bitsets of the elements in each version of each basis set, and so is fast
+    enough to be used for screening many molecules.
+
+    Parameters
+    ----------
+    elements : str or list
+        Elements that the basis set must contain. This is expanded
+        as in :func:`bse.misc.expand_elements`.
+    family : str
+        Only check basis sets of this family
+    role : str
+        Only check basis sets with this role
+    missing : bool
+        If True, return the missing elements for all basis sets that were checked,
+        rather than just the names of the basis sets that contain all the elements
+    data_dir : str
+        Data directory with all the basis set information. By default,
+        it is in the 'data' subdirectory of this project.
+    version : str or int
+        Check this version of each basis set rather than the latest. Basis sets
+        that do not have this version are not checked.
+
+    Returns
+    -------
+    list or dict
+        If `missing` is False, a list of the names of basis sets that contain all the elements.
+        Otherwise, a dictionary mapping basis set names to a list of elements (Z numbers as strings)
+        that are missing from that basis set (which is empty if the basis set contains all the elements).
+    '''
+
+    data_dir = _default_data_dir if data_dir is None else data_dir
+    md_index = _get_metadata_index(data_dir)
+
+    if family:
+        family = family.lower()
+        if not family in md_index.families:
+            raise RuntimeError("Family '{}' is not a valid family".format(family))
+    if role:
+        role = role.lower()
+        if not role in get_roles():
+            raise RuntimeError("Role '{}' is not a valid role".format(role))
+
+    elements = misc.expand_elements(elements)
+    missing_bits = md_index.missing_elements(elements, family, role, version)
+
+    if missing:
+        return {k: metaindex.bitset_elements(v) for k, v in missing_bits.items()}
+    else:
+        return [k for k, v in missing_bits.items() if v == 0]
 
 
 @memo.BSEMemoize
@@ -416,15 +1033,14 @@ def get_family_notes(family, data_dir=None):
     If the notes are not found, a string saying so is returned
     '''
 
+    data_dir = _default_data_dir if data_dir is None else data_dir
+
     family = family.lower()
-    if not family in get_families():
+    if not family in get_families(data_dir):
         raise RuntimeError("Family '{}' does not exist".format(family))
 
-    data_dir = _default_data_dir if data_dir is None else data_dir
     file_name = 'NOTES.' + family.lower()
-    file_path = os.path.join(data_dir, file_name)
-
-    notes_str = fileio.read_notes_file(file_path)
+    notes_str = fileio.read_data_notes(data_dir, file_name)
     if notes_str is None:
         notes_str = "Notes are not available for the {} family".format(family)
 
@@ -449,9 +1065,7 @@ def get_basis_notes(name, data_dir=None):
     filebase = os.path.splitext(rel_path)[0]  # remove .json
     filebase = os.path.splitext(filebase)[0]  # remove .tablejson
     filebase = os.path.splitext(filebase)[0]  # remove .[version]
-    file_path = os.path.join(data_dir, filebase + '.notes')
-
-    notes_str = fileio.read_notes_file(file_path)
+    notes_str = fileio.read_data_notes(data_dir, filebase + '.notes')
     if notes_str is None:
         notes_str = "Notes are not available for the {} basis".format(bs_data['display_name'])
 
@@ -0,0 +1,171 @@
+'''
+Single-file bundle of all the data in a data directory
+
+A bundle is an SQLite database that contains the contents of all the files
+in a data directory. For elemental and component basis set files, the data
+for each element is stored separately, so that the data for a single element
+can be read without reading (and parsing) the data for all other elements.
+
+A bundle can be used anywhere a data directory can be used, by passing
+the path to the bundle file as the `data_dir` argument.
+'''
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+
+from . import diskcache, fileio
+
+# Connections are per-thread (sqlite connections can't be shared between threads).
+# Maps the path of a bundle to (stamp of the file when it was opened, connection)
+_connections = threading.local()
+
+# All SQLite database files start with this
+file_magic = b'SQLite format 3\x00'
+
+
+def is_bundle(data_dir):
+    '''Returns True if the given data directory is actually a bundle file'''
+
+    return fileio.data_backend(data_dir) == 'bundle'
+
+
+def _is_split_file(file_relpath):
+    '''Returns True if the data for each element in the file is stored separately'''
+
+    basename = os.path.basename(file_relpath)
+    if basename in ('METADATA.json', 'REFERENCES.json'):
+        return False
+    if basename.endswith('.table.json') or basename.endswith('.metadata.json'):
+        return False
+    return basename.endswith('.json')
+
+
+def create_bundle(bundle_path, data_dir):
+    '''Packs all the files in a data directory into a bundle file
+
+    The bundle is written to a temporary file first, and then moved to bundle_path
+    (which is overwritten if it exists).
+    '''
+
+    bundle_dir = os.path.dirname(os.path.abspath(bundle_path))
+    fd, tmp_path = tempfile.mkstemp(dir=bundle_dir, suffix='.tmp')
+    os.close(fd)
+
+    try:
+        conn = sqlite3.connect(tmp_path)
+        conn.execute('CREATE TABLE files (relpath TEXT PRIMARY KEY, content TEXT NOT NULL)')
+        conn.execute('CREATE TABLE elements (relpath TEXT NOT NULL, element TEXT NOT NULL, '
+                     'idx INTEGER NOT NULL, content TEXT NOT NULL, PRIMARY KEY (relpath, element)) WITHOUT ROWID')
+
+        for root, dirs, files in os.walk(data_dir):
+            for basename in sorted(files):
+                if basename.endswith('.py') or basename.endswith('.pyc'):
+                    continue
+
+                file_path = os.path.join(root, basename)
+                file_relpath = os.path.relpath(file_path, data_dir).replace(os.sep, '/')
+
+                with open(file_path, 'r') as f:
+                    content = f.read()
+
+                if _is_split_file(file_relpath):
+                    js = json.loads(content)
+
+                    # The elements are stored in their own table. An empty dictionary
+                    # is left in its place to keep the ordering of the keys
+                    el_data = js['basis_set_elements']
+                    js['basis_set_elements'] = {}
+
+                    for idx, (el, v) in enumerate(el_data.items()):
+                        conn.execute('INSERT INTO elements VALUES (?, ?, ?, ?)',
+                                     (file_relpath, el, idx, json.dumps(v, ensure_ascii=False)))
+
+                    content = json.dumps(js, ensure_ascii=False)
+
+                conn.execute('INSERT INTO files VALUES (?, ?)', (file_relpath, content))
+
+        conn.commit()
+        conn.close()
+        os.replace(tmp_path, bundle_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _get_connection(bundle_path):
+    '''Obtain a (read-only) connection to a bundle for the current thread
+
+    If the bundle file has changed since the connection was opened (for example, it
+    was replaced by :func:`create_bundle`), the old connection is closed and a new one is opened.
+    '''
+
+    bundle_path = os.path.abspath(bundle_path)
+    stamp = diskcache.file_stamp(bundle_path)
+
+    if not hasattr(_connections, 'conns'):
+        _connections.conns = {}
+
+    cached = _connections.conns.get(bundle_path)
+    if cached is not None:
+        if cached[0] == stamp:
+            return cached[1]
+        cached[1].close()
+
+    conn = sqlite3.connect('file:{}?mode=ro'.format(bundle_path), uri=True)
+    _connections.conns[bundle_path] = (stamp, conn)
+    return conn
+
+
+def read_file(bundle_path, file_relpath):
+    '''Read the contents of a file stored in a bundle
+
+    For files where the element data is stored separately, the 'basis_set_elements'
+    will be empty. If the file does not exist in the bundle, None is returned.
+    '''
+
+    conn = _get_connection(bundle_path)
+    file_relpath = file_relpath.replace(os.sep, '/')
+    row = conn.execute('SELECT content FROM files WHERE relpath = ?', (file_relpath, )).fetchone()
+    return None if row is None else row[0]
+
+
+def read_json(bundle_path, file_relpath, elements=None):
+    '''Read a JSON file stored in a bundle
+
+    If elements is given, only the data for those elements is read from
+    files whose element data is stored separately (elemental and component
+    basis set files). Otherwise, the data for all elements is read.
+
+    If the file does not exist in the bundle, an exception is raised.
+    '''
+
+    content = read_file(bundle_path, file_relpath)
+    if content is None:
+        raise FileNotFoundError('File \'{}\' does not exist in bundle \'{}\''.format(file_relpath, bundle_path))
+
+    try:
+        js = json.loads(content)
+    except json.decoder.JSONDecodeError as ex:
+        raise RuntimeError("File {} contains JSON errors".format(file_relpath)) from ex
+
+    if not _is_split_file(file_relpath):
+        return js
+
+    conn = _get_connection(bundle_path)
+    file_relpath = file_relpath.replace(os.sep, '/')
+
+    if elements is not None and len(elements) == 0:
+        rows = []
+    elif elements is None:
+        rows = conn.execute('SELECT element, content FROM elements WHERE relpath = ? ORDER BY idx', (file_relpath, ))
+    else:
+        elements = list(elements)
+        placeholders = ','.join('?' * len(elements))
+        query = 'SELECT element, content FROM elements WHERE relpath = ? AND element IN ({}) ORDER BY idx'
+        rows = conn.execute(query.format(placeholders), [file_relpath] + elements)
+
+    js['basis_set_elements'] = {el: json.loads(v) for el, v in rows}
+    return js
@@ -2,14 +2,37 @@
 Functions related to composing basis sets from individual components
 """
 
+import functools
 import os
-from . import fileio, manip, memo
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from . import diskcache, fileio, manip, memo, misc
 
 # If set to True, basis sets returned as python dictionaries
 # will contain the path to a file where each shell/potential
 # came from
 debug_data_sources = False
 
+# Parsed data files, and the composed data for each element of elemental files.
+# These are shared by all compositions (see _read_data_basis and _get_elemental_basis).
+# Their limits are the defaults in memo, unless set here.
+_file_cache = memo.BSESharedCache(__name__, '_file_cache')
+_elemental_cache = memo.BSESharedCache(__name__, '_elemental_cache')
+
+# Compositions of elemental basis sets in progress (see _get_elemental_basis)
+_elemental_flights = memo.SingleFlight()
+
+# Maximum number of threads used to read the data files of a basis set
+# concurrently before composing it (see _prefetch_files). If 0 or None,
+# files are read one at a time as they are needed
+prefetch_threads = 16
+
+# Pool of threads for reading files, shared by all compositions (see _get_prefetch_executor)
+_prefetch_executor = None
+_prefetch_executor_threads = None
+_prefetch_executor_pid = None
+_prefetch_executor_lock = threading.Lock()
+
 
 def _whole_basis_harmonic(basis):
     '''
@@ -26,31 +49,272 @@ def _whole_basis_harmonic(basis):
         for sh in v['element_electron_shells']:
             all_harm.add(sh['shell_harmonic_type'])
 
-    if len(all_harm) > 1:
+    if len(all_harm) == 0:
+        return 'none'
+    elif len(all_harm) > 1:
         return 'mixed'
     else:
         return all_harm.pop()
 
 
-def compose_elemental_basis(file_relpath, data_dir):
+def _data_file_path(data_dir, file_relpath):
+    '''
+    Obtain the path to the file that contains the data of a file in a data directory
+
+    For bundles, this is the bundle file itself.
+    '''
+
+    if fileio.data_backend(data_dir) == 'bundle':
+        return data_dir
+    return os.path.join(data_dir, file_relpath)
+
+
+def _metadata_relpath(file_relpath):
+    '''
+    Obtain the path to the metadata file of a table basis
+
+    This file must be in the same location as the table file
+    '''
+
+    meta_dirpath, table_filename = os.path.split(file_relpath)
+    meta_filename = table_filename.split('.')[0] + '.metadata.json'
+    return os.path.join(meta_dirpath, meta_filename)
+
+
+def _read_data_basis(data_dir, file_relpath, elements=None):
+    '''
+    Reads basis set information from a file in a data directory or bundle
+    (see :func:`basis_set_exchange.fileio.read_data_basis`)
+
+    Files in data directories are only read and parsed once, and are shared by all
+    compositions. A file is read again if its modification time or size changes.
+    Files in bundles are not cached, since only the data for the given elements
+    is read from them.
+
+    The top-level dictionary and the dictionaries of each element are new copies,
+    but the data in them may be shared with the cache, and must not be modified.
+    '''
+
+    if debug_data_sources or fileio.data_backend(data_dir) == 'bundle':
+        return fileio.read_data_basis(data_dir, file_relpath, elements)
+
+    stamp = diskcache.file_stamp(os.path.join(data_dir, file_relpath))
+    key = (data_dir, file_relpath)
+
+    cached = _file_cache.get(key)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, fileio.read_data_basis(data_dir, file_relpath))
+        _file_cache.put(key, cached)
+
+    js = cached[1]
+    ret = dict(js)
+    if 'basis_set_elements' in js:
+        ret['basis_set_elements'] = {
+            k: dict(v)
+            for k, v in js['basis_set_elements'].items() if elements is None or k in elements
+        }
+
+    return ret
+
+
+def _prefetch_enabled(data_dir):
+    '''Check if data files are to be prefetched (they are only prefetched into the cache of data files)'''
+
+    if not prefetch_threads or memo.memoize_enabled is not True or debug_data_sources:
+        return False
+
+    return fileio.data_backend(data_dir) != 'bundle'
+
+
+def _get_prefetch_executor():
+    '''Obtain the pool of threads for reading files, creating it if needed (or if prefetch_threads has changed)
+
+    A new pool is also created in a forked child process. The pool object is copied
+    into the child, but its threads are not, so anything submitted to it would never run.
+    '''
+
+    global _prefetch_executor, _prefetch_executor_threads, _prefetch_executor_pid
+
+    with _prefetch_executor_lock:
+        if _prefetch_executor_pid != os.getpid():
+            _prefetch_executor = None
+        if _prefetch_executor is None or _prefetch_executor_threads != prefetch_threads:
+            if _prefetch_executor is not None:
+                _prefetch_executor.shutdown(wait=False)
+            _prefetch_executor = ThreadPoolExecutor(prefetch_threads, thread_name_prefix='bse-prefetch')
+            _prefetch_executor_threads = prefetch_threads
+            _prefetch_executor_pid = os.getpid()
+        return _prefetch_executor
+
+
+def _prefetch_files(data_dir, file_relpaths):
+    '''
+    Reads data files concurrently, storing them in the cache of data files
+
+    Files that are already in the cache are not read (they are checked for changes
+    when they are used). Reading files is mostly waiting on the filesystem, so reading
+    many files at once takes about as long as reading the slowest of them.
+    '''
+
+    if not _prefetch_enabled(data_dir):
+        return
+
+    file_relpaths = sorted(f for f in set(file_relpaths) if (data_dir, f) not in _file_cache)
+
+    # Nothing to gain from reading a single file in another thread
+    if len(file_relpaths) < 2:
+        return
+
+    # Only files are read in the pool (and no more files are prefetched from there),
+    # so waiting on it here can't deadlock
+    for _ in _get_prefetch_executor().map(functools.partial(_read_data_basis, data_dir), file_relpaths):
+        pass
+
+
+def _prefetch_table_basis(file_relpath, data_dir, element_files):
+    '''
+    Reads all the data files of a table basis concurrently (see :func:`_prefetch_files`)
+
+    element_files maps the elemental files of the table basis to the elements needed from each.
+    This is done in two stages: first the elemental files and metadata,
+    then all the component files of those elemental files.
+    '''
+
+    if not _prefetch_enabled(data_dir):
+        return
+
+    _prefetch_files(data_dir, [_metadata_relpath(file_relpath), *element_files])
+
+    component_files = set()
+    for k, v in element_files.items():
+        el_bs = _read_data_basis(data_dir, k, v)
+        for el_data in el_bs['basis_set_elements'].values():
+            component_files.update(el_data['element_components'])
+
+    _prefetch_files(data_dir, component_files)
+
+
+def _get_elemental_basis(file_relpath, data_dir, elements, used_files):
+    '''
+    Obtains a composed elemental basis, using the cache shared by all table basis sets
+
+    There is one cache entry for each element of an elemental file. Only the elements that
+    are not in the cache are composed, and they are only composed by one thread at a time.
+
+    The data for an element is composed again if any of the files it was composed from have changed.
+    The returned data is shared with the cache, and must not be modified.
+    See :func:`compose_elemental_basis` for the arguments.
+    '''
+
+    # The composed data contains file paths if debugging, so don't cache it
+    if debug_data_sources:
+        return _compose_elemental_basis(file_relpath, data_dir, elements, used_files)
+
+    el_bs = _read_data_basis(data_dir, file_relpath, elements)
+
+    # Files are stat'ed once for all the elements
+    stamps = {}
+
+    def _lookup(el):
+        # entry is (element data, {path: stamp} of the files the element was composed from)
+        entry = _elemental_cache.get((file_relpath, data_dir, el))
+        if entry is None:
+            return None
+        for f, st in entry[1].items():
+            if f not in stamps:
+                stamps[f] = diskcache.file_stamp(f)
+            if stamps[f] != st:
+                return None
+        return entry
+
+    def _compose(missing):
+        # Some may have been composed by another thread since they were looked up
+        ret = {k: _lookup(k) for k in missing}
+        todo = [k for k, v in ret.items() if v is None]
+        if not todo:
+            return ret
+
+        el_files = {}
+        composed = _compose_elemental_basis(file_relpath, data_dir, todo, None, el_files)
+        for k, v in composed['basis_set_elements'].items():
+            ret[k] = (v, {f: diskcache.file_stamp(f) for f in el_files[k]})
+            _elemental_cache.put((file_relpath, data_dir, k), ret[k])
+
+        # Elements still None are no longer in the file (it changed since it was read above)
+        return ret
+
+    entries = {k: _lookup(k) for k in el_bs['basis_set_elements']}
+    missing = [k for k, v in entries.items() if v is None]
+    while missing:
+        # If other threads are composing elements of the same file, wait for them instead. Their
+        # result may not have all the elements needed here, in which case this is repeated.
+        composed = _elemental_flights.do((file_relpath, data_dir), functools.partial(_compose, missing))
+        entries.update((k, composed[k]) for k in missing if k in composed)
+        missing = [k for k in missing if k not in composed]
+
+    el_bs['basis_set_elements'] = {k: v[0] for k, v in entries.items() if v is not None}
+
+    if used_files is not None:
+        used_files.add(_data_file_path(data_dir, file_relpath))
+        for v in entries.values():
+            if v is not None:
+                used_files.update(v[1])
+
+    return el_bs
+
+
+def compose_elemental_basis(file_relpath, data_dir, elements=None, used_files=None):
     """
     Creates an 'elemental' basis from an elemental json file
 
     This function reads the info from the given file, and reads all the component
     basis set information from the files listed therein. It then composes all the
     information together into one 'elemental' basis dictionary
+
+    If elements is given (as a list of Z numbers as strings), only those elements
+    are composed, and only the component files needed by those elements are read.
+
+    If used_files is given (as a set), the paths of all files that were read
+    are added to it.
+
+    Composed elemental basis sets and the data files they are composed from are cached,
+    and are shared between all table basis sets (for example, different versions of a basis set).
     """
 
+    # The cached data is shared, so a copy is returned
+    return misc.thaw(_get_elemental_basis(file_relpath, data_dir, elements, used_files))
+
+
+def _compose_elemental_basis(file_relpath, data_dir, elements, used_files, element_files=None):
+    '''Composes an elemental basis (see :func:`compose_elemental_basis`)
+
+    The returned data may be shared with the cache of data files (see :func:`_read_data_basis`).
+    If used_files is not None, the paths of all files that were read are added to it.
+    If element_files is not None (a dictionary), the paths of the files used by each element are stored in it.
+    '''
+
     # Do a simple read of the json
-    el_bs = fileio.read_json_basis(os.path.join(data_dir, file_relpath))
+    el_bs = _read_data_basis(data_dir, file_relpath, elements)
 
-    # construct a list of all files to read
-    component_files = set()
+    # construct a list of all files to read, and
+    # which elements are needed from each of them
+    component_files = {}
     for k, v in el_bs['basis_set_elements'].items():
-        component_files.update(set(v['element_components']))
+        for c in v['element_components']:
+            component_files.setdefault(c, set()).add(k)
 
     # Read all the data from these files into a big dictionary
-    component_map = {k: fileio.read_json_basis(os.path.join(data_dir, k)) for k in component_files}
+    _prefetch_files(data_dir, component_files)
+    component_map = {k: _read_data_basis(data_dir, k, v) for k, v in component_files.items()}
+
+    if used_files is not None:
+        used_files.add(_data_file_path(data_dir, file_relpath))
+        used_files.update(_data_file_path(data_dir, k) for k in component_files)
+
+    if element_files is not None:
+        el_file = _data_file_path(data_dir, file_relpath)
+        for k, v in el_bs['basis_set_elements'].items():
+            element_files[k] = frozenset([el_file] + [_data_file_path(data_dir, c) for c in v['element_components']])
 
     # If debugging, add file source info
     if debug_data_sources:
@@ -88,27 +352,148 @@ def compose_elemental_basis(file_relpath, data_dir):
 
 
 @memo.BSEMemoize
-def compose_table_basis(file_relpath, data_dir):
+def compose_table_basis(file_relpath, data_dir, elements=None):
     """
     Creates a 'table' basis from an table json file
 
     This function reads the info from the given file, and reads all the elemental
     basis set information from the files listed therein. It then composes all the
     information together into one 'table' basis dictionary
+
+    If elements is given (as a tuple of Z numbers as strings), only those elements
+    are composed. Elemental and component files not needed by those elements are not read.
+    Elements not in the table basis are ignored.
+
+    If the disk cache is enabled (see :mod:`basis_set_exchange.diskcache`), the
+    composed basis is read from there if none of the files it was composed from
+    have changed.
     """
 
+    # The composed data contains file paths if debugging, so don't cache it
+    if debug_data_sources:
+        return _compose_table_basis(file_relpath, data_dir, elements, set())
+
+    cache_key = ('compose_table_basis', os.path.abspath(data_dir), file_relpath, elements)
+    table_bs = diskcache.read_entry(cache_key)
+
+    if table_bs is None:
+        used_files = set()
+        table_bs = _compose_table_basis(file_relpath, data_dir, elements, used_files)
+        diskcache.write_entry(cache_key, table_bs, used_files)
+
+    return table_bs
+
+
+@memo.BSEMemoize
+def compose_table_references(file_relpath, data_dir, elements=None):
+    """
+    Obtains the references for each element of a table basis
+
+    This follows the same table -> elemental -> component file chain as
+    :func:`compose_table_basis`, but only the descriptions and references
+    are read from the component files. No shell or potential data is read.
+
+    Returned is a dictionary in the same form as a composed table basis, except
+    that it only contains 'basis_set_elements', and the data for each element
+    only contains 'element_references'.
+    """
+
+    table_bs = _read_data_basis(data_dir, file_relpath)
+
+    # construct a list of all elemental files to read, and
+    # which elements are needed from each of them
+    element_files = {}
+    for k, v in table_bs['basis_set_elements'].items():
+        if elements is None or k in elements:
+            element_files.setdefault(v['element_entry'], set()).add(k)
+
+    # Maps component file to its reference information
+    component_refs = {}
+
+    el_refs = {}
+    for entry, entry_elements in element_files.items():
+        el_bs = _read_data_basis(data_dir, entry, entry_elements)
+
+        for k, v in el_bs['basis_set_elements'].items():
+            refs = list(v.get('element_references', []))
+
+            for c in v['element_components']:
+                if c not in component_refs:
+                    comp = fileio.read_data_basis_keys(data_dir, c, ('basis_set_description', 'basis_set_references'))
+                    component_refs[c] = {
+                        'reference_description': comp['basis_set_description'],
+                        'reference_keys': comp['basis_set_references']
+                    }
+
+                # Merged in the same way as manip.merge_element_data
+                if not component_refs[c] in refs:
+                    refs.append(dict(component_refs[c]))
+
+            el_refs[k] = {'element_references': refs}
+
+    # Keep the ordering of the elements in the table
+    return {'basis_set_elements': {k: el_refs[k] for k in table_bs['basis_set_elements'] if k in el_refs}}
+
+
+def table_basis_files(file_relpath, data_dir, elements=None):
+    """
+    Obtains all the files that a table basis is composed from
+
+    These are the table file itself, its metadata file, and all the elemental and
+    component files used by the given elements (or all elements, if elements is None).
+    Only the table and elemental files are read.
+
+    Returned is a sorted list of paths relative to the data directory
+    """
+
+    table_bs = _read_data_basis(data_dir, file_relpath)
+
+    # construct a list of all elemental files to read, and
+    # which elements are needed from each of them
+    element_files = {}
+    for k, v in table_bs['basis_set_elements'].items():
+        if elements is None or k in elements:
+            element_files.setdefault(v['element_entry'], set()).add(k)
+
+    all_files = {file_relpath, _metadata_relpath(file_relpath)}
+    for entry, entry_elements in element_files.items():
+        el_bs = _read_data_basis(data_dir, entry, entry_elements)
+        all_files.add(entry)
+        for v in el_bs['basis_set_elements'].values():
+            all_files.update(v['element_components'])
+
+    return sorted(all_files)
+
+
+def _compose_table_basis(file_relpath, data_dir, elements, used_files):
+    '''Composes a table basis (see :func:`compose_table_basis`)
+
+    The paths of all files that were read are added to the used_files set.
+    The returned data may be shared with the caches of data files and elemental
+    basis sets, and must not be modified.
+    '''
+
     # Do a simple read of the json
-    file_path = os.path.join(data_dir, file_relpath)
-    table_bs = fileio.read_json_basis(file_path)
+    table_bs = _read_data_basis(data_dir, file_relpath)
 
-    # construct a list of all elemental files to read
-    element_files = set()
-    for v in table_bs['basis_set_elements'].values():
-        element_files.add(v['element_entry'])
+    if elements is not None:
+        table_bs['basis_set_elements'] = {
+            k: v
+            for k, v in table_bs['basis_set_elements'].items() if k in elements
+        }
+
+    # construct a list of all elemental files to read, and
+    # which elements are needed from each of them
+    element_files = {}
+    for k, v in table_bs['basis_set_elements'].items():
+        element_files.setdefault(v['element_entry'], set()).add(k)
+
+    # Read all the files needed for this basis at once
+    _prefetch_table_basis(file_relpath, data_dir, element_files)
 
     # Create a map of the elemental basis data
     # (maps file path to data contained in that file)
-    element_map = {k: compose_elemental_basis(k, data_dir) for k in element_files}
+    element_map = {k: _get_elemental_basis(k, data_dir, v, used_files) for k, v in element_files.items()}
 
     # Replace the basis set for all elements in the table basis with the data
     # from the elemental basis
@@ -126,11 +511,10 @@ def compose_table_basis(file_relpath, data_dir):
     table_bs['basis_set_harmonic_type'] = _whole_basis_harmonic(table_bs)
 
     # Read and merge in the metadata
-    # This file must be in the same location as the table file
-    meta_dirpath, table_filename = os.path.split(file_path)
-    meta_filename = table_filename.split('.')[0] + '.metadata.json'
-    meta_filepath = os.path.join(meta_dirpath, meta_filename)
-    bs_meta = fileio.read_json_basis(meta_filepath)
+    meta_relpath = _metadata_relpath(file_relpath)
+    bs_meta = _read_data_basis(data_dir, meta_relpath)
+    used_files.add(_data_file_path(data_dir, file_relpath))
+    used_files.add(_data_file_path(data_dir, meta_relpath))
     table_bs.update(bs_meta)
 
     # Remove the molssi schema (which isn't needed here)
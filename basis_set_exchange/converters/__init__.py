@@ -2,4 +2,5 @@
 Conversion of basis sets to various formats
 '''
 
-from .convert import convert_basis, get_formats, get_format_extension
+from .convert import (convert_basis, iter_basis, write_basis, has_element_blocks, get_format_transforms,
+                      convert_element_blocks, assemble_basis, get_formats, get_format_extension)
@@ -5,8 +5,24 @@ Conversion of basis sets to JSON format
 import json
 
 
-def write_json(basis):
+def _encoder():
+    # Read-only (frozen) basis set data is converted back to dictionaries
+    return json.JSONEncoder(indent=4, ensure_ascii=False, default=dict)
+
+
+def iter_json(basis, executor=None):
+    '''Converts a basis set to JSON, yielding the text in chunks
+
+    The executor is not used (JSON is written all at once)
+    '''
+
+    return _encoder().iterencode(basis)
+
+
+def write_json(basis, executor=None):
     '''Converts a basis set to JSON
+
+    The executor is not used (JSON is written all at once)
     '''
 
-    return json.dumps(basis, indent=4, ensure_ascii=False)
+    return _encoder().encode(basis)
@@ -3,6 +3,57 @@ Helper functions for writing out basis set in various formats
 '''
 
 
+def iter_element_blocks(block_func, basis, elements, executor=None):
+    '''Renders a block of text for each of the given elements of a basis set
+
+    block_func is called with the element (Z number as a string) and the data
+    for that element, and must return a string.
+
+    If executor (a :class:`concurrent.futures.Executor`) is given, the blocks are rendered
+    with it. For process pools, block_func must be picklable (ie, a module-level function
+    or a functools.partial of one).
+
+    This is a generator, yielding the blocks in the same order as elements.
+    Without an executor, each block is only rendered when it is needed.
+    '''
+
+    el_data = [basis['basis_set_elements'][z] for z in elements]
+
+    if executor is None:
+        return (block_func(z, data) for z, data in zip(elements, el_data))
+    return executor.map(block_func, elements, el_data)
+
+
+def iter_basis_blocks(basis, electron_func, ecp_func, executor=None):
+    '''Renders the blocks for the electron basis and ECP of all elements of a basis set
+
+    electron_func and ecp_func write the electron basis and ECP of a single element
+    (see :func:`iter_element_blocks`).
+
+    Returned are iterators over the electron basis blocks and the ECP blocks,
+    in the order of the elements in the basis set. If no elements have an electron basis
+    (or ECP), None is returned in place of that iterator.
+    '''
+
+    el_data = basis['basis_set_elements']
+
+    # Elements for which we have electron basis
+    electron_elements = [k for k, v in el_data.items() if 'element_electron_shells' in v]
+
+    # Elements for which we have ECP
+    ecp_elements = [k for k, v in el_data.items() if 'element_ecp' in v]
+
+    electron_blocks = None
+    ecp_blocks = None
+
+    if len(electron_elements) > 0:
+        electron_blocks = iter_element_blocks(electron_func, basis, electron_elements, executor)
+    if len(ecp_elements) > 0:
+        ecp_blocks = iter_element_blocks(ecp_func, basis, ecp_elements, executor)
+
+    return electron_blocks, ecp_blocks
+
+
 def _find_point(x):
     if isinstance(x, int):
         return 0
@@ -43,7 +94,7 @@ def write_matrix(mat, point_place, convert_exp=False):
     pad = list(map(list, zip(*pad)))
     mat = list(map(list, zip(*mat)))
 
-    lines = ''
+    lines = []
     for r, row in enumerate(mat):
         line = ''
         for c, val in enumerate(row):
@@ -51,7 +102,8 @@ def write_matrix(mat, point_place, convert_exp=False):
             # ensure at least one space
             sp = max(sp, 1)
             line += ' ' * sp + str(mat[r][c])
-        lines += line + '\n'
+        lines.append(line + '\n')
+    lines = ''.join(lines)
 
     if convert_exp is True:
         lines = lines.replace('e', 'D')
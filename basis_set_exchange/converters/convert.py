@@ -3,75 +3,280 @@ Converts basis set data to a specified output format
 '''
 
 from collections import OrderedDict
-from .bsejson import write_json
-from .nwchem import write_nwchem
-from .g94 import write_g94
-from .gamess_us import write_gamess_us
-from .psi4 import write_psi4
-from .turbomole import write_turbomole
+from .. import manip
+from .common import iter_element_blocks
+from .bsejson import write_json, iter_json
+from .nwchem import write_nwchem, iter_nwchem, assemble_nwchem, nwchem_transforms, nwchem_block_functions
+from .g94 import write_g94, iter_g94, assemble_g94, g94_transforms, g94_block_functions
+from .gamess_us import (write_gamess_us, iter_gamess_us, assemble_gamess_us, gamess_us_transforms,
+                        gamess_us_block_functions)
+from .psi4 import write_psi4, iter_psi4, assemble_psi4, psi4_transforms, psi4_block_functions
+from .turbomole import (write_turbomole, iter_turbomole, assemble_turbomole, turbomole_transforms,
+                        turbomole_block_functions)
 
 _converter_map = {
     'json': {
         'display': 'JSON',
         'extension': '.json',
         'comment': None,
-        'function': write_json
+        'function': write_json,
+        'iter_function': iter_json,
+        'transforms': None,
+        'block_functions': None,
+        'assemble': None
     },
     'nwchem': {
         'display': 'NWChem',
         'extension': '.nw',
         'comment': '#',
-        'function': write_nwchem
+        'function': write_nwchem,
+        'iter_function': iter_nwchem,
+        'transforms': nwchem_transforms,
+        'block_functions': nwchem_block_functions,
+        'assemble': assemble_nwchem
     },
     'gaussian94': {
         'display': 'Gaussian94',
         'extension': '.gbs',
         'comment': '!',
-        'function': write_g94
+        'function': write_g94,
+        'iter_function': iter_g94,
+        'transforms': g94_transforms,
+        'block_functions': g94_block_functions,
+        'assemble': assemble_g94
     },
     'gamess_us': {
         'display': 'GAMESS US',
         'extension': '.bas',
         'comment': '!',
-        'function': write_gamess_us
+        'function': write_gamess_us,
+        'iter_function': iter_gamess_us,
+        'transforms': gamess_us_transforms,
+        'block_functions': gamess_us_block_functions,
+        'assemble': assemble_gamess_us
     },
     'psi4': {
         'display': 'Psi4',
         'extension': '.gbs',
         'comment': '!',
-        'function': write_psi4
+        'function': write_psi4,
+        'iter_function': iter_psi4,
+        'transforms': psi4_transforms,
+        'block_functions': psi4_block_functions,
+        'assemble': assemble_psi4
     },
     'turbomole': {
         'display': 'Turbomole',
         'extension': '.tm',
         'comment': '#',
-        'function': write_turbomole
+        'function': write_turbomole,
+        'iter_function': iter_turbomole,
+        'transforms': turbomole_transforms,
+        'block_functions': turbomole_block_functions,
+        'assemble': assemble_turbomole
     }
 }
 
 
-def convert_basis(basis_dict, fmt, header=None):
-    '''
-    Returns the basis set data as a string representing
-    the data in the specified output format
-    '''
+def _check_format(fmt):
+    '''Makes the format lowercase, and checks that it is a known format'''
 
     # make converters case insensitive
     fmt = fmt.lower()
     if fmt not in _converter_map:
         raise RuntimeError('Unknown basis set format "{}"'.format(fmt))
+    return fmt
 
-    ret_str = _converter_map[fmt]['function'](basis_dict)
-    if header is not None and fmt != 'json':
-        comment_str = _converter_map[fmt]['comment']
-        header_str = comment_str + comment_str.join(header.splitlines(True))
-        ret_str = header_str + '\n\n' + ret_str
+
+def _iter_preamble(fmt, header, harmonic_type):
+    '''Yields the header and anything else that must come before the basis set data'''
 
     # HACK - Psi4 requires the first non-comment line be spherical/cartesian
     #        so we have to add that before the header
     if fmt == 'psi4':
-        ret_str = basis_dict['basis_set_harmonic_type'] + '\n\n' + ret_str
+        yield harmonic_type + '\n\n'
+
+    if header is not None and fmt != 'json':
+        comment_str = _converter_map[fmt]['comment']
+        yield comment_str + comment_str.join(header.splitlines(True)) + '\n\n'
+
+
+def _iter_basis(basis_dict, fmt, header, executor):
+    yield from _iter_preamble(fmt, header, basis_dict['basis_set_harmonic_type'])
+    yield from _converter_map[fmt]['iter_function'](basis_dict, executor)
+
+
+def _iter_basis_by_element(basis_dict, fmt, header, transforms):
+    '''Yields the output of a basis set, transforming and converting one element at a time
+
+    Each element is transformed (see :func:`convert_element_blocks`) just before its blocks
+    are needed. The ECP blocks come after all the electron blocks, so they are kept until then.
+    '''
+
+    el_data = basis_dict['basis_set_elements']
+    electron_elements = [k for k, v in el_data.items() if 'element_electron_shells' in v]
+    ecp_elements = [k for k, v in el_data.items() if 'element_ecp' in v]
+    ecp_blocks = {}
+
+    def _convert_element(z):
+        el_basis = dict(basis_dict)
+        el_basis['basis_set_elements'] = {z: el_data[z]}
+        return convert_element_blocks(el_basis, fmt, transforms=transforms)[z]
+
+    def _iter_electron_blocks():
+        for z in electron_elements:
+            electron_block, ecp_blocks[z] = _convert_element(z)
+            yield electron_block
+
+    def _iter_ecp_blocks():
+        for z in ecp_elements:
+            yield ecp_blocks.pop(z) if z in ecp_blocks else _convert_element(z)[1]
+
+    yield from _iter_preamble(fmt, header, basis_dict['basis_set_harmonic_type'])
+    yield from _converter_map[fmt]['assemble'](_iter_electron_blocks() if electron_elements else None,
+                                               _iter_ecp_blocks() if ecp_elements else None)
+
+
+def iter_basis(basis_dict, fmt, header=None, executor=None, transforms=()):
+    '''
+    Returns an iterator over chunks of text that together
+    represent the basis set data in the specified output format
+
+    The text is generated as it is needed, and so does not need
+    to be held in memory all at once.
+
+    If transforms are given, they are applied to the basis set first
+    (see :func:`basis_set_exchange.manip.transform_basis`). If the format can be converted
+    per element (see :func:`has_element_blocks`) and no executor is given, each element
+    is transformed just before it is converted, including the manipulations needed by the format.
+    Otherwise, the whole basis set is transformed before the first chunk is generated.
+    See :func:`convert_basis` for the other arguments.
+    '''
+
+    # Check the format now, rather than when iteration starts
+    fmt = _check_format(fmt)
+
+    if executor is None and _converter_map[fmt]['assemble'] is not None:
+        return _iter_basis_by_element(basis_dict, fmt, header, transforms)
+
+    if transforms:
+        basis_dict = manip.transform_basis(basis_dict, transforms, executor=executor)
+    return _iter_basis(basis_dict, fmt, header, executor)
+
+
+def write_basis(basis_dict, fmt, out, header=None, executor=None, transforms=()):
+    '''
+    Writes the basis set data in the specified output format
+    to a file-like object (opened in text mode)
+
+    The text is written in chunks as it is generated (see :func:`iter_basis`).
+    See :func:`convert_basis` for the other arguments.
+    '''
+
+    for chunk in iter_basis(basis_dict, fmt, header, executor, transforms):
+        out.write(chunk)
+
+
+def convert_basis(basis_dict, fmt, header=None, executor=None):
+    '''
+    Returns the basis set data as a string representing
+    the data in the specified output format
+
+    If executor (a :class:`concurrent.futures.Executor`) is given, the
+    elements are converted in parallel using it.
+    '''
+
+    return ''.join(iter_basis(basis_dict, fmt, header, executor))
+
+
+def has_element_blocks(fmt):
+    '''
+    Returns True if the output of the given format can be assembled from
+    separately-converted elements (see :func:`convert_element_blocks`)
+    '''
+
+    fmt = _check_format(fmt)
+    return _converter_map[fmt]['assemble'] is not None
+
+
+def get_format_transforms(fmt):
+    '''
+    Returns the manipulations that are done to a basis set before its elements are
+    converted to the specified format (see :func:`convert_element_blocks`)
+
+    These are in the form used by :func:`basis_set_exchange.manip.transform_basis`.
+    '''
+
+    fmt = _check_format(fmt)
+    conv = _converter_map[fmt]
+    if conv['assemble'] is None:
+        raise RuntimeError('Basis set format "{}" cannot be converted per element'.format(fmt))
+
+    return list(conv['transforms'])
+
+
+def convert_element_blocks(basis_dict, fmt, executor=None, transforms=(), format_transforms=True):
+    '''
+    Converts each element of a basis set separately into the specified format
+
+    Returned is a dictionary of element (Z number as a string) to a tuple
+    of the blocks of text for the electron basis and the ECP of that element.
+    Either block is None if the element does not have an electron basis or ECP.
 
+    The blocks of a single element do not depend on the other elements in the
+    basis set, and so blocks from different calls may be combined with
+    :func:`assemble_basis`. Not all formats support this (see :func:`has_element_blocks`).
+
+    If transforms are given, they are applied to the basis set before the manipulations
+    needed by the format (see :func:`basis_set_exchange.manip.transform_basis`).
+    The basis set is only copied once. If format_transforms is False, the manipulations
+    needed by the format (see :func:`get_format_transforms`) must have already been
+    applied, and are not done again.
+    '''
+
+    fmt = _check_format(fmt)
+    conv = _converter_map[fmt]
+    if conv['assemble'] is None:
+        raise RuntimeError('Basis set format "{}" cannot be converted per element'.format(fmt))
+
+    all_transforms = list(transforms)
+    if format_transforms:
+        all_transforms += conv['transforms']
+
+    # Converting doesn't modify the basis set, so it only needs to be copied when transforming
+    basis = basis_dict
+    if all_transforms:
+        basis = manip.transform_basis(basis_dict, all_transforms, executor=executor)
+    electron_func, ecp_func = conv['block_functions'](basis)
+
+    el_data = basis['basis_set_elements']
+    electron_elements = [k for k, v in el_data.items() if 'element_electron_shells' in v]
+    ecp_elements = [k for k, v in el_data.items() if 'element_ecp' in v]
+
+    electron_blocks = iter_element_blocks(electron_func, basis, electron_elements, executor)
+    electron_blocks = dict(zip(electron_elements, electron_blocks))
+    ecp_blocks = dict(zip(ecp_elements, iter_element_blocks(ecp_func, basis, ecp_elements, executor)))
+
+    return {k: (electron_blocks.get(k), ecp_blocks.get(k)) for k in el_data}
+
+
+def assemble_basis(blocks, fmt, harmonic_type, header=None):
+    '''
+    Returns the basis set data in the specified output format, assembled from the
+    blocks of separately-converted elements (see :func:`convert_element_blocks`)
+
+    blocks is a list of the (electron basis, ECP) tuples of each element, in order.
+    harmonic_type is the harmonic type of the whole basis set (the
+    'basis_set_harmonic_type' of the basis set data).
+    '''
+
+    fmt = _check_format(fmt)
+
+    electron_blocks = [x[0] for x in blocks if x[0] is not None]
+    ecp_blocks = [x[1] for x in blocks if x[1] is not None]
+
+    ret_str = ''.join(_iter_preamble(fmt, header, harmonic_type))
+    ret_str += ''.join(_converter_map[fmt]['assemble'](electron_blocks or None, ecp_blocks or None))
     return ret_str
 
 
@@ -101,8 +306,5 @@ def get_format_extension(fmt):
     Returns the recommended extension for a given format
     '''
 
-    fmt = fmt.lower()
-    if fmt not in _converter_map:
-        raise RuntimeError('Unknown basis set format "{}"'.format(fmt))
-
+    fmt = _check_format(fmt)
     return _converter_map[fmt]['extension']
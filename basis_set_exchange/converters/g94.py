@@ -4,80 +4,112 @@ Conversion of basis sets to Gaussian format
 
 from .. import lut
 from .. import manip
-from .common import write_matrix
+from .common import write_matrix, iter_basis_blocks
 
 
-def write_g94(basis):
-    '''Converts a basis set to Gaussian format
-    '''
+def _electron_block(z, data):
+    '''Writes the electron basis for a single element'''
 
-    s = ''
+    s = []
+    sym = lut.element_sym_from_Z(z, True)
+    s.append('{}     0\n'.format(sym))
 
-    basis = manip.uncontract_general(basis)
-    basis = manip.uncontract_spdf(basis, 1)
-    basis = manip.sort_basis(basis)
+    for shell in data['element_electron_shells']:
+        exponents = shell['shell_exponents']
+        coefficients = shell['shell_coefficients']
+        ncol = len(coefficients) + 1
+        nprim = len(exponents)
 
-    # Elements for which we have electron basis
-    electron_elements = [k for k, v in basis['basis_set_elements'].items() if 'element_electron_shells' in v]
+        am = shell['shell_angular_momentum']
+        amchar = lut.amint_to_char(am, hij=True).upper()
+        s.append('{}   {}   1.00\n'.format(amchar, nprim))
 
-    # Elements for which we have ECP
-    ecp_elements = [k for k, v in basis['basis_set_elements'].items() if 'element_ecp' in v]
+        point_places = [8 * i + 15 * (i - 1) for i in range(1, ncol + 1)]
+        s.append(write_matrix([exponents, *coefficients], point_places, convert_exp=True))
 
-    # Electron Basis
-    if len(electron_elements) > 0:
-        for z in electron_elements:
-            data = basis['basis_set_elements'][z]
+    s.append('****\n')
+    return ''.join(s)
+
+
+def _ecp_block(z, data):
+    '''Writes the ECP for a single element'''
+
+    s = []
+    sym = lut.element_sym_from_Z(z).upper()
+    max_ecp_am = max([x['potential_angular_momentum'][0] for x in data['element_ecp']])
+    max_ecp_amchar = lut.amint_to_char([max_ecp_am], hij=True)
+
+    # Sort lowest->highest, then put the highest at the beginning
+    ecp_list = sorted(data['element_ecp'], key=lambda x: x['potential_angular_momentum'])
+    ecp_list.insert(0, ecp_list.pop())
+
+    s.append('{}     0\n'.format(sym))
+    s.append('{}-ECP     {}     {}\n'.format(sym, max_ecp_am, data['element_ecp_electrons']))
+
+    for pot in ecp_list:
+        rexponents = pot['potential_r_exponents']
+        gexponents = pot['potential_gaussian_exponents']
+        coefficients = pot['potential_coefficients']
+        nprim = len(rexponents)
+
+        am = pot['potential_angular_momentum']
+        amchar = lut.amint_to_char(am, hij=True)
+
+        if am[0] == max_ecp_am:
+            s.append('{} potential\n'.format(amchar))
+        else:
+            s.append('{}-{} potential\n'.format(amchar, max_ecp_amchar))
+
+        s.append('  ' + str(nprim) + '\n')
 
-            sym = lut.element_sym_from_Z(z, True)
-            s += '{}     0\n'.format(sym)
+        point_places = [0, 9, 32]
+        s.append(write_matrix([rexponents, gexponents, *coefficients], point_places, convert_exp=True))
 
-            for shell in data['element_electron_shells']:
-                exponents = shell['shell_exponents']
-                coefficients = shell['shell_coefficients']
-                ncol = len(coefficients) + 1
-                nprim = len(exponents)
+    return ''.join(s)
 
-                am = shell['shell_angular_momentum']
-                amchar = lut.amint_to_char(am, hij=True).upper()
-                s += '{}   {}   1.00\n'.format(amchar, nprim)
 
-                point_places = [8 * i + 15 * (i - 1) for i in range(1, ncol + 1)]
-                s += write_matrix([exponents, *coefficients], point_places, convert_exp=True)
+# Manipulations done before writing
+g94_transforms = ['uncontract_general', ('uncontract_spdf', 1), 'sort_basis']
 
-            s += '****\n'
+
+def g94_block_functions(basis):
+    '''Obtain the functions that write the electron basis and ECP for a single element'''
+
+    return _electron_block, _ecp_block
+
+
+def assemble_g94(electron_blocks, ecp_blocks):
+    '''Yields the Gaussian output, given the blocks for the electron basis and ECP of each element
+
+    electron_blocks and ecp_blocks are iterables of the blocks for each element, or None
+    if no elements have an electron basis or ECP (respectively)
+    '''
+
+    # Electron Basis
+    if electron_blocks is not None:
+        yield from electron_blocks
 
     # Write out ECP
-    if len(ecp_elements) > 0:
-        for z in ecp_elements:
-            data = basis['basis_set_elements'][z]
-            sym = lut.element_sym_from_Z(z).upper()
-            max_ecp_am = max([x['potential_angular_momentum'][0] for x in data['element_ecp']])
-            max_ecp_amchar = lut.amint_to_char([max_ecp_am], hij=True)
+    if ecp_blocks is not None:
+        yield from ecp_blocks
 
-            # Sort lowest->highest, then put the highest at the beginning
-            ecp_list = sorted(data['element_ecp'], key=lambda x: x['potential_angular_momentum'])
-            ecp_list.insert(0, ecp_list.pop())
 
-            s += '{}     0\n'.format(sym)
-            s += '{}-ECP     {}     {}\n'.format(sym, max_ecp_am, data['element_ecp_electrons'])
+def iter_g94(basis, executor=None):
+    '''Converts a basis set to Gaussian format, yielding the text in chunks
 
-            for pot in ecp_list:
-                rexponents = pot['potential_r_exponents']
-                gexponents = pot['potential_gaussian_exponents']
-                coefficients = pot['potential_coefficients']
-                nprim = len(rexponents)
+    If executor is given, the elements are manipulated and written
+    in parallel (see :func:`basis_set_exchange.converters.common.iter_element_blocks`)
+    '''
 
-                am = pot['potential_angular_momentum']
-                amchar = lut.amint_to_char(am, hij=True)
+    basis = manip.transform_basis(basis, g94_transforms, executor=executor)
+    yield from assemble_g94(*iter_basis_blocks(basis, *g94_block_functions(basis), executor))
 
-                if am[0] == max_ecp_am:
-                    s += '{} potential\n'.format(amchar)
-                else:
-                    s += '{}-{} potential\n'.format(amchar, max_ecp_amchar)
 
-                s += '  ' + str(nprim) + '\n'
+def write_g94(basis, executor=None):
+    '''Converts a basis set to Gaussian format
 
-                point_places = [0, 9, 32]
-                s += write_matrix([rexponents, gexponents, *coefficients], point_places, convert_exp=True)
+    If executor is given, the elements are manipulated and written
+    in parallel (see :func:`iter_g94`)
+    '''
 
-    return s
+    return ''.join(iter_g94(basis, executor))
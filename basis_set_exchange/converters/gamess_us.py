@@ -4,88 +4,116 @@ Conversion of basis sets to Gaussian format
 
 from .. import lut
 from .. import manip
-from .common import write_matrix
+from .common import write_matrix, iter_basis_blocks
 
 
-def write_gamess_us(basis):
-    '''Converts a basis set to GAMESS-US
-    '''
+def _electron_block(z, data):
+    '''Writes the electron basis for a single element'''
 
-    s = ''
+    s = []
+    el_name = lut.element_name_from_Z(z).upper()
+    s.append('\n' + el_name + "\n")
 
-    # Uncontract all but SP
-    basis = manip.uncontract_general(basis)
-    basis = manip.uncontract_spdf(basis, 1)
-    basis = manip.sort_basis(basis)
+    for shell in data['element_electron_shells']:
+        exponents = shell['shell_exponents']
+        coefficients = shell['shell_coefficients']
+        ncol = len(coefficients) + 2  #include index column
+        nprim = len(exponents)
 
-    # Elements for which we have electron basis
-    electron_elements = [k for k, v in basis['basis_set_elements'].items() if 'element_electron_shells' in v]
+        am = shell['shell_angular_momentum']
+        amchar = lut.amint_to_char(am, hij=True, use_L=True).upper()
+        s.append('{}   {}\n'.format(amchar, nprim))
 
-    # Elements for which we have ECP
-    ecp_elements = [k for k, v in basis['basis_set_elements'].items() if 'element_ecp' in v]
+        # 1-based indexing
+        idx_column = list(range(1, nprim + 1))
+        point_places = [0] + [4 + 8 * i + 15 * (i - 1) for i in range(1, ncol)]
+        s.append(write_matrix([idx_column, exponents, *coefficients], point_places))
 
-    # Electron Basis
-    if len(electron_elements) > 0:
-        # electronic part starts with $DATA
-        s += '$DATA\n'
+    return ''.join(s)
 
-        for z in electron_elements:
-            data = basis['basis_set_elements'][z]
 
-            el_name = lut.element_name_from_Z(z).upper()
-            s += '\n' + el_name + "\n"
+def _ecp_block(z, data):
+    '''Writes the ECP for a single element'''
 
-            for shell in data['element_electron_shells']:
-                exponents = shell['shell_exponents']
-                coefficients = shell['shell_coefficients']
-                ncol = len(coefficients) + 2  #include index column
-                nprim = len(exponents)
+    s = []
+    sym = lut.element_sym_from_Z(z).upper()
+    max_ecp_am = max([x['potential_angular_momentum'][0] for x in data['element_ecp']])
+    max_ecp_amchar = lut.amint_to_char([max_ecp_am], hij=True)
 
-                am = shell['shell_angular_momentum']
-                amchar = lut.amint_to_char(am, hij=True, use_L=True).upper()
-                s += '{}   {}\n'.format(amchar, nprim)
+    # Sort lowest->highest, then put the highest at the beginning
+    ecp_list = sorted(data['element_ecp'], key=lambda x: x['potential_angular_momentum'])
+    ecp_list.insert(0, ecp_list.pop())
 
-                # 1-based indexing
-                idx_column = list(range(1, nprim + 1))
-                point_places = [0] + [4 + 8 * i + 15 * (i - 1) for i in range(1, ncol)]
-                s += write_matrix([idx_column, exponents, *coefficients], point_places)
+    s.append('{}-ECP GEN    {}    {}\n'.format(sym, data['element_ecp_electrons'], max_ecp_am))
 
-        s += "$END"
+    for pot in ecp_list:
+        rexponents = pot['potential_r_exponents']
+        gexponents = pot['potential_gaussian_exponents']
+        coefficients = pot['potential_coefficients']
+        nprim = len(rexponents)
 
-    # Write out ECP
-    if len(ecp_elements) > 0:
-        s += "\n\n$ECP\n"
+        am = pot['potential_angular_momentum']
+        amchar = lut.amint_to_char(am, hij=False)
+
+        # Title line
+        if am[0] == max_ecp_am:
+            s.append('{:<5} ----- {}-ul potential -----\n'.format(nprim, amchar))
+        else:
+            s.append('{:<5} ----- {}-{} potential -----\n'.format(nprim, amchar, max_ecp_amchar))
+
+        point_places = [8, 23, 32]
+        s.append(write_matrix([*coefficients, rexponents, gexponents], point_places))
+
+    return ''.join(s)
+
+
+# Manipulations done before writing (uncontract all but SP)
+gamess_us_transforms = ['uncontract_general', ('uncontract_spdf', 1), 'sort_basis']
+
+
+def gamess_us_block_functions(basis):
+    '''Obtain the functions that write the electron basis and ECP for a single element'''
 
-        for z in ecp_elements:
-            data = basis['basis_set_elements'][z]
-            sym = lut.element_sym_from_Z(z).upper()
-            max_ecp_am = max([x['potential_angular_momentum'][0] for x in data['element_ecp']])
-            max_ecp_amchar = lut.amint_to_char([max_ecp_am], hij=True)
+    return _electron_block, _ecp_block
 
-            # Sort lowest->highest, then put the highest at the beginning
-            ecp_list = sorted(data['element_ecp'], key=lambda x: x['potential_angular_momentum'])
-            ecp_list.insert(0, ecp_list.pop())
 
-            s += '{}-ECP GEN    {}    {}\n'.format(sym, data['element_ecp_electrons'], max_ecp_am)
+def assemble_gamess_us(electron_blocks, ecp_blocks):
+    '''Yields the GAMESS-US output, given the blocks for the electron basis and ECP of each element
 
-            for pot in ecp_list:
-                rexponents = pot['potential_r_exponents']
-                gexponents = pot['potential_gaussian_exponents']
-                coefficients = pot['potential_coefficients']
-                nprim = len(rexponents)
+    electron_blocks and ecp_blocks are iterables of the blocks for each element, or None
+    if no elements have an electron basis or ECP (respectively)
+    '''
+
+    # Electron Basis
+    if electron_blocks is not None:
+        # electronic part starts with $DATA
+        yield '$DATA\n'
+        yield from electron_blocks
+        yield "$END"
+
+    # Write out ECP
+    if ecp_blocks is not None:
+        yield "\n\n$ECP\n"
+        yield from ecp_blocks
+        yield "$END\n"
 
-                am = pot['potential_angular_momentum']
-                amchar = lut.amint_to_char(am, hij=False)
 
-                # Title line
-                if am[0] == max_ecp_am:
-                    s += '{:<5} ----- {}-ul potential -----\n'.format(nprim, amchar)
-                else:
-                    s += '{:<5} ----- {}-{} potential -----\n'.format(nprim, amchar, max_ecp_amchar)
+def iter_gamess_us(basis, executor=None):
+    '''Converts a basis set to GAMESS-US, yielding the text in chunks
+
+    If executor is given, the elements are manipulated and written
+    in parallel (see :func:`basis_set_exchange.converters.common.iter_element_blocks`)
+    '''
+
+    basis = manip.transform_basis(basis, gamess_us_transforms, executor=executor)
+    yield from assemble_gamess_us(*iter_basis_blocks(basis, *gamess_us_block_functions(basis), executor))
 
-                point_places = [8, 23, 32]
-                s += write_matrix([*coefficients, rexponents, gexponents], point_places)
 
-        s += "$END\n"
+def write_gamess_us(basis, executor=None):
+    '''Converts a basis set to GAMESS-US
+
+    If executor is given, the elements are manipulated and written
+    in parallel (see :func:`iter_gamess_us`)
+    '''
 
-    return s
+    return ''.join(iter_gamess_us(basis, executor))
@@ -4,80 +4,112 @@ Conversion of basis sets to NWChem format
 
 from .. import lut
 from .. import manip
-from .common import write_matrix
+from .common import write_matrix, iter_basis_blocks
 
 
-def write_nwchem(basis):
-    '''Converts a basis set to NWChem format
-    '''
+def _electron_block(z, data):
+    '''Writes the electron basis for a single element'''
 
-    # Uncontract all but SP
-    basis = manip.uncontract_spdf(basis, 1)
-    basis = manip.sort_basis(basis)
+    s = []
+    sym = lut.element_sym_from_Z(z, True)
+    s.append('#BASIS SET: {}\n'.format(manip.contraction_string(data)))
 
-    s = ''
+    for shell in data['element_electron_shells']:
+        exponents = shell['shell_exponents']
+        coefficients = shell['shell_coefficients']
+        ncol = len(coefficients) + 1
 
-    # Elements for which we have electron basis
-    electron_elements = [k for k, v in basis['basis_set_elements'].items() if 'element_electron_shells' in v]
+        am = shell['shell_angular_momentum']
+        amchar = lut.amint_to_char(am).upper()
+        s.append('{}    {}\n'.format(sym, amchar))
 
-    # Elements for which we have ECP
-    ecp_elements = [k for k, v in basis['basis_set_elements'].items() if 'element_ecp' in v]
+        point_places = [8 * i + 15 * (i - 1) for i in range(1, ncol + 1)]
+        s.append(write_matrix([exponents, *coefficients], point_places))
 
-    if len(electron_elements) > 0:
-        # basis set starts with a string
-        s += 'BASIS "ao basis" PRINT\n'
+    return ''.join(s)
 
-        # Electron Basis
-        for z in electron_elements:
-            data = basis['basis_set_elements'][z]
-            sym = lut.element_sym_from_Z(z, True)
-            s += '#BASIS SET: {}\n'.format(manip.contraction_string(data))
 
-            for shell in data['element_electron_shells']:
-                exponents = shell['shell_exponents']
-                coefficients = shell['shell_coefficients']
-                ncol = len(coefficients) + 1
+def _ecp_block(z, data):
+    '''Writes the ECP for a single element'''
 
-                am = shell['shell_angular_momentum']
-                amchar = lut.amint_to_char(am).upper()
-                s += '{}    {}\n'.format(sym, amchar)
+    s = []
+    sym = lut.element_sym_from_Z(z, True)
+    max_ecp_am = max([x['potential_angular_momentum'][0] for x in data['element_ecp']])
 
-                point_places = [8 * i + 15 * (i - 1) for i in range(1, ncol + 1)]
-                s += write_matrix([exponents, *coefficients], point_places)
+    # Sort lowest->highest, then put the highest at the beginning
+    ecp_list = sorted(data['element_ecp'], key=lambda x: x['potential_angular_momentum'])
+    ecp_list.insert(0, ecp_list.pop())
 
-        s += 'END\n'
+    s.append('{} nelec {}\n'.format(sym, data['element_ecp_electrons']))
 
-    # Write out ECP
-    if len(ecp_elements) > 0:
-        s += '\n\nECP\n'
+    for pot in ecp_list:
+        rexponents = pot['potential_r_exponents']
+        gexponents = pot['potential_gaussian_exponents']
+        coefficients = pot['potential_coefficients']
+
+        am = pot['potential_angular_momentum']
+        amchar = lut.amint_to_char(am).upper()
+
+        if am[0] == max_ecp_am:
+            s.append('{} ul\n'.format(sym))
+        else:
+            s.append('{} {}\n'.format(sym, amchar))
 
-        for z in ecp_elements:
-            data = basis['basis_set_elements'][z]
-            sym = lut.element_sym_from_Z(z, True)
-            max_ecp_am = max([x['potential_angular_momentum'][0] for x in data['element_ecp']])
+        point_places = [0, 10, 33]
+        s.append(write_matrix([rexponents, gexponents, *coefficients], point_places))
 
-            # Sort lowest->highest, then put the highest at the beginning
-            ecp_list = sorted(data['element_ecp'], key=lambda x: x['potential_angular_momentum'])
-            ecp_list.insert(0, ecp_list.pop())
+    return ''.join(s)
 
-            s += '{} nelec {}\n'.format(sym, data['element_ecp_electrons'])
 
-            for pot in ecp_list:
-                rexponents = pot['potential_r_exponents']
-                gexponents = pot['potential_gaussian_exponents']
-                coefficients = pot['potential_coefficients']
+# Manipulations done before writing (uncontract all but SP)
+nwchem_transforms = [('uncontract_spdf', 1), 'sort_basis']
 
-                am = pot['potential_angular_momentum']
-                amchar = lut.amint_to_char(am).upper()
 
-                if am[0] == max_ecp_am:
-                    s += '{} ul\n'.format(sym)
-                else:
-                    s += '{} {}\n'.format(sym, amchar)
+def nwchem_block_functions(basis):
+    '''Obtain the functions that write the electron basis and ECP for a single element'''
 
-                point_places = [0, 10, 33]
-                s += write_matrix([rexponents, gexponents, *coefficients], point_places)
+    return _electron_block, _ecp_block
 
-        s += 'END\n'
 
-    return s
+def assemble_nwchem(electron_blocks, ecp_blocks):
+    '''Yields the NWChem output, given the blocks for the electron basis and ECP of each element
+
+    electron_blocks and ecp_blocks are iterables of the blocks for each element, or None
+    if no elements have an electron basis or ECP (respectively)
+    '''
+
+    if electron_blocks is not None:
+        # basis set starts with a string
+        yield 'BASIS "ao basis" PRINT\n'
+
+        # Electron Basis
+        yield from electron_blocks
+
+        yield 'END\n'
+
+    # Write out ECP
+    if ecp_blocks is not None:
+        yield '\n\nECP\n'
+        yield from ecp_blocks
+        yield 'END\n'
+
+
+def iter_nwchem(basis, executor=None):
+    '''Converts a basis set to NWChem format, yielding the text in chunks
+
+    If executor is given, the elements are manipulated and written
+    in parallel (see :func:`basis_set_exchange.converters.common.iter_element_blocks`)
+    '''
+
+    basis = manip.transform_basis(basis, nwchem_transforms, executor=executor)
+    yield from assemble_nwchem(*iter_basis_blocks(basis, *nwchem_block_functions(basis), executor))
+
+
+def write_nwchem(basis, executor=None):
+    '''Converts a basis set to NWChem format
+
+    If executor is given, the elements are manipulated and written
+    in parallel (see :func:`iter_nwchem`)
+    '''
+
+    return ''.join(iter_nwchem(basis, executor))
@@ -2,11 +2,25 @@
 Conversion of basis sets to Gaussian format
 '''
 
-from .g94 import write_g94
+from .g94 import iter_g94, assemble_g94, g94_transforms, g94_block_functions
 
+# Psi4 uses the same blocks as gaussian94
+psi4_transforms = g94_transforms
+psi4_block_functions = g94_block_functions
 
-def write_psi4(basis):
-    '''Converts a basis set to Psi4 format
+
+def assemble_psi4(electron_blocks, ecp_blocks):
+    '''Yields the Psi4 output, given the blocks for the electron basis and ECP of each element
+
+    See :func:`basis_set_exchange.converters.g94.assemble_g94`
+    '''
+
+    yield '****\n'
+    yield from assemble_g94(electron_blocks, ecp_blocks)
+
+
+def iter_psi4(basis, executor=None):
+    '''Converts a basis set to Psi4 format, yielding the text in chunks
 
     Psi4 uses the same output as gaussian94, except
     that the first line must be cartesian/spherical,
@@ -16,6 +30,11 @@ def write_psi4(basis):
     be the first non-blank line.
     '''
 
-    s = '****\n'
-    s += write_g94(basis)
-    return s
+    yield '****\n'
+    yield from iter_g94(basis, executor)
+
+
+def write_psi4(basis, executor=None):
+    '''Converts a basis set to Psi4 format (see :func:`iter_psi4`)'''
+
+    return ''.join(iter_psi4(basis, executor))
@@ -2,87 +2,128 @@
 Conversion of basis sets to Turbomole format
 '''
 
+import functools
+
 from .. import lut
 from .. import manip
-from .common import write_matrix
+from .common import write_matrix, iter_basis_blocks
+
+
+def _electron_block(basis_name, z, data):
+    '''Writes the electron basis for a single element'''
+
+    s = []
+    sym = lut.element_sym_from_Z(z, False)
+    s.append('{} {}\n'.format(sym, basis_name))
+    s.append('*\n')
+
+    for shell in data['element_electron_shells']:
+        exponents = shell['shell_exponents']
+        coefficients = shell['shell_coefficients']
+        ncol = len(coefficients) + 1
+        nprim = len(exponents)
+
+        am = shell['shell_angular_momentum']
+        amchar = lut.amint_to_char(am, hij=True)
+        s.append('    {}   {}\n'.format(nprim, amchar))
+
+        point_places = [8 * i + 15 * (i - 1) for i in range(1, ncol + 1)]
+        s.append(write_matrix([exponents, *coefficients], point_places, convert_exp=True))
+
+    s.append('*\n')
+    return ''.join(s)
+
+
+def _ecp_block(basis_name, z, data):
+    '''Writes the ECP for a single element'''
+
+    s = []
+    sym = lut.element_sym_from_Z(z)
+    s.append('{} {}-ecp\n'.format(sym, basis_name))
+    s.append('*\n')
+
+    max_ecp_am = max([x['potential_angular_momentum'][0] for x in data['element_ecp']])
+    max_ecp_amchar = lut.amint_to_char([max_ecp_am], hij=True)
+
+    # Sort lowest->highest, then put the highest at the beginning
+    ecp_list = sorted(data['element_ecp'], key=lambda x: x['potential_angular_momentum'])
+    ecp_list.insert(0, ecp_list.pop())
+
+    s.append('  ncore = {}   lmax = {}\n'.format(data['element_ecp_electrons'], max_ecp_am))
+
+    for pot in ecp_list:
+        rexponents = pot['potential_r_exponents']
+        gexponents = pot['potential_gaussian_exponents']
+        coefficients = pot['potential_coefficients']
+
+        am = pot['potential_angular_momentum']
+        amchar = lut.amint_to_char(am, hij=True)
+
+        if am[0] == max_ecp_am:
+            s.append('{}\n'.format(amchar))
+        else:
+            s.append('{}-{}\n'.format(amchar, max_ecp_amchar))
 
+        point_places = [9, 23, 32]
+        s.append(write_matrix([*coefficients, rexponents, gexponents], point_places, convert_exp=True))
+    s.append('*\n')
 
-def write_turbomole(basis):
-    '''Converts a basis set to Gaussian format
+    return ''.join(s)
+
+
+# Manipulations done before writing (TM basis sets are completely uncontracted)
+turbomole_transforms = ['uncontract_general', 'uncontract_spdf', 'sort_basis']
+
+
+def turbomole_block_functions(basis):
+    '''Obtain the functions that write the electron basis and ECP for a single element
+
+    These include the name of the basis set.
     '''
 
-    s = '$basis\n'
-    s += '*\n'
+    return (functools.partial(_electron_block, basis['basis_set_name']),
+            functools.partial(_ecp_block, basis['basis_set_name']))
+
 
-    # TM basis sets are completely uncontracted
-    basis = manip.uncontract_general(basis)
-    basis = manip.uncontract_spdf(basis)
-    basis = manip.sort_basis(basis)
+def assemble_turbomole(electron_blocks, ecp_blocks):
+    '''Yields the Turbomole output, given the blocks for the electron basis and ECP of each element
 
-    # Elements for which we have electron basis
-    electron_elements = [k for k, v in basis['basis_set_elements'].items() if 'element_electron_shells' in v]
+    electron_blocks and ecp_blocks are iterables of the blocks for each element, or None
+    if no elements have an electron basis or ECP (respectively)
+    '''
 
-    # Elements for which we have ECP
-    ecp_elements = [k for k, v in basis['basis_set_elements'].items() if 'element_ecp' in v]
+    yield '$basis\n'
+    yield '*\n'
 
     # Electron Basis
-    if len(electron_elements) > 0:
-        for z in electron_elements:
-            data = basis['basis_set_elements'][z]
-            sym = lut.element_sym_from_Z(z, False)
-            s += '{} {}\n'.format(sym, basis['basis_set_name'])
-            s += '*\n'
+    if electron_blocks is not None:
+        yield from electron_blocks
+
+    # Write out ECP
+    if ecp_blocks is not None:
+        yield '$ecp\n'
+        yield '*\n'
+        yield from ecp_blocks
+
+    yield '$end\n'
 
-            for shell in data['element_electron_shells']:
-                exponents = shell['shell_exponents']
-                coefficients = shell['shell_coefficients']
-                ncol = len(coefficients) + 1
-                nprim = len(exponents)
 
-                am = shell['shell_angular_momentum']
-                amchar = lut.amint_to_char(am, hij=True)
-                s += '    {}   {}\n'.format(nprim, amchar)
+def iter_turbomole(basis, executor=None):
+    '''Converts a basis set to Turbomole format, yielding the text in chunks
 
-                point_places = [8 * i + 15 * (i - 1) for i in range(1, ncol + 1)]
-                s += write_matrix([exponents, *coefficients], point_places, convert_exp=True)
+    If executor is given, the elements are manipulated and written
+    in parallel (see :func:`basis_set_exchange.converters.common.iter_element_blocks`)
+    '''
 
-            s += '*\n'
+    basis = manip.transform_basis(basis, turbomole_transforms, executor=executor)
+    yield from assemble_turbomole(*iter_basis_blocks(basis, *turbomole_block_functions(basis), executor))
 
-    # Write out ECP
-    if len(ecp_elements) > 0:
-        s += '$ecp\n'
-        s += '*\n'
-        for z in ecp_elements:
-            data = basis['basis_set_elements'][z]
-            sym = lut.element_sym_from_Z(z)
-            s += '{} {}-ecp\n'.format(sym, basis['basis_set_name'])
-            s += '*\n'
-
-            max_ecp_am = max([x['potential_angular_momentum'][0] for x in data['element_ecp']])
-            max_ecp_amchar = lut.amint_to_char([max_ecp_am], hij=True)
-
-            # Sort lowest->highest, then put the highest at the beginning
-            ecp_list = sorted(data['element_ecp'], key=lambda x: x['potential_angular_momentum'])
-            ecp_list.insert(0, ecp_list.pop())
-
-            s += '  ncore = {}   lmax = {}\n'.format(data['element_ecp_electrons'], max_ecp_am)
-
-            for pot in ecp_list:
-                rexponents = pot['potential_r_exponents']
-                gexponents = pot['potential_gaussian_exponents']
-                coefficients = pot['potential_coefficients']
-
-                am = pot['potential_angular_momentum']
-                amchar = lut.amint_to_char(am, hij=True)
-
-                if am[0] == max_ecp_am:
-                    s += '{}\n'.format(amchar)
-                else:
-                    s += '{}-{}\n'.format(amchar, max_ecp_amchar)
-
-                point_places = [9, 23, 32]
-                s += write_matrix([*coefficients, rexponents, gexponents], point_places, convert_exp=True)
-            s += '*\n'
-
-    s += '$end\n'
-    return s
+
+def write_turbomole(basis, executor=None):
+    '''Converts a basis set to Turbomole format
+
+    If executor is given, the elements are manipulated and written
+    in parallel (see :func:`iter_turbomole`)
+    '''
+
+    return ''.join(iter_turbomole(basis, executor))
@@ -4,6 +4,7 @@ Functions for comparing basis sets and pieces of basis sets
 
 import operator
 import copy
+from .. import numlist
 from ..manip import sort_shells, sort_potentials
 
 
@@ -75,9 +76,12 @@ def _compare_vector(arr1, arr2, rel_tol):
     if len(arr2) != length:
         return False
 
+    values1 = numlist.values(arr1)
+    values2 = numlist.values(arr2)
+
     for i in range(length):
-        element_1 = float(arr1[i])
-        element_2 = float(arr2[i])
+        element_1 = values1[i]
+        element_2 = values2[i]
 
         diff = abs(abs(element_1) - abs(element_2))
         if diff != 0.0:
@@ -155,6 +159,11 @@ def electron_shells_are_subset(subset, superset, compare_meta=False, rel_tol=0.0
 
     If compare_meta is True, the metadata is also compared for exact equality. 
     '''
+
+    # Each shell is compared many times, so only convert the values once
+    subset = [numlist.shell_to_number_lists(x) for x in subset]
+    superset = [numlist.shell_to_number_lists(x) for x in superset]
+
     for item1 in subset:
         for item2 in superset:
             if compare_electron_shells(item1, item2, compare_meta, rel_tol):
@@ -0,0 +1,112 @@
+'''
+Persistent, on-disk cache of composed basis set data
+
+This cache is disabled by default. It is enabled by setting
+:attr:`cache_dir` to a directory (which will be created if needed).
+
+Each entry stores the paths of all the files that were read to create it,
+along with their modification times and sizes. If any of those files has
+changed (or no longer exists), the entry is ignored and later overwritten.
+
+Entries are written to a temporary file and then atomically moved into
+place, so several processes may safely share the same cache directory.
+'''
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+# Directory to store the cache in. If None, the disk cache is not used
+cache_dir = None
+
+# Increase this when the layout of the cached data changes, so that
+# entries written by older versions of this library are not used
+_cache_format_version = 1
+
+
+def file_stamp(file_path):
+    '''Obtain the modification time and size of a file, or None if it does not exist'''
+
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _entry_path(key):
+    '''Obtain the path to the file for a given cache key'''
+
+    key_str = repr((_cache_format_version, key))
+    key_hash = hashlib.sha256(key_str.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, key_hash + '.pickle')
+
+
+def read_entry(key):
+    '''Read data from the cache
+
+    The key must be a tuple whose repr uniquely identifies the data.
+    If the cache is disabled, the entry does not exist, or any of the
+    files the data was created from have changed, None is returned.
+    '''
+
+    if cache_dir is None:
+        return None
+
+    entry_path = _entry_path(key)
+
+    # An unreadable entry (for example, one that was truncated)
+    # is treated as if it did not exist
+    try:
+        with open(entry_path, 'rb') as f:
+            entry = pickle.load(f)
+    except Exception:
+        return None
+
+    # Guard against hash collisions
+    if entry['key'] != key:
+        return None
+
+    for file_path, stamp in entry['files'].items():
+        if file_stamp(file_path) != stamp:
+            return None
+
+    return entry['data']
+
+
+def write_entry(key, data, file_paths):
+    '''Write data to the cache
+
+    The key must be a tuple whose repr uniquely identifies the data.
+    `file_paths` contains the paths to all the files that `data` was created from.
+    Nothing is done if the cache is disabled.
+    '''
+
+    if cache_dir is None:
+        return
+
+    files = {os.path.abspath(p): file_stamp(p) for p in file_paths}
+    entry = {'key': key, 'files': files, 'data': data}
+
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, _entry_path(key))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def clear():
+    '''Remove all entries from the cache directory'''
+
+    if cache_dir is None or not os.path.isdir(cache_dir):
+        return
+
+    for filename in os.listdir(cache_dir):
+        if filename.endswith('.pickle'):
+            os.remove(os.path.join(cache_dir, filename))
@@ -0,0 +1,226 @@
+'''
+Export of all basis sets in the library to files
+
+All versions of all basis sets are written in each format (and optionally, their references
+in each reference format) into a directory tree, with one subdirectory per format.
+Output files are named after the basis set and its version
+(for example, `nwchem/cc-pvdz.1.nw`).
+
+The output has deterministic headers (see :func:`basis_set_exchange.get_basis_etag`).
+The ETag of each file is stored in a manifest in the output directory, so that running the
+export again only writes files whose data (or the library itself) has changed.
+
+This can also be run from the command line, for example
+
+    python -m basis_set_exchange.export /path/to/mirror --workers 16
+'''
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from . import api, converters, fileio, refconverters
+
+# Name of the file (in the output directory) containing the ETags of all the output files
+manifest_filename = '.bse_export_manifest.json'
+
+
+def _basis_filename(name):
+    '''Convert a basis set name into something that can be used as a file name'''
+
+    return name.replace(' ', '_').replace('/', '_sl_').replace('*', '_st_')
+
+
+def _references_etag(name, version, ref_fmt, data_dir):
+    '''Obtain an ETag for the references of a basis set (see :func:`basis_set_exchange.get_basis_etag`)'''
+
+    h = hashlib.sha256()
+    h.update(api.get_basis_etag(name, version=version, data_dir=data_dir).encode('utf-8'))
+    h.update(ref_fmt.encode('utf-8'))
+
+    # All the data (including references) is in bundles and mapped libraries,
+    # and so is already part of the ETag
+    if fileio.data_backend(data_dir) == 'directory':
+        h.update(fileio.file_digest(os.path.join(data_dir, 'REFERENCES.json')).encode('utf-8'))
+
+    return h.hexdigest()
+
+
+def _write_file(file_path, write_func):
+    '''Write a file by calling write_func with a file object, replacing the file only if successful'''
+
+    dirpath = os.path.dirname(file_path)
+    os.makedirs(dirpath, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=dirpath, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            write_func(f)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _export_basis(dest_dir, name, version, outputs, data_dir):
+    '''Write the outputs for one version of a basis set
+
+    outputs is a list of tuples of (relative path, kind, format), where kind is 'basis' or 'references'.
+    The basis set is only composed once for all the outputs.
+    '''
+
+    for relpath, kind, fmt in outputs:
+        file_path = os.path.join(dest_dir, relpath)
+
+        if kind == 'basis':
+            _write_file(
+                file_path, lambda f: api.get_basis_stream(
+                    name, fmt, f, version=version, data_dir=data_dir, deterministic=True))
+        else:
+            ref_str = api.get_references(name, version=version, fmt=fmt, data_dir=data_dir)
+            _write_file(file_path, lambda f: f.write(ref_str))
+
+    return [x[0] for x in outputs]
+
+
+def _read_manifest(dest_dir):
+    '''Read the ETags of previously-exported files (an empty dictionary if there is no manifest)'''
+
+    try:
+        with open(os.path.join(dest_dir, manifest_filename), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(dest_dir, manifest):
+    '''Write the ETags of all exported files'''
+
+    manifest_path = os.path.join(dest_dir, manifest_filename)
+    _write_file(manifest_path, lambda f: json.dump(manifest, f, indent=4, sort_keys=True))
+
+
+def export_library(dest_dir,
+                   fmts=None,
+                   reference_fmts=None,
+                   data_dir=None,
+                   executor=None,
+                   incremental=True,
+                   archive_format=None):
+    '''Write all versions of all basis sets in the given formats to a directory
+
+    Parameters
+    ----------
+    dest_dir : str
+        Directory to write the files to. This is created if it doesn't exist.
+    fmts : list
+        Basis set formats to write (see :func:`basis_set_exchange.get_formats`).
+        By default, all formats are written.
+    reference_fmts : list
+        Reference formats to write (see :func:`basis_set_exchange.get_reference_formats`).
+        By default, references are not written.
+    data_dir : str
+        Data directory with all the basis set information. By default,
+        it is in the 'data' subdirectory of this project. This may also be a bundle or mapped library.
+    executor : concurrent.futures.Executor
+        If given, each basis set is exported in parallel using this executor
+        (usually a :class:`concurrent.futures.ProcessPoolExecutor`).
+    incremental : bool
+        If True, files that exist from a previous export and whose data has not
+        changed since then are not written again.
+    archive_format : str
+        If given, an archive of the output directory is also created next to it, in this
+        format (see :func:`shutil.make_archive`, for example 'zip' or 'gztar').
+
+    Returns
+    -------
+    dict
+        The number of files that were written and skipped, as 'written' and 'skipped'
+    '''
+
+    data_dir = api.get_default_data_dir() if data_dir is None else data_dir
+    fmts = list(converters.get_formats()) if fmts is None else [x.lower() for x in fmts]
+    reference_fmts = [] if reference_fmts is None else [x.lower() for x in reference_fmts]
+
+    old_manifest = _read_manifest(dest_dir) if incremental else {}
+    manifest = {}
+
+    # Find all the outputs that need to be written, grouped by basis set and version
+    tasks = []
+    nskipped = 0
+    for name, bs_data in sorted(api.get_metadata(data_dir).items()):
+        for version in bs_data['versions']:
+            filebase = '{}.{}'.format(_basis_filename(name), version)
+
+            outputs = []
+            for fmt in fmts:
+                relpath = os.path.join(fmt, filebase + converters.get_format_extension(fmt))
+                etag = api.get_basis_etag(name, version=version, fmt=fmt, data_dir=data_dir)
+                outputs.append((relpath, 'basis', fmt, etag))
+            for ref_fmt in reference_fmts:
+                relpath = os.path.join('references', ref_fmt, filebase + refconverters.get_format_extension(ref_fmt))
+                etag = _references_etag(name, version, ref_fmt, data_dir)
+                outputs.append((relpath, 'references', ref_fmt, etag))
+
+            needed = []
+            for relpath, kind, fmt, etag in outputs:
+                if old_manifest.get(relpath) == etag and os.path.isfile(os.path.join(dest_dir, relpath)):
+                    manifest[relpath] = etag
+                    nskipped += 1
+                else:
+                    needed.append((relpath, kind, fmt, etag))
+
+            if needed:
+                tasks.append((name, version, needed))
+
+    args = [(dest_dir, name, version, [x[:3] for x in needed], data_dir) for name, version, needed in tasks]
+    if executor is None:
+        results = [_export_basis(*x) for x in args]
+    else:
+        results = list(executor.map(_export_basis, *zip(*args))) if args else []
+
+    # If anything failed, an exception was raised above and the old manifest is kept
+    all_etags = {x[0]: x[3] for _, _, needed in tasks for x in needed}
+    for written in results:
+        manifest.update((relpath, all_etags[relpath]) for relpath in written)
+
+    _write_manifest(dest_dir, manifest)
+
+    if archive_format is not None:
+        dest_dir = os.path.normpath(dest_dir)
+        shutil.make_archive(dest_dir, archive_format, dest_dir)
+
+    return {'written': len(manifest) - nskipped, 'skipped': nskipped}
+
+
+def main(argv=None):
+    '''Run the export from the command line'''
+
+    parser = argparse.ArgumentParser(description='Export all basis sets of the Basis Set Exchange to files')
+    parser.add_argument('dest_dir', help='Directory to write the files to')
+    parser.add_argument('--fmt', action='append', help='Basis set format to write (default: all formats)')
+    parser.add_argument('--ref-fmt', action='append', help='Reference format to write (default: none)')
+    parser.add_argument('--data-dir', help='Data directory, bundle, or mapped library to use')
+    parser.add_argument('--workers', type=int, default=None, help='Number of processes to use (default: all CPUs)')
+    parser.add_argument('--full', action='store_true', help='Write all files, even if they have not changed')
+    parser.add_argument('--archive', help='Also create an archive in this format (ie, zip or gztar)')
+    args = parser.parse_args(argv)
+
+    with ProcessPoolExecutor(args.workers) as executor:
+        stats = export_library(args.dest_dir,
+                               fmts=args.fmt,
+                               reference_fmts=args.ref_fmt,
+                               data_dir=args.data_dir,
+                               executor=executor,
+                               incremental=not args.full,
+                               archive_format=args.archive)
+
+    print('Wrote {} files, skipped {} unchanged files'.format(stats['written'], stats['skipped']))
+
+
+if __name__ == '__main__':
+    main()
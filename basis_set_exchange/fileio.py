@@ -5,8 +5,22 @@ basis set format
 
 import codecs
 import collections
+import hashlib
 import json
 import os
+import re
+import threading
+
+from . import bundle, diskcache, mapped
+
+# Maps the path of a data directory, bundle, or mapped library to
+# (stamp of the path when it was checked, backend)
+_data_backends = {}
+
+# Digests of the contents of files, along with the modification time and size
+# of the file when it was read. Only accessed with the lock held
+_file_digests = {}
+_file_digests_lock = threading.Lock()
 
 
 def _read_plain_json(file_path, check_bse):
@@ -46,6 +60,52 @@ def _read_plain_json(file_path, check_bse):
     return js
 
 
+_json_whitespace = re.compile(r'[ \t\n\r]*')
+
+
+def _read_json_keys(text, keys, stop_key):
+    """
+    Decodes only some of the top-level keys of a JSON object
+
+    Keys are decoded in order until all the given keys have been found. If the stop_key
+    is reached first (or the text is not formatted as expected), None is returned.
+    Values of keys after the last key wanted (in particular, stop_key) are never decoded.
+    """
+
+    decoder = json.JSONDecoder()
+    keys = set(keys)
+    ret = {}
+
+    try:
+        pos = _json_whitespace.match(text).end()
+        if text[pos] != '{':
+            return None
+        pos += 1
+
+        while keys - ret.keys():
+            pos = _json_whitespace.match(text, pos).end()
+            if text[pos] != '"':
+                return None
+
+            key, pos = decoder.raw_decode(text, pos)
+            pos = _json_whitespace.match(text, pos).end()
+            if key == stop_key or text[pos] != ':':
+                return None
+
+            pos = _json_whitespace.match(text, pos + 1).end()
+            value, pos = decoder.raw_decode(text, pos)
+            if key in keys:
+                ret[key] = value
+
+            pos = _json_whitespace.match(text, pos).end()
+            if text[pos] == ',':
+                pos += 1
+    except (IndexError, json.decoder.JSONDecodeError):
+        return None
+
+    return ret
+
+
 def _write_plain_json(file_path, js):
     """
     Write information to a JSON file
@@ -282,3 +342,186 @@ def read_notes_file(file_path):
 
     with open(file_path, 'r') as f:
         return f.read()
+
+
+def data_backend(data_dir):
+    """
+    Determines what kind of data source a path is
+
+    The header of the file is only read the first time, or when the file has changed
+    (its modification time or size is different).
+
+    Parameters
+    ----------
+    data_dir : str
+        Path to a data directory, bundle file, or mapped library file
+
+    Returns
+    -------
+    str
+        'mapped', 'bundle', or 'directory'
+    """
+
+    stamp = diskcache.file_stamp(data_dir)
+    cached = _data_backends.get(data_dir)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    backend = 'directory'
+    if os.path.isfile(data_dir):
+        with open(data_dir, 'rb') as f:
+            header = f.read(max(len(mapped.file_magic), len(bundle.file_magic)))
+
+        if header.startswith(mapped.file_magic):
+            backend = 'mapped'
+        elif header.startswith(bundle.file_magic):
+            backend = 'bundle'
+
+    _data_backends[data_dir] = (stamp, backend)
+    return backend
+
+
+def file_digest(file_path):
+    """
+    Obtains a digest (SHA-256, as a hex string) of the contents of a file
+
+    The digest is only computed again if the modification time or size of the file change.
+    This may be called from multiple threads.
+
+    Parameters
+    ----------
+    file_path : str
+        Full path to the file
+    """
+
+    stamp = diskcache.file_stamp(file_path)
+    if stamp is None:
+        raise FileNotFoundError('File {} does not exist'.format(file_path))
+
+    with _file_digests_lock:
+        cached = _file_digests.get(file_path)
+
+    # The file is read without holding the lock, so other files can be read at the same time
+    if cached is None or cached[0] != stamp:
+        with open(file_path, 'rb') as f:
+            cached = (stamp, hashlib.sha256(f.read()).hexdigest())
+        with _file_digests_lock:
+            _file_digests[file_path] = cached
+
+    return cached[1]
+
+
+def read_data_basis(data_dir, file_relpath, elements=None):
+    """
+    Reads basis set information from a file in a data directory or bundle
+
+    If elements is given, the returned data only contains those elements.
+    When reading from a bundle, the data for other elements is not read at all
+    (see :mod:`basis_set_exchange.bundle`).
+
+    Parameters
+    ----------
+    data_dir : str
+        Path to the data directory or bundle file
+    file_relpath : str
+        Path to the file to read, relative to data_dir
+    elements : iterable
+        Elements (Z numbers as strings) to read
+    """
+
+    backend = data_backend(data_dir)
+    if backend == 'mapped':
+        raise RuntimeError('Individual basis set files are not stored in mapped library {}'.format(data_dir))
+    elif backend == 'bundle':
+        js = bundle.read_json(data_dir, file_relpath, elements)
+        if 'molssi_bse_schema' not in js:
+            raise RuntimeError('File {} does not appear to be a BSE JSON file'.format(file_relpath))
+    else:
+        js = read_json_basis(os.path.join(data_dir, file_relpath))
+
+    if elements is not None and 'basis_set_elements' in js:
+        js['basis_set_elements'] = {k: v for k, v in js['basis_set_elements'].items() if k in elements}
+
+    return js
+
+
+def read_data_basis_keys(data_dir, file_relpath, keys):
+    """
+    Reads only some of the top-level information from a basis set file in a data directory or bundle
+
+    This is meant for obtaining information such as descriptions and references
+    without decoding the (much larger) data for all the elements. If the keys
+    do not come before 'basis_set_elements' in the file, the whole file is decoded.
+
+    Parameters
+    ----------
+    data_dir : str
+        Path to the data directory or bundle file
+    file_relpath : str
+        Path to the file to read, relative to data_dir
+    keys : iterable
+        Top-level keys to read. All of these must exist in the file.
+    """
+
+    backend = data_backend(data_dir)
+    if backend == 'mapped':
+        raise RuntimeError('Individual basis set files are not stored in mapped library {}'.format(data_dir))
+    elif backend == 'bundle':
+        # Element data is stored separately in bundles
+        js = read_data_basis(data_dir, file_relpath, ())
+    else:
+        file_path = os.path.join(data_dir, file_relpath)
+        js = None
+
+        if os.path.isfile(file_path):
+            with open(file_path, 'r') as f:
+                js = _read_json_keys(f.read(), keys, 'basis_set_elements')
+
+        if js is None:
+            js = read_json_basis(file_path)
+
+    return {k: js[k] for k in keys}
+
+
+def read_data_metadata(data_dir):
+    """
+    Reads the metadata for all basis sets (METADATA.json) from a data directory, bundle, or mapped library
+    """
+
+    backend = data_backend(data_dir)
+    if backend == 'mapped':
+        return mapped.get_library(data_dir).read_json('METADATA.json')
+    elif backend == 'bundle':
+        return bundle.read_json(data_dir, 'METADATA.json')
+    else:
+        return read_metadata(os.path.join(data_dir, 'METADATA.json'))
+
+
+def read_data_references(data_dir):
+    """
+    Reads the reference information (REFERENCES.json) from a data directory, bundle, or mapped library
+    """
+
+    backend = data_backend(data_dir)
+    if backend == 'mapped':
+        return mapped.get_library(data_dir).read_json('REFERENCES.json')
+    elif backend == 'bundle':
+        return bundle.read_json(data_dir, 'REFERENCES.json')
+    else:
+        return read_references(os.path.join(data_dir, 'REFERENCES.json'))
+
+
+def read_data_notes(data_dir, file_relpath):
+    """
+    Returns the contents of a notes file in a data directory, bundle, or mapped library
+
+    If the notes file does not exist, None is returned
+    """
+
+    backend = data_backend(data_dir)
+    if backend == 'mapped':
+        return mapped.get_library(data_dir).read_file(file_relpath)
+    elif backend == 'bundle':
+        return bundle.read_file(data_dir, file_relpath)
+    else:
+        return read_notes_file(os.path.join(data_dir, file_relpath))
@@ -3,11 +3,13 @@ Common basis set manipulations
 
 This module contains functions for uncontracting and merging basis set
 data, as well as some other small functions.
-"""
 
-import copy
+Functions that return a new basis set also accept read-only (frozen) basis
+set data (see :func:`basis_set_exchange.misc.freeze`). The returned data
+is always a regular, modifiable copy.
+"""
 
-from . import lut
+from . import lut, misc, numlist
 
 
 def contraction_string(element):
@@ -63,6 +65,11 @@ def merge_element_data(dest, sources):
 
     ret = dest.copy()
 
+    # These lists are added to, so they must be copied as well
+    for k in ('element_electron_shells', 'element_references'):
+        if k in ret:
+            ret[k] = list(ret[k])
+
     for s in sources:
         if 'element_electron_shells' in s:
             if 'element_electron_shells' not in ret:
@@ -89,6 +96,48 @@ def merge_element_data(dest, sources):
     return ret
 
 
+def _hashable(data):
+    """
+    Converts (nested) dictionaries and lists into a hashable form
+
+    Two objects compare equal if and only if their hashable forms are equal.
+    """
+
+    if isinstance(data, dict):
+        return frozenset((k, _hashable(v)) for k, v in data.items())
+    elif isinstance(data, (list, tuple)):
+        return tuple(_hashable(x) for x in data)
+    return data
+
+
+def _prune_element(el):
+    """
+    Removes primitives with zero coefficients and duplicate shells
+    from the data for a single element (in place)
+    """
+
+    for sh in el['element_electron_shells']:
+        coefficients = sh['shell_coefficients']
+        coeff_values = [numlist.values(x) for x in coefficients]
+
+        # only keep if there is a nonzero contraction coefficient
+        keep = [i for i in range(len(sh['shell_exponents'])) if any(x[i] != 0.0 for x in coeff_values)]
+
+        sh['shell_exponents'] = numlist.select(sh['shell_exponents'], keep)
+        sh['shell_coefficients'] = [numlist.select(x, keep) for x in coefficients] if keep else []
+
+    # Remove any duplicates
+    shells = el.pop('element_electron_shells')
+    el['element_electron_shells'] = []
+
+    seen = set()
+    for sh in shells:
+        key = _hashable(sh)
+        if key not in seen:
+            seen.add(key)
+            el['element_electron_shells'].append(sh)
+
+
 def prune_basis(basis):
     """
     Removes primitives that have a zero coefficient, and
@@ -100,43 +149,46 @@ def prune_basis(basis):
     The input basis set is not modified.
     """
 
-    new_basis = copy.deepcopy(basis)
+    return transform_basis(basis, ['prune_basis'])
 
-    for k, el in new_basis['basis_set_elements'].items():
-        if not 'element_electron_shells' in el:
-            continue
 
-        for sh in el['element_electron_shells']:
-            new_exponents = []
-            new_coefficients = []
+def _uncontract_spdf_element(el, max_am=0):
+    """
+    Removes sp, spd, spdf, etc, contractions from the data for a single element (in place)
+    """
 
-            exponents = sh['shell_exponents']
+    newshells = []
 
-            # transpose of the coefficient matrix
-            coeff_t = list(map(list, zip(*sh['shell_coefficients'])))
+    for sh in el['element_electron_shells']:
 
-            # only add if there is a nonzero contraction coefficient
-            for i in range(len(sh['shell_exponents'])):
-                if not all([float(x) == 0.0 for x in coeff_t[i]]):
-                    new_exponents.append(exponents[i])
-                    new_coefficients.append(coeff_t[i])
+        # am will be a list
+        am = sh['shell_angular_momentum']
+        coeff = sh['shell_coefficients']
 
-            # take the transpose again, putting the general contraction
-            # as the slowest index
-            new_coefficients = list(map(list, zip(*new_coefficients)))
+        # if this is an sp, spd,...  orbital
+        if len(am) > 1:
+            newsh = sh.copy()
+            newsh['shell_angular_momentum'] = []
+            newsh['shell_coefficients'] = []
 
-            sh['shell_exponents'] = new_exponents
-            sh['shell_coefficients'] = new_coefficients
+            ngen = len(sh['shell_coefficients'])
+            for g in range(ngen):
+                if am[g] > max_am:
+                    newsh2 = sh.copy()
+                    newsh2['shell_angular_momentum'] = [am[g]]
+                    newsh2['shell_coefficients'] = [coeff[g]]
+                    newshells.append(newsh2)
+                else:
+                    newsh['shell_angular_momentum'].append(am[g])
+                    newsh['shell_coefficients'].append(coeff[g])
 
-        # Remove any duplicates
-        shells = el.pop('element_electron_shells')
-        el['element_electron_shells'] = []
+            newshells.insert(0, newsh)
 
-        for sh in shells:
-            if sh not in el['element_electron_shells']:
-                el['element_electron_shells'].append(sh)
+        else:
+            newshells.append(sh)
 
-    return new_basis
+    el['element_electron_shells'] = newshells
+    _prune_element(el)
 
 
 def uncontract_spdf(basis, max_am=0):
@@ -152,45 +204,30 @@ def uncontract_spdf(basis, max_am=0):
     zero coefficients are removed
     """
 
-    new_basis = copy.deepcopy(basis)
-
-    for k, el in new_basis['basis_set_elements'].items():
+    return transform_basis(basis, [('uncontract_spdf', max_am)])
 
-        if not 'element_electron_shells' in el:
-            continue
-        newshells = []
 
-        for sh in el['element_electron_shells']:
+def _uncontract_general_element(el):
+    """
+    Removes the general contractions from the data for a single element (in place)
+    """
 
-            # am will be a list
-            am = sh['shell_angular_momentum']
-            coeff = sh['shell_coefficients']
+    newshells = []
 
-            # if this is an sp, spd,...  orbital
-            if len(am) > 1:
+    for sh in el['element_electron_shells']:
+        # Don't uncontract sp, spd,.... orbitals
+        # leave that to uncontract_spdf
+        if len(sh['shell_angular_momentum']) == 1:
+            for c in sh['shell_coefficients']:
+                # copy, them replace 'shell_coefficients'
                 newsh = sh.copy()
-                newsh['shell_angular_momentum'] = []
-                newsh['shell_coefficients'] = []
-
-                ngen = len(sh['shell_coefficients'])
-                for g in range(ngen):
-                    if am[g] > max_am:
-                        newsh2 = sh.copy()
-                        newsh2['shell_angular_momentum'] = [am[g]]
-                        newsh2['shell_coefficients'] = [coeff[g]]
-                        newshells.append(newsh2)
-                    else:
-                        newsh['shell_angular_momentum'].append(am[g])
-                        newsh['shell_coefficients'].append(coeff[g])
-
-                newshells.insert(0, newsh)
-
-            else:
-                newshells.append(sh)
-
-        el['element_electron_shells'] = newshells
+                newsh['shell_coefficients'] = [c]
+                newshells.append(newsh)
+        else:
+            newshells.append(sh)
 
-    return prune_basis(new_basis)
+    el['element_electron_shells'] = newshells
+    _prune_element(el)
 
 
 def uncontract_general(basis):
@@ -201,30 +238,31 @@ def uncontract_general(basis):
     zero coefficients are removed
     """
 
-    new_basis = copy.deepcopy(basis)
+    return transform_basis(basis, ['uncontract_general'])
 
-    for k, el in new_basis['basis_set_elements'].items():
 
-        if not 'element_electron_shells' in el:
-            continue
+def _uncontract_segmented_element(el):
+    """
+    Removes the segmented contractions from the data for a single element (in place)
+    """
 
-        newshells = []
+    newshells = []
 
-        for sh in el['element_electron_shells']:
-            # Don't uncontract sp, spd,.... orbitals
-            # leave that to uncontract_spdf
-            if len(sh['shell_angular_momentum']) == 1:
-                for c in sh['shell_coefficients']:
-                    # copy, them replace 'shell_coefficients'
-                    newsh = sh.copy()
-                    newsh['shell_coefficients'] = [c]
-                    newshells.append(newsh)
-            else:
-                newshells.append(sh)
+    for sh in el['element_electron_shells']:
+        exponents = sh['shell_exponents']
+        nam = len(sh['shell_angular_momentum'])
 
-        el['element_electron_shells'] = newshells
+        for i in range(len(exponents)):
+            newsh = sh.copy()
+            newsh['shell_exponents'] = numlist.select(exponents, [i])
+            newsh['shell_coefficients'] = [["1.00000000"] * nam]
 
-    return prune_basis(new_basis)
+            # Remember to transpose the coefficients
+            newsh['shell_coefficients'] = list(map(list, zip(*newsh['shell_coefficients'])))
+
+            newshells.append(newsh)
+
+    el['element_electron_shells'] = newshells
 
 
 def uncontract_segmented(basis):
@@ -237,134 +275,111 @@ def uncontract_segmented(basis):
     The input basis set is not modified.
     """
 
-    new_basis = copy.deepcopy(basis)
-
-    for k, el in new_basis['basis_set_elements'].items():
-
-        if not 'element_electron_shells' in el:
-            continue
+    return transform_basis(basis, ['uncontract_segmented'])
 
-        newshells = []
 
-        for sh in el['element_electron_shells']:
-            exponents = sh['shell_exponents']
-            nam = len(sh['shell_angular_momentum'])
+def _make_general_element(el):
+    """
+    Makes one large general contraction for each angular momentum
+    in the data for a single element (in place)
+    """
 
-            for i in range(len(exponents)):
-                newsh = sh.copy()
-                newsh['shell_exponents'] = [exponents[i]]
-                newsh['shell_coefficients'] = [["1.00000000"] * nam]
+    zero = '0.00000000'
 
-                # Remember to transpose the coefficients
-                newsh['shell_coefficients'] = list(map(list, zip(*newsh['shell_coefficients'])))
+    _uncontract_spdf_element(el)
 
-                newshells.append(newsh)
+    # See what we have
+    all_am = []
+    for sh in el['element_electron_shells']:
+        if not sh['shell_angular_momentum'] in all_am:
+            all_am.append(sh['shell_angular_momentum'])
 
-        el['element_electron_shells'] = newshells
+    all_am = sorted(all_am)
 
-    return new_basis
+    newshells = []
+    for am in all_am:
+        # TODO - Check all shells to make sure region and harmonic type are consistent
+        newsh = {
+            'shell_angular_momentum': am,
+            'shell_exponents': [],
+            'shell_coefficients': [],
+            'shell_region': 'combined',
+            'shell_harmonic_type': 'spherical'
+        }
 
+        # Do exponents first
+        for sh in el['element_electron_shells']:
+            if sh['shell_angular_momentum'] != am:
+                continue
+            newsh['shell_exponents'].extend(sh['shell_exponents'])
 
-def make_general(basis):
-    """
-    Makes one large general contraction for each angular momentum
+        # Number of primitives in the new shell
+        nprim = len(newsh['shell_exponents'])
 
-    If split_spdf is True, sp... orbitals will be split apary
-    """
+        cur_prim = 0
+        for sh in el['element_electron_shells']:
+            if sh['shell_angular_momentum'] != am:
+                continue
 
-    zero = '0.00000000'
+            ngen = len(sh['shell_coefficients'])
 
-    new_basis = uncontract_spdf(basis)
+            for g in range(ngen):
+                coef = [zero] * cur_prim
+                coef.extend(sh['shell_coefficients'][g])
+                coef.extend([zero] * (nprim - len(coef)))
+                newsh['shell_coefficients'].append(coef)
 
-    for k, el in new_basis['basis_set_elements'].items():
-        if not 'element_electron_shells' in el:
-            continue
+            cur_prim += len(sh['shell_exponents'])
 
-        # See what we have
-        all_am = []
-        for sh in el['element_electron_shells']:
-            if not sh['shell_angular_momentum'] in all_am:
-                all_am.append(sh['shell_angular_momentum'])
-
-        all_am = sorted(all_am)
-
-        newshells = []
-        for am in all_am:
-            # TODO - Check all shells to make sure region and harmonic type are consistent
-            newsh = {
-                'shell_angular_momentum': am,
-                'shell_exponents': [],
-                'shell_coefficients': [],
-                'shell_region': 'combined',
-                'shell_harmonic_type': 'spherical'
-            }
-
-            # Do exponents first
-            for sh in el['element_electron_shells']:
-                if sh['shell_angular_momentum'] != am:
-                    continue
-                newsh['shell_exponents'].extend(sh['shell_exponents'])
-
-            # Number of primitives in the new shell
-            nprim = len(newsh['shell_exponents'])
-
-            cur_prim = 0
-            for sh in el['element_electron_shells']:
-                if sh['shell_angular_momentum'] != am:
-                    continue
-
-                ngen = len(sh['shell_coefficients'])
-
-                for g in range(ngen):
-                    coef = [zero] * cur_prim
-                    coef.extend(sh['shell_coefficients'][g])
-                    coef.extend([zero] * (nprim - len(coef)))
-                    newsh['shell_coefficients'].append(coef)
-
-                cur_prim += len(sh['shell_exponents'])
+        newshells.append(newsh)
 
-            newshells.append(newsh)
+    el['element_electron_shells'] = newshells
+    _prune_element(el)
 
-        el['element_electron_shells'] = newshells
 
-    return prune_basis(new_basis)
+def make_general(basis):
+    """
+    Makes one large general contraction for each angular momentum
 
+    If split_spdf is True, sp... orbitals will be split apary
+    """
 
-def _is_single_column(col):
-    return sum(float(x) != 0.0 for x in col) == 1
+    return transform_basis(basis, ['make_general'])
 
 
-def _is_zero_column(col):
-    return sum(float(x) != 0.0 for x in col) == 0
+def _true_range(vec):
+    """
+    Finds the range of True values in a list of booleans
 
+    Returned is (first, last), where first is the index of the first True value
+    and last is one past the index of the last True value.
+    """
 
-def _nonzero_range(vec):
-    for idx, x in enumerate(vec):
-        if float(x) != 0.0:
-            first = idx
-            break
+    first = vec.index(True)
+    last = len(vec) - vec[::-1].index(True)
+    return (first, last)
 
-    for idx, x in enumerate(reversed(vec)):
-        if float(x) != 0.0:
-            last = (len(vec) - idx)
-            break
 
-    if first is None:
-        return (None, None)
-    else:
-        return (first, last)
+def _find_block(mask):
+    """
+    Finds a contiguous block of nonzero values in a coefficient matrix
 
+    The matrix is given as a mask of its nonzero values, indexed by column
+    (general contraction) and then by row (primitive). Returned are the ranges
+    of rows and columns of the block.
+    """
 
-def _find_block(mat):
+    # Transpose of the mask (indexed by row)
+    mask_t = list(zip(*mask))
 
     # Initial range of rows
-    row_range = _nonzero_range(mat[0])
+    row_range = _true_range(mask[0])
     rows = range(row_range[0], row_range[1])
 
     # Find the right-most column with a nonzero in it
     col_range = (0, 0)
     for r in rows:
-        x, y = _nonzero_range([col[r] for col in mat])
+        x, y = _true_range(mask_t[r])
         col_range = (min(col_range[0], x), max(col_range[1], y))
 
     cols = range(col_range[0], col_range[1])
@@ -375,13 +390,13 @@ def _find_block(mat):
         row_range_old = row_range
         col_range_old = col_range
         for c in cols:
-            x, y = _nonzero_range(mat[c])
+            x, y = _true_range(mask[c])
             row_range = (min(row_range[0], x), max(row_range[1], y))
 
         rows = range(row_range[0], row_range[1])
 
         for r in rows:
-            x, y = _nonzero_range([col[r] for col in mat])
+            x, y = _true_range(mask_t[r])
             col_range = (min(col_range[0], x), max(col_range[1], y))
 
         cols = range(col_range[0], col_range[1])
@@ -392,90 +407,97 @@ def _find_block(mat):
     return (rows, cols)
 
 
-def optimize_general(basis):
+def _copy_shell(sh, exponents, coefficients):
+    """
+    Creates a new shell with the same metadata as sh, but with the given exponents and coefficients
     """
-    Optimizes the general contraction using the method of Hashimoto et al
 
-    .. seealso :: | T. Hashimoto, K. Hirao, H. Tatewaki
-                  | 'Comment on Dunning's correlation-consistent basis set'
-                  | Chemical Physics Letters v243, Issues 1-2, pp, 190-192 (1995)
-                  | https://doi.org/10.1016/0009-2614(95)00807-G
+    newsh = sh.copy()
+    newsh['shell_angular_momentum'] = list(sh['shell_angular_momentum'])
+    newsh['shell_exponents'] = exponents
+    newsh['shell_coefficients'] = coefficients
+    return newsh
 
+
+def _optimize_general_element(el):
+    """
+    Optimizes the general contraction of the data for a single element (in place)
     """
 
-    new_basis = copy.deepcopy(basis)
-    for k, el in new_basis['basis_set_elements'].items():
+    elshells = el.pop('element_electron_shells')
+    el['element_electron_shells'] = []
+    for sh in elshells:
+        exponents = sh['shell_exponents']
+        coefficients = sh['shell_coefficients']
+        nprim = len(exponents)
+        nam = len(sh['shell_angular_momentum'])
 
-        if not 'element_electron_shells' in el:
+        if nam > 1 or len(coefficients) < 2:
+            el['element_electron_shells'].append(sh)
             continue
 
-        elshells = el.pop('element_electron_shells')
-        el['element_electron_shells'] = []
-        for sh in elshells:
-            exponents = sh['shell_exponents']
-            coefficients = sh['shell_coefficients']
-            nprim = len(exponents)
-            nam = len(sh['shell_angular_momentum'])
+        # Which coefficients are nonzero, indexed by column (general contraction)
+        # and then row (primitive). All the work is done on this mask.
+        mask = [[x != 0.0 for x in numlist.values(c)] for c in coefficients]
 
-            if nam > 1 or len(coefficients) < 2:
-                el['element_electron_shells'].append(sh)
-                continue
+        # First, find columns (general contractions) with a single non-zero value
+        single_columns = [idx for idx, c in enumerate(mask) if sum(c) == 1]
 
-            # First, find columns (general contractions) with a single non-zero value
-            single_columns = [idx for idx, c in enumerate(coefficients) if _is_single_column(c)]
-
-            # Find the corresponding rows that have a value in one of these columns
-            # Note that at this stage, the row may have coefficients in more than one
-            # column. That is ok, we are going to split it off anyway
-            single_rows = []
-            for col_idx in single_columns:
-                col = coefficients[col_idx]
-                for row_idx in range(nprim):
-                    if float(col[row_idx]) != 0.0:
-                        single_rows.append(row_idx)
-
-            # Split those out into new shells, and remove them from the
-            # original shell
-            new_shells_single = []
-            for row_idx in single_rows:
-                newsh = copy.deepcopy(sh)
-                newsh['shell_exponents'] = [exponents[row_idx]]
-                newsh['shell_coefficients'] = [['1.00000000000']]
-                new_shells_single.append(newsh)
-
-            exponents = [x for idx, x in enumerate(exponents) if idx not in single_rows]
-            coefficients = [x for idx, x in enumerate(coefficients) if idx not in single_columns]
-            coefficients = [[x for idx, x in enumerate(col) if not idx in single_rows] for col in coefficients]
-
-            # Remove Zero columns
-            #coefficients = [ x for x in coefficients if not _is_zero_column(x) ]
-
-            # Find contiguous rectanglar blocks
-            new_shells = []
-            while len(exponents) > 0:
-                block_rows, block_cols = _find_block(coefficients)
-
-                # add as a new shell
-                newsh = copy.deepcopy(sh)
-                newsh['shell_exponents'] = [exponents[i] for i in block_rows]
-                newsh['shell_coefficients'] = [[coefficients[colidx][i] for i in block_rows] for colidx in block_cols]
-                new_shells.append(newsh)
-
-                # Remove from the original exponent/coefficient set
-                exponents = [x for idx, x in enumerate(exponents) if idx not in block_rows]
-                coefficients = [x for idx, x in enumerate(coefficients) if idx not in block_cols]
-                coefficients = [[x for idx, x in enumerate(col) if not idx in block_rows] for col in coefficients]
-
-            # I do this order to mimic the output of the original BSE
-            el['element_electron_shells'].extend(new_shells)
-            el['element_electron_shells'].extend(new_shells_single)
-
-        # Fix coefficients for completely uncontracted shells to 1.0
-        for sh in el['element_electron_shells']:
-            if len(sh['shell_coefficients']) == 1 and len(sh['shell_coefficients'][0]) == 1:
-                sh['shell_coefficients'][0][0] = '1.0000000'
+        # Find the corresponding rows that have a value in one of these columns
+        # Note that at this stage, the row may have coefficients in more than one
+        # column. That is ok, we are going to split it off anyway
+        single_rows = [mask[col_idx].index(True) for col_idx in single_columns]
 
-    return new_basis
+        # Split those out into new shells
+        new_shells_single = []
+        for row_idx in single_rows:
+            newsh = _copy_shell(sh, numlist.select(exponents, [row_idx]), [['1.00000000000']])
+            new_shells_single.append(newsh)
+
+        # Rows and columns (indices into the original exponents/coefficients) that remain
+        single_rows = set(single_rows)
+        single_columns = set(single_columns)
+        rows_left = [idx for idx in range(nprim) if idx not in single_rows]
+        cols_left = [idx for idx in range(len(coefficients)) if idx not in single_columns]
+
+        # Find contiguous rectanglar blocks
+        new_shells = []
+        while len(rows_left) > 0:
+            block_rows, block_cols = _find_block([[mask[c][r] for r in rows_left] for c in cols_left])
+            rows = [rows_left[i] for i in block_rows]
+            cols = [cols_left[i] for i in block_cols]
+
+            # add as a new shell
+            newsh = _copy_shell(sh, numlist.select(exponents, rows),
+                                [numlist.select(coefficients[c], rows) for c in cols])
+            new_shells.append(newsh)
+
+            # Remove from the remaining rows and columns
+            rows_left = [x for idx, x in enumerate(rows_left) if idx not in block_rows]
+            cols_left = [x for idx, x in enumerate(cols_left) if idx not in block_cols]
+
+        # I do this order to mimic the output of the original BSE
+        el['element_electron_shells'].extend(new_shells)
+        el['element_electron_shells'].extend(new_shells_single)
+
+    # Fix coefficients for completely uncontracted shells to 1.0
+    for sh in el['element_electron_shells']:
+        if len(sh['shell_coefficients']) == 1 and len(sh['shell_coefficients'][0]) == 1:
+            sh['shell_coefficients'] = [['1.0000000']]
+
+
+def optimize_general(basis):
+    """
+    Optimizes the general contraction using the method of Hashimoto et al
+
+    .. seealso :: | T. Hashimoto, K. Hirao, H. Tatewaki
+                  | 'Comment on Dunning's correlation-consistent basis set'
+                  | Chemical Physics Letters v243, Issues 1-2, pp, 190-192 (1995)
+                  | https://doi.org/10.1016/0009-2614(95)00807-G
+
+    """
+
+    return transform_basis(basis, ['optimize_general'])
 
 
 def sort_shells(shells):
@@ -490,31 +512,32 @@ def sort_shells(shells):
     The original data is not modified.
     """
 
-    new_shells = copy.deepcopy(shells)
+    return _sort_shells(misc.thaw(shells))
 
-    for sh in new_shells:
-        # Sort primitives within a shell
-        # Transpose of coefficients
-        tmp_c = list(map(list, zip(*sh['shell_coefficients'])))
 
-        # Zip together exponents and coeffs for sorting
-        tmp = zip(sh['shell_exponents'], tmp_c)
+def _sort_shells(shells):
+    """
+    Sort a list of basis set shells into a standard order (see :func:`sort_shells`)
+
+    The shells themselves are modified, and a new sorted list is returned
+    """
+
+    shell_keys = []
 
-        # Sort by decreasing value of exponent
-        tmp = sorted(tmp, key=lambda x: -float(x[0]))
+    for sh in shells:
+        # Sort primitives within a shell by decreasing value of exponent
+        exp_values = numlist.values(sh['shell_exponents'])
+        order = sorted(range(len(exp_values)), key=lambda i: -exp_values[i])
 
-        # Unpack, and re-transpose the coefficients
-        tmp_c = [x[1] for x in tmp]
-        sh['shell_exponents'] = [x[0] for x in tmp]
-        sh['shell_coefficients'] = list(map(list, zip(*tmp_c)))
+        sh['shell_exponents'] = numlist.select(sh['shell_exponents'], order)
+        sh['shell_coefficients'] = [numlist.select(x, order) for x in sh['shell_coefficients']] if order else []
 
-    # Sort by increasing AM, then general contraction level, then decreasing highest exponent
-    return list(
-        sorted(
-            new_shells,
-            key=
-            lambda x: (max(x['shell_angular_momentum']), -len(x['shell_exponents']), -len(x['shell_coefficients']), -float(x['shell_exponents'][0]))
-        ))
+        # Sort by increasing AM, then general contraction level, then decreasing highest exponent
+        shell_keys.append((max(sh['shell_angular_momentum']), -len(sh['shell_exponents']),
+                           -len(sh['shell_coefficients']), -exp_values[order[0]]))
+
+    order = sorted(range(len(shells)), key=shell_keys.__getitem__)
+    return [shells[i] for i in order]
 
 
 def sort_potentials(potentials):
@@ -529,7 +552,7 @@ def sort_potentials(potentials):
     The original data is not modified, and a deep copy is returned.
     """
 
-    new_potentials = copy.deepcopy(potentials)
+    new_potentials = misc.thaw(potentials)
 
     # Sort by increasing AM, then move the last element to the front
     new_potentials = list(sorted(new_potentials, key=lambda x: x['potential_angular_momentum']))
@@ -544,10 +567,83 @@ def sort_basis(basis):
     The original data is not modified.
     """
 
-    new_basis = copy.deepcopy(basis)
+    return transform_basis(basis, ['sort_basis'])
+
+
+def _sort_element(el):
+    """
+    Sorts the shells of the data for a single element (in place)
+    """
+
+    el['element_electron_shells'] = _sort_shells(el['element_electron_shells'])
+
+
+# Manipulations that can be used with transform_basis. Each function
+# modifies the data for a single element in place
+_element_transforms = {
+    'prune_basis': _prune_element,
+    'uncontract_spdf': _uncontract_spdf_element,
+    'uncontract_general': _uncontract_general_element,
+    'uncontract_segmented': _uncontract_segmented_element,
+    'make_general': _make_general_element,
+    'optimize_general': _optimize_general_element,
+    'sort_basis': _sort_element
+}
+
+
+def _transform_element(el, steps):
+    '''Applies transforms (functions and their arguments) to the data for a single element'''
+
+    # The values of the exponents and coefficients are only parsed once
+    el['element_electron_shells'] = [numlist.shell_to_number_lists(sh) for sh in el['element_electron_shells']]
+
+    for f, args in steps:
+        f(el, *args)
+
+    el['element_electron_shells'] = [numlist.shell_to_lists(sh) for sh in el['element_electron_shells']]
+    return el
+
+
+def transform_basis(basis, transforms, inplace=False, executor=None):
+    """
+    Applies several manipulations to a basis set, in order
+
+    Each transform is given as the name of a function in this module (for example,
+    'uncontract_general'), or as a tuple of the name and any additional
+    arguments to the function (for example, ('uncontract_spdf', 1)).
+    Available transforms are prune_basis, uncontract_spdf, uncontract_general,
+    uncontract_segmented, make_general, optimize_general, and sort_basis.
 
-    for k, el in new_basis['basis_set_elements'].items():
-        if 'element_electron_shells' in el:
-            el['element_electron_shells'] = sort_shells(el['element_electron_shells'])
+    The basis set is copied only once, and all the transforms are
+    applied to one element before moving on to the next.
+    If inplace is True, the basis set is not copied at all and is modified
+    directly (and so must not be read-only).
+
+    If executor (a :class:`concurrent.futures.Executor`) is given, the elements
+    are transformed in parallel using it. This may be a thread or process pool.
+
+    The result is the same as calling each function in turn.
+    """
+
+    steps = []
+    for t in transforms:
+        name, args = (t, ()) if isinstance(t, str) else (t[0], tuple(t[1:]))
+        if name not in _element_transforms:
+            raise RuntimeError("Unknown basis set transform '{}'".format(name))
+        steps.append((_element_transforms[name], args))
+
+    new_basis = basis if inplace else misc.thaw(basis)
+
+    el_data = new_basis['basis_set_elements']
+    elements = [k for k, v in el_data.items() if 'element_electron_shells' in v]
+
+    if executor is None:
+        for k in elements:
+            _transform_element(el_data[k], steps)
+    else:
+        # Process pools return new copies of the data
+        new_data = executor.map(_transform_element, [el_data[k] for k in elements], [steps] * len(elements))
+        for k, v in zip(elements, new_data):
+            el_data[k] = v
 
     return new_basis
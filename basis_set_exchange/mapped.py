@@ -0,0 +1,272 @@
+'''
+Memory-mapped library of precomposed basis sets
+
+A mapped library is a single binary file containing all the table basis sets
+of a data directory, already composed, along with the metadata, reference, and notes files.
+The file is memory-mapped when read, so several processes reading the same
+file share one copy of it (in the operating system's page cache).
+The data for an element is only decoded into python objects when it is requested.
+
+Exponents and coefficients are stored as packed strings for each element. These
+are kept exactly as they are in the original data.
+
+A mapped library can be used anywhere a data directory can be used, by passing
+the path to the file as the `data_dir` argument.
+
+File layout::
+
+    magic (8 bytes) | index offset (8 bytes) | index length (8 bytes)
+    data blocks ...
+    index (JSON)
+
+The index maps each table file (relative path) to the offset and length of a header block
+(the composed basis set without element data) and of a block for each element, and
+maps other files (metadata, references, notes) to the offset and length of their contents.
+'''
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+from . import compose, fileio
+
+file_magic = b'BSEMAP01'
+_header_fmt = '<8sQQ'
+_header_size = struct.calcsize(_header_fmt)
+
+# Keys of shells/potentials that contain lists of strings (or lists of lists
+# of strings) that are stored packed
+_packed_keys = ('shell_exponents', 'shell_coefficients', 'potential_gaussian_exponents', 'potential_coefficients')
+
+# Maps path to (stat stamp, library)
+_libraries = {}
+
+
+def is_mapped(data_dir):
+    '''Returns True if the given data directory is actually a mapped library file'''
+
+    return fileio.data_backend(data_dir) == 'mapped'
+
+
+def _pack_element(el_data):
+    '''Encode the data for a single element into bytes
+
+    The strings of exponents and coefficients are gathered into one space-separated
+    block, and are replaced in the element data by (start, count) into that block.
+    '''
+
+    values = []
+
+    def _pack_list(v):
+        if len(v) > 0 and isinstance(v[0], list):
+            return [_pack_list(x) for x in v]
+
+        if any(' ' in x for x in v):
+            raise RuntimeError('Cannot pack values containing spaces: {}'.format(v))
+
+        start = len(values)
+        values.extend(v)
+        return [start, len(v)]
+
+    skeleton = {}
+    for k, v in el_data.items():
+        if k in ('element_electron_shells', 'element_ecp'):
+            v = [{k2: _pack_list(v2) if k2 in _packed_keys else v2 for k2, v2 in sh.items()} for sh in v]
+        skeleton[k] = v
+
+    skeleton_bytes = json.dumps(skeleton, ensure_ascii=False).encode('utf-8')
+    values_bytes = ' '.join(values).encode('ascii')
+    return struct.pack('<I', len(skeleton_bytes)) + skeleton_bytes + values_bytes
+
+
+def _unpack_skeleton(data):
+    '''Decode the data for a single element, but without the exponents and coefficients'''
+
+    skeleton_len = struct.unpack_from('<I', data)[0]
+    return json.loads(bytes(data[4:4 + skeleton_len]).decode('utf-8'))
+
+
+def _unpack_element(data):
+    '''Decode the data for a single element (see :func:`_pack_element`)'''
+
+    skeleton_len = struct.unpack_from('<I', data)[0]
+    skeleton = _unpack_skeleton(data)
+    values = bytes(data[4 + skeleton_len:]).decode('ascii').split(' ')
+
+    def _unpack_list(v):
+        if len(v) > 0 and isinstance(v[0], list):
+            return [_unpack_list(x) for x in v]
+
+        start, n = v
+        return values[start:start + n]
+
+    for k in ('element_electron_shells', 'element_ecp'):
+        if k in skeleton:
+            for sh in skeleton[k]:
+                for k2 in _packed_keys:
+                    if k2 in sh:
+                        sh[k2] = _unpack_list(sh[k2])
+
+    return skeleton
+
+
+def create_mapped_library(output_path, data_dir):
+    '''Composes all basis sets in a data directory, and writes them to a mapped library file
+
+    The file is written to a temporary file first, and then moved to output_path
+    (which is overwritten if it exists).
+    '''
+
+    index = {'tables': {}, 'files': {}}
+
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b'\0' * _header_size)
+
+            def _write_block(data):
+                offset = f.tell()
+                f.write(data)
+                return [offset, len(data)]
+
+            for table_relpath in sorted(fileio.get_all_filelist(data_dir)[1]):
+                table_bs = compose._compose_table_basis(table_relpath, data_dir, None, set())
+
+                el_index = {}
+                for el, el_data in table_bs['basis_set_elements'].items():
+                    el_index[el] = _write_block(_pack_element(el_data))
+
+                table_bs['basis_set_elements'] = {}
+                header = _write_block(json.dumps(table_bs, ensure_ascii=False).encode('utf-8'))
+                index['tables'][table_relpath] = {'header': header, 'elements': el_index}
+
+            # Other files that are read directly
+            for root, dirs, files in os.walk(data_dir):
+                for basename in sorted(files):
+                    if basename in ('METADATA.json', 'REFERENCES.json') or basename.startswith('NOTES.') \
+                       or basename.endswith('.notes'):
+                        file_path = os.path.join(root, basename)
+                        file_relpath = os.path.relpath(file_path, data_dir).replace(os.sep, '/')
+                        with open(file_path, 'rb') as fin:
+                            index['files'][file_relpath] = _write_block(fin.read())
+
+            index_offset = f.tell()
+            index_bytes = json.dumps(index).encode('utf-8')
+            f.write(index_bytes)
+
+            f.seek(0)
+            f.write(struct.pack(_header_fmt, file_magic, index_offset, len(index_bytes)))
+
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class MappedLibrary:
+    '''A memory-mapped library file (see :func:`create_mapped_library`)'''
+
+    def __init__(self, file_path):
+        with open(file_path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, index_offset, index_len = struct.unpack_from(_header_fmt, self._mm)
+        if magic != file_magic:
+            raise RuntimeError('File {} is not a mapped basis set library'.format(file_path))
+
+        self._file_path = file_path
+        self._index = json.loads(self._mm[index_offset:index_offset + index_len].decode('utf-8'))
+
+    def _block(self, offset_len):
+        offset, length = offset_len
+        return memoryview(self._mm)[offset:offset + length]
+
+    def read_file(self, file_relpath):
+        '''Read the contents of a (metadata, references, or notes) file
+
+        If the file does not exist in the library, None is returned
+        '''
+
+        file_relpath = file_relpath.replace(os.sep, '/')
+        if file_relpath not in self._index['files']:
+            return None
+        return bytes(self._block(self._index['files'][file_relpath])).decode('utf-8')
+
+    def read_json(self, file_relpath):
+        '''Read a JSON (metadata or references) file
+
+        If the file does not exist in the library, an exception is raised.
+        '''
+
+        content = self.read_file(file_relpath)
+        if content is None:
+            raise FileNotFoundError('File \'{}\' does not exist in library \'{}\''.format(
+                file_relpath, self._file_path))
+        return json.loads(content)
+
+    def _table_index(self, file_relpath):
+        file_relpath = file_relpath.replace(os.sep, '/')
+        if file_relpath not in self._index['tables']:
+            raise FileNotFoundError('Table basis \'{}\' does not exist in library \'{}\''.format(
+                file_relpath, self._file_path))
+        return self._index['tables'][file_relpath]
+
+    def compose_table_references(self, file_relpath, elements=None):
+        '''Obtain the references of a table basis (see :func:`basis_set_exchange.compose.compose_table_references`)
+
+        The exponents and coefficients are not decoded.
+        '''
+
+        el_index = self._table_index(file_relpath)['elements']
+        if elements is not None:
+            el_index = {k: v for k, v in el_index.items() if k in elements}
+
+        el_refs = {}
+        for k, v in el_index.items():
+            el_refs[k] = {'element_references': _unpack_skeleton(self._block(v))['element_references']}
+
+        return {'basis_set_elements': el_refs}
+
+    def compose_table_basis(self, file_relpath, elements=None):
+        '''Obtain a composed table basis (see :func:`basis_set_exchange.compose.compose_table_basis`)
+
+        Only the data for the given elements (if given) is decoded.
+        A new, regular dictionary is returned each time.
+        '''
+
+        table_index = self._table_index(file_relpath)
+        table_bs = json.loads(bytes(self._block(table_index['header'])).decode('utf-8'))
+
+        el_index = table_index['elements']
+        if elements is not None:
+            el_index = {k: v for k, v in el_index.items() if k in elements}
+
+        table_bs['basis_set_elements'] = {k: _unpack_element(self._block(v)) for k, v in el_index.items()}
+
+        # The stored harmonic type is for the whole basis
+        if elements is not None:
+            table_bs['basis_set_harmonic_type'] = compose._whole_basis_harmonic(table_bs)
+
+        return table_bs
+
+
+def get_library(file_path):
+    '''Obtain the mapped library for the given file
+
+    The file is only mapped once per process, unless it has been replaced
+    or modified since it was mapped.
+    '''
+
+    st = os.stat(file_path)
+    stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    cached = _libraries.get(file_path)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, MappedLibrary(file_path))
+        _libraries[file_path] = cached
+
+    return cached[1]
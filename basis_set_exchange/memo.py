@@ -4,26 +4,424 @@ Class/decorator for memoizing BSE functionality
 
 import functools
 import pickle
+import threading
+from collections import OrderedDict
+
+from . import misc
 
 # If set to True, memoization of some internal functions
 # will be used. Generally safe to leave enabled - it
 # won't use that much memory
 memoize_enabled = True
 
+# Default limits for each memoized function. These are
+# used by functions that don't have their own limits set.
+# None means there is no limit
+default_max_entries = None
+default_max_bytes = None
+
+# All the memoized functions and shared caches (for clearing caches and obtaining stats)
+_all_memoized = []
+
+
+# Separates positional and keyword arguments in cache keys
+_kwargs_mark = object()
+
+
+def _make_key(args, kwargs):
+    '''Create a key for the cache from the arguments of a function call'''
+
+    if kwargs:
+        return args + (_kwargs_mark, ) + tuple(sorted(kwargs.items()))
+    return args
+
+
+class SingleFlight:
+    '''Deduplicates concurrent calls that compute the same thing
+
+    Only one call for a given key is run at a time. Other threads asking for the same
+    key while it is running wait for it to finish, and receive the same result (or exception).
+    Results are not kept after the call finishes.
+    '''
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__calls = {}
+
+    def do(self, key, func):
+        '''Call func() and return its result, or wait for the result of a call for the same key already in progress'''
+
+        with self.__lock:
+            call = self.__calls.get(key)
+            if call is None:
+                call = self.__calls[key] = _InFlightCall()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+            call.done.set()
+
+        return call.result
+
+
+class _InFlightCall:
+    '''A call in progress (see :class:`SingleFlight`)'''
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
 
 class BSEMemoize:
+    '''Memoizes the results of a function in a least-recently-used cache
+
+    Results are stored pickled, so that callers always receive a new copy
+    that they are free to modify. Alternatively, a read-only (frozen) result
+    that is shared between callers can be obtained via :meth:`readonly`.
+
+    The number of entries and total size (in bytes, of the pickled data)
+    can be limited by setting the `max_entries` and `max_bytes` attributes.
+    If they are None, the module-level defaults are used. When a limit
+    is exceeded, the least-recently-used entries are evicted. The size of
+    a frozen copy kept for :meth:`readonly` is taken to be the size of its pickled data,
+    so an entry with a frozen copy counts twice.
+
+    The cache may be used from multiple threads. If several threads ask for
+    the same uncached result at once, the function is only called once, and
+    the other threads wait for its result (see :class:`SingleFlight`).
+    '''
+
     def __init__(self, f):
         self.__f = f
-        self.__memo = {}
+        self.__memo = OrderedDict()
+        self.__frozen = {}
+        self.__lock = threading.Lock()
+        self.__flights = SingleFlight()
+        self.__nbytes = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.max_entries = None
+        self.max_bytes = None
         functools.update_wrapper(self, f)
+        _all_memoized.append(self)
+
+    def __call__(self, *args, **kwargs):
+        return self.call_with(functools.partial(self.__f, *args, **kwargs), *args, **kwargs)
+
+    def call_with(self, func, *args, **kwargs):
+        '''Obtain the result of the function for the given arguments, calling func() if it is not cached
+
+        func must return the same result as the function would for these arguments.
+        This allows for computing the result in a different way (for example, using
+        options that are not part of the arguments, such as an executor).
+        '''
 
-    def __call__(self, *args):
         if memoize_enabled is not True:
-            return self.__f(*args)
+            return func()
+
+        key = _make_key(args, kwargs)
+        data = self.__get(key, True)
+        if data is not None:
+            return pickle.loads(data)
+
+        def _compute():
+            # May have been stored by another thread since it was looked up
+            data = self.__get(key, False)
+            if data is None:
+                data = pickle.dumps(func())
+                with self.__lock:
+                    self.__store(key, data)
+            return data
+
+        # The result of func may share data with other caches (for example, composed
+        # basis sets share data with the caches in compose), so every caller gets a copy
+        return pickle.loads(self.__flights.do(key, _compute))
+
+    def readonly(self, *args, **kwargs):
+        '''Obtain a read-only result of the function
+
+        The result is frozen (see :func:`basis_set_exchange.misc.freeze`) and
+        is shared with other callers, so it is not copied when found in the cache.
+        '''
+
+        return self.readonly_with(functools.partial(self.__f, *args, **kwargs), *args, **kwargs)
 
-        if args in self.__memo:
-            return pickle.loads(self.__memo[args])
+    def readonly_with(self, func, *args, **kwargs):
+        '''Obtain a read-only result of the function, calling func() if it is not cached
 
-        ret = self.__f(*args)
-        self.__memo[args] = pickle.dumps(ret)
+        See :meth:`readonly` and :meth:`call_with`
+        '''
+
+        if memoize_enabled is not True:
+            return misc.freeze(func())
+
+        key = _make_key(args, kwargs)
+        with self.__lock:
+            if key in self.__frozen:
+                self.__hits += 1
+                self.__memo.move_to_end(key)
+                return self.__frozen[key]
+
+        ret = misc.freeze(self.call_with(func, *args, **kwargs))
+
+        # Only keep if the pickled data was kept
+        with self.__lock:
+            if key in self.__memo:
+                if key not in self.__frozen:
+                    self.__frozen[key] = ret
+                    self.__nbytes += len(self.__memo[key])
+                    self.__evict()
+                ret = self.__frozen.get(key, ret)
         return ret
+
+    def lookup(self, *args, **kwargs):
+        '''Obtain the cached result for the given arguments, without calling the function
+
+        If the result is not in the cache (or memoization is disabled), None is returned.
+        '''
+
+        if memoize_enabled is not True:
+            return None
+
+        data = self.__get(_make_key(args, kwargs), True)
+        return None if data is None else pickle.loads(data)
+
+    def store(self, value, *args, **kwargs):
+        '''Store the result of the function for the given arguments
+
+        This is for results that were obtained some other way (for example,
+        several results computed at once), so that the function doesn't need to be called.
+        '''
+
+        if memoize_enabled is not True:
+            return
+
+        key = _make_key(args, kwargs)
+        data = pickle.dumps(value)
+        with self.__lock:
+            self.__store(key, data)
+
+    def __get(self, key, count):
+        '''Obtain the pickled data for a key (or None), counting a hit or miss if count is True'''
+
+        with self.__lock:
+            data = self.__memo.get(key)
+            if data is not None:
+                self.__memo.move_to_end(key)
+            if count:
+                if data is not None:
+                    self.__hits += 1
+                else:
+                    self.__misses += 1
+            return data
+
+    def __store(self, key, data):
+        '''Store pickled data for a key, replacing any existing data (the lock must be held)'''
+
+        max_bytes = default_max_bytes if self.max_bytes is None else self.max_bytes
+
+        self.__invalidate(key)
+
+        # Too big to ever fit in the cache
+        if max_bytes is not None and len(data) > max_bytes:
+            return
+
+        self.__memo[key] = data
+        self.__nbytes += len(data)
+        self.__evict()
+
+    def __evict(self):
+        '''Evict the least-recently-used entries until the limits are met (the lock must be held)'''
+
+        max_entries = default_max_entries if self.max_entries is None else self.max_entries
+        max_bytes = default_max_bytes if self.max_bytes is None else self.max_bytes
+
+        while ((max_entries is not None and len(self.__memo) > max_entries)
+               or (max_bytes is not None and self.__nbytes > max_bytes)):
+            old_key = next(iter(self.__memo))
+            self.__invalidate(old_key)
+            self.__evictions += 1
+
+    def __invalidate(self, key):
+        '''Remove the cached result for a key (the lock must be held)'''
+
+        data = self.__memo.pop(key, None)
+        if data is not None:
+            self.__nbytes -= len(data)
+            if key in self.__frozen:
+                del self.__frozen[key]
+                self.__nbytes -= len(data)
+
+    def invalidate(self, *args, **kwargs):
+        '''Remove the cached result for the given arguments (if it exists)'''
+
+        with self.__lock:
+            self.__invalidate(_make_key(args, kwargs))
+
+    def cache_clear(self):
+        '''Remove all cached results and reset the statistics'''
+
+        with self.__lock:
+            self.__memo.clear()
+            self.__frozen.clear()
+            self.__nbytes = 0
+            self.__hits = 0
+            self.__misses = 0
+            self.__evictions = 0
+
+    def cache_info(self):
+        '''Obtain statistics about the cache for this function
+
+        Returned is a dictionary with the number of hits, misses, and evictions,
+        as well as the number of entries and bytes currently held
+        '''
+
+        with self.__lock:
+            return {
+                'hits': self.__hits,
+                'misses': self.__misses,
+                'evictions': self.__evictions,
+                'entries': len(self.__memo),
+                'bytes': self.__nbytes
+            }
+
+
+class BSESharedCache:
+    '''A least-recently-used cache of data that is shared between callers
+
+    Unlike :class:`BSEMemoize`, values are stored as they are, without being pickled or
+    copied. Callers must therefore not modify them. This is meant for large, parsed
+    data that callers only copy parts of.
+
+    The number of entries and total size can be limited by setting the `max_entries` and
+    `max_bytes` attributes (or the module-level defaults), as for :class:`BSEMemoize`.
+    Since values are not pickled, the size of each entry is an estimate. It is given
+    when the value is stored, or is otherwise the size of the pickled value.
+
+    The cache is not used (nothing is stored or found) if memoization is disabled.
+    It may be used from multiple threads.
+    '''
+
+    def __init__(self, module, name):
+        self.__module__ = module
+        self.__qualname__ = name
+        self.__data = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__nbytes = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.max_entries = None
+        self.max_bytes = None
+        _all_memoized.append(self)
+
+    def __contains__(self, key):
+        '''Check if a key is in the cache (without affecting the statistics or the LRU order)'''
+
+        return memoize_enabled is True and key in self.__data
+
+    def get(self, key):
+        '''Obtain the value for a key, or None if it is not in the cache'''
+
+        if memoize_enabled is not True:
+            return None
+
+        with self.__lock:
+            if key in self.__data:
+                self.__hits += 1
+                self.__data.move_to_end(key)
+                return self.__data[key][0]
+
+            self.__misses += 1
+            return None
+
+    def put(self, key, value, nbytes=None):
+        '''Store a value for a key, replacing any existing value
+
+        nbytes is an estimate of the size of the value. If None, the size of the pickled value is used.
+        '''
+
+        if memoize_enabled is not True:
+            return
+
+        if nbytes is None:
+            nbytes = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+        max_entries = default_max_entries if self.max_entries is None else self.max_entries
+        max_bytes = default_max_bytes if self.max_bytes is None else self.max_bytes
+
+        with self.__lock:
+            old = self.__data.pop(key, None)
+            if old is not None:
+                self.__nbytes -= old[1]
+
+            # Too big to ever fit in the cache
+            if max_bytes is not None and nbytes > max_bytes:
+                return
+
+            self.__data[key] = (value, nbytes)
+            self.__nbytes += nbytes
+
+            while ((max_entries is not None and len(self.__data) > max_entries)
+                   or (max_bytes is not None and self.__nbytes > max_bytes)):
+                _, old = self.__data.popitem(last=False)
+                self.__nbytes -= old[1]
+                self.__evictions += 1
+
+    def cache_clear(self):
+        '''Remove all cached data and reset the statistics'''
+
+        with self.__lock:
+            self.__data.clear()
+            self.__nbytes = 0
+            self.__hits = 0
+            self.__misses = 0
+            self.__evictions = 0
+
+    def cache_info(self):
+        '''Obtain statistics about the cache (see :meth:`BSEMemoize.cache_info`)
+
+        The number of bytes is the sum of the estimated sizes of the entries
+        '''
+
+        with self.__lock:
+            return {
+                'hits': self.__hits,
+                'misses': self.__misses,
+                'evictions': self.__evictions,
+                'entries': len(self.__data),
+                'bytes': self.__nbytes
+            }
+
+
+def clear_all():
+    '''Clears the caches of all memoized functions'''
+
+    for m in _all_memoized:
+        m.cache_clear()
+
+
+def get_stats():
+    '''Obtain cache statistics for all memoized functions
+
+    Returned is a dictionary of the function's (or shared cache's) qualified name
+    (module and function name) to the stats from :meth:`BSEMemoize.cache_info`
+    '''
+
+    return {'{}.{}'.format(m.__module__, m.__qualname__): m.cache_info() for m in _all_memoized}
@@ -0,0 +1,219 @@
+'''
+Read-only index of the metadata for all basis sets
+
+The metadata (from METADATA.json) is read once per data directory and stored
+as immutable records that can be shared without copying. It is read again
+if METADATA.json (or the bundle or mapped library) changes.
+'''
+
+import os
+from collections.abc import Mapping
+
+from . import diskcache, fileio, misc
+
+# Maps the data directory to (stamp of the metadata file, index)
+_index_cache = {}
+
+
+def element_bitset(elements):
+    '''Create a bitset (as an integer) from a list of elements (Z numbers as str or int)
+
+    Bit Z of the result is set if element Z is in the list
+    '''
+
+    bits = 0
+    for el in elements:
+        bits |= 1 << int(el)
+    return bits
+
+
+def bitset_elements(bits):
+    '''Create a list of elements (Z numbers as strings) from a bitset'''
+
+    elements = []
+    while bits:
+        low = bits & -bits
+        elements.append(str(low.bit_length() - 1))
+        bits ^= low
+    return elements
+
+
+def _trigrams(s):
+    '''Returns the set of all substrings of length 3 in a string'''
+
+    return set(s[i:i + 3] for i in range(len(s) - 2))
+
+
+class MetadataIndex(Mapping):
+    '''Read-only mapping of (internal) basis set name to its metadata
+
+    Each record is immutable (dictionaries are mappingproxy objects, lists are tuples),
+    so records can be handed out without being copied.
+    '''
+
+    def __init__(self, metadata):
+        self._records = {k: misc.freeze(v) for k, v in metadata.items()}
+        self._families = tuple(sorted(set(v['family'] for v in self._records.values())))
+
+        # Position of each basis in the metadata (for keeping results in order)
+        self._order = {k: idx for idx, k in enumerate(self._records)}
+
+        # Inverted indexes, mapping a value to the set of basis set names with that value
+        # Elements are taken from the latest version of each basis set
+        self._by_family = {}
+        self._by_role = {}
+        self._by_function_type = {}
+        self._by_element = {}
+        self._by_trigram = {}
+
+        # Bitsets of the elements in each version of each basis set (bit Z is set if element Z
+        # is in the basis set). The bitsets for the latest versions are also stored in order.
+        self._coverage = {}
+        self._latest_coverage = []
+
+        for k, v in self._records.items():
+            self._coverage[k] = {ver: element_bitset(x['elements']) for ver, x in v['versions'].items()}
+            self._latest_coverage.append((k, self._coverage[k][v['latest_version']]))
+
+            self._by_family.setdefault(v['family'], set()).add(k)
+            self._by_role.setdefault(v['role'], set()).add(k)
+            for ft in v['functiontypes']:
+                self._by_function_type.setdefault(ft, set()).add(k)
+            for el in v['versions'][v['latest_version']]['elements']:
+                self._by_element.setdefault(el, set()).add(k)
+            for tg in _trigrams(k) | _trigrams(v['display_name']):
+                self._by_trigram.setdefault(tg, set()).add(k)
+
+    def __getitem__(self, key):
+        return self._records[key]
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def families(self):
+        '''A sorted tuple of all the basis set families'''
+        return self._families
+
+    @property
+    def function_types(self):
+        '''A sorted tuple of all the function types in any basis set'''
+        return tuple(sorted(self._by_function_type))
+
+    def filter(self, substr=None, family=None, role=None, function_types=None, elements=None):
+        '''Find basis sets matching some criteria
+
+        All criteria are ANDed together. Family, role, and function types
+        are expected to be lowercase, and elements are Z numbers as strings.
+        The substring is searched for in the basis set name and display name.
+
+        Basis sets match `function_types` and `elements` if they contain all of the
+        given function types and elements (in the latest version of the basis set).
+
+        Returned is a list of (internal) basis set names, in the same order as the metadata.
+        '''
+
+        # Sets of matching names for each criteria
+        candidates = []
+        if family:
+            candidates.append(self._by_family.get(family, set()))
+        if role:
+            candidates.append(self._by_role.get(role, set()))
+        if function_types:
+            candidates.extend(self._by_function_type.get(ft, set()) for ft in function_types)
+        if elements:
+            candidates.extend(self._by_element.get(el, set()) for el in elements)
+        if substr and len(substr) >= 3:
+            # All trigrams of the substring must be in the name (but this is not
+            # enough by itself, so the names are still checked below)
+            candidates.extend(self._by_trigram.get(tg, set()) for tg in _trigrams(substr))
+
+        if candidates:
+            candidates.sort(key=len)
+            names = set(candidates[0]).intersection(*candidates[1:])
+        else:
+            names = self._records.keys()
+
+        if substr:
+            names = [k for k in names if substr in k or substr in self._records[k]['display_name']]
+
+        return sorted(names, key=self._order.__getitem__)
+
+    def element_coverage(self, name, version=None):
+        '''Obtain the bitset of elements contained in a version of a basis set
+
+        If version is None, the latest version is used. A KeyError is raised
+        if the basis set or version doesn't exist. See :func:`element_bitset`
+        '''
+
+        if version is None:
+            version = self._records[name]['latest_version']
+        return self._coverage[name][str(version)]
+
+    def missing_elements(self, elements, family=None, role=None, version=None):
+        '''Find the elements missing from a version of each basis set
+
+        Elements are given as a list of Z numbers (as str or int). Basis sets can be restricted to
+        only a given family and/or role (which are expected to be lowercase).
+
+        If version is None, the latest version of each basis set is checked. Otherwise, basis sets
+        that do not have the given version are skipped.
+
+        Returned is a dictionary of basis set name to a bitset of missing elements
+        (see :func:`element_bitset`). Basis sets containing all the elements have a bitset of 0.
+        '''
+
+        wanted = element_bitset(elements)
+        ret = {}
+
+        if version is None:
+            coverage = self._latest_coverage
+        else:
+            version = str(version)
+            coverage = [(k, v[version]) for k, v in self._coverage.items() if version in v]
+
+        for k, bits in coverage:
+            if family and self._records[k]['family'] != family:
+                continue
+            if role and self._records[k]['role'] != role:
+                continue
+            ret[k] = wanted & ~bits
+
+        return ret
+
+    def get_basis(self, name):
+        '''Obtain the metadata record for a single basis set
+
+        The name is transformed into the internal representation first.
+        If the basis doesn't exist, a KeyError is raised
+        '''
+
+        tr_name = misc.transform_basis_name(name)
+        if tr_name not in self._records:
+            raise KeyError("Basis set {} does not exist".format(name))
+
+        return self._records[tr_name]
+
+
+def get_index(data_dir):
+    '''Obtain the metadata index for the given data directory (or bundle)
+
+    The index is only built the first time this is called, and again
+    whenever the metadata file changes (its modification time or size is different).
+    This does not depend on whether memoization is enabled.
+    '''
+
+    if fileio.data_backend(data_dir) == 'directory':
+        stamp = diskcache.file_stamp(os.path.join(data_dir, 'METADATA.json'))
+    else:
+        stamp = diskcache.file_stamp(data_dir)
+
+    cached = _index_cache.get(data_dir)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, MetadataIndex(fileio.read_data_metadata(data_dir)))
+        _index_cache[data_dir] = cached
+
+    return cached[1]
@@ -2,6 +2,9 @@
 Miscellaneous helper functions
 '''
 
+import types
+from collections.abc import Mapping
+
 from . import lut
 
 
@@ -124,3 +127,37 @@ def transform_basis_name(name):
     """
 
     return name.lower()
+
+
+def freeze(data):
+    """
+    Creates a read-only (frozen) deep copy of some data
+
+    Dictionaries are converted to read-only mappings (types.MappingProxyType) and
+    lists are converted to tuples. This is done recursively, so the returned
+    object can be shared without risk of it being modified.
+    """
+
+    if isinstance(data, dict):
+        return types.MappingProxyType({k: freeze(v) for k, v in data.items()})
+    elif isinstance(data, list):
+        return tuple(freeze(x) for x in data)
+    else:
+        return data
+
+
+def thaw(data):
+    """
+    Creates a regular (mutable) deep copy of some data
+
+    This is the opposite of :func:`freeze`. All mappings are converted to dictionaries
+    and all lists and tuples are converted to lists. Since the data is always copied,
+    this can be used on both frozen and regular data.
+    """
+
+    if isinstance(data, Mapping):
+        return {k: thaw(v) for k, v in data.items()}
+    elif isinstance(data, (list, tuple)):
+        return [thaw(x) for x in data]
+    else:
+        return data
@@ -0,0 +1,100 @@
+'''
+Lists of numbers that keep their original string representation
+
+Exponents and coefficients are stored as strings, so that they are written
+out exactly as they appear in the original data. Many manipulations and
+comparisons need their values, though, and converting the same strings
+with float() over and over again is slow.
+
+A :class:`NumberList` is a list of these strings that also holds their
+float values (in an array from the standard array module). The values
+are only computed once, the first time they are needed.
+
+The functions in this module work with either NumberLists or plain lists
+of strings, so code using them does not need to know which it was given.
+'''
+
+import array
+
+
+class NumberList(list):
+    '''A list of numbers (as strings) that also holds their float values
+
+    This behaves like (and compares equal to) a regular list of the strings.
+    The float values are available via the `values` attribute. Since these
+    are computed only once, the list should not be modified after it is created.
+    '''
+
+    __slots__ = ('_values', )
+
+    def __init__(self, strings=(), values=None):
+        super().__init__(strings)
+        self._values = values
+
+    @property
+    def values(self):
+        '''The float values of the strings in this list, as an array'''
+
+        if self._values is None:
+            self._values = array.array('d', map(float, self))
+        return self._values
+
+    def __reduce__(self):
+        return (NumberList, (list(self), self._values))
+
+
+def values(numbers):
+    '''Obtain the float values of a list of numbers (given as strings)
+
+    For a :class:`NumberList`, the stored values are used.
+    '''
+
+    if isinstance(numbers, NumberList):
+        return numbers.values
+    return [float(x) for x in numbers]
+
+
+def select(numbers, indices):
+    '''Select the numbers at the given indices (in that order) from a list of numbers
+
+    A :class:`NumberList` is returned if `numbers` is a NumberList, keeping any
+    values that have already been computed. Otherwise, a plain list is returned.
+    '''
+
+    if not isinstance(numbers, NumberList):
+        return [numbers[i] for i in indices]
+
+    new_values = None
+    if numbers._values is not None:
+        new_values = array.array('d', [numbers._values[i] for i in indices])
+    return NumberList([numbers[i] for i in indices], new_values)
+
+
+def shell_to_number_lists(shell):
+    '''Obtain a copy of an electron shell where the exponents and coefficients are NumberLists
+
+    Only the shell dictionary is copied. Lists that are already NumberLists are reused.
+    '''
+
+    new_shell = shell.copy()
+    new_shell['shell_exponents'] = _to_number_list(shell['shell_exponents'])
+    new_shell['shell_coefficients'] = [_to_number_list(x) for x in shell['shell_coefficients']]
+    return new_shell
+
+
+def shell_to_lists(shell):
+    '''Obtain a copy of an electron shell where the exponents and coefficients are plain lists
+
+    This reverses :func:`shell_to_number_lists`
+    '''
+
+    new_shell = shell.copy()
+    new_shell['shell_exponents'] = list(shell['shell_exponents'])
+    new_shell['shell_coefficients'] = [list(x) for x in shell['shell_coefficients']]
+    return new_shell
+
+
+def _to_number_list(numbers):
+    if isinstance(numbers, NumberList):
+        return numbers
+    return NumberList(numbers)
@@ -14,6 +14,8 @@ def compact_references(basis_dict, ref_data):
     and 'elements' which is a list of element Z numbers
     that those references apply to
 
+    The basis set dictionary is not modified.
+
     Parameters
     ----------
     basis_dict : dict
@@ -22,7 +24,9 @@ def compact_references(basis_dict, ref_data):
         Dictionary containing all reference information
     """
 
-    element_refs = []
+    # Maps a hashable form of the reference information to the group of
+    # elements with that reference information
+    element_refs = {}
 
     # Create a mapping of elements -> reference information
     for el, eldata in basis_dict['basis_set_elements'].items():
@@ -30,22 +34,28 @@ def compact_references(basis_dict, ref_data):
         # elref is a list of dict
         # dict is { 'reference_description': str, 'reference_keys': [keys] }
         elref = eldata['element_references']
+        key = tuple((x['reference_description'], tuple(x['reference_keys'])) for x in elref)
 
-        for x in element_refs:
-            if x['reference_info'] == elref:
-                x['elements'].append(el)
-                break
+        if key in element_refs:
+            element_refs[key]['elements'].append(el)
         else:
-            element_refs.append({'reference_info': elref, 'elements': [el]})
+            element_refs[key] = {'reference_info': elref, 'elements': [el]}
 
-    for item in element_refs:
+    ret = []
+    for item in element_refs.values():
 
-        # Loop over a list of dictionaries for this group of elements
+        # Copy the information for this group of elements, adding the reference data
         # Note that reference_data needs to be in the same order as the reference_keys
+        ref_info = []
         for elref in item['reference_info']:
+            elref = dict(elref)
+            elref['reference_keys'] = list(elref['reference_keys'])
             elref['reference_data'] = {k: ref_data[k] for k in elref['reference_keys']}
+            ref_info.append(elref)
+
+        ret.append({'reference_info': ref_info, 'elements': item['elements']})
 
-    return element_refs
+    return ret
 
 
 def reference_text(ref):
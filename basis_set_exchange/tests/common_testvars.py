@@ -2,13 +2,16 @@
 Some data common to all tests
 '''
 
+import os
+import shutil
+
 import basis_set_exchange as bse
 
 # Use random for getting sets of elements
 rand_seed = 39466  # from random.org
 
 # Load all the metadata once
-data_dir = bse.api._default_data_dir
+data_dir = bse.api.get_default_data_dir()
 bs_metadata = bse.get_metadata()
 bs_names = bse.get_all_basis_names()
 bs_formats = list(bse.get_formats().keys())
@@ -35,3 +38,21 @@ def bool_matrix(size):
     for x in range(size):
         ret[x][x] = True
     return ret
+
+
+def copy_basis_files(basis_name, new_data_dir):
+    '''Copy all the files needed for a basis set into a new data directory
+
+    Returns the path of the table file, relative to the data directory
+    '''
+
+    file_relpath = bs_metadata[basis_name]['versions']['0']['file_relpath']
+    used_files = set()
+    bse.compose._compose_table_basis(file_relpath, data_dir, None, used_files)
+
+    for f in used_files:
+        new_path = os.path.join(new_data_dir, os.path.relpath(f, data_dir))
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        shutil.copy(f, new_path)
+
+    return file_relpath
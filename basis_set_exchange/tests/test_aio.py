@@ -0,0 +1,95 @@
+"""
+Tests of the asynchronous API
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+import basis_set_exchange as bse
+from basis_set_exchange import aio
+
+
+def test_aio_results():
+    '''Test that the asynchronous functions give the same results as the normal ones'''
+
+    async def _get_all():
+        return await asyncio.gather(
+            aio.async_get_basis('cc-pvdz', fmt='nwchem', elements=[1, 6], deterministic=True),
+            aio.async_get_basis('def2-svp', elements='1-10', version='1', header=False),
+            aio.async_get_references('cc-pvdz', fmt='txt'),
+            aio.async_get_basis_notes('cc-pvdz'),
+            aio.async_get_family_notes('dunning'),
+            aio.async_lookup_basis_by_role('cc-pvdz', 'rifit'),
+            aio.async_get_basis_etag('cc-pvdz', fmt='nwchem'),
+            aio.async_get_basis_many(['sto-3g', {'name': 'cc-pvdz', 'fmt': 'psi4', 'header': False}]),
+        )
+
+    results = asyncio.run(_get_all())
+    assert results == [
+        bse.get_basis('cc-pvdz', fmt='nwchem', elements=[1, 6], deterministic=True),
+        bse.get_basis('def2-svp', elements='1-10', version='1', header=False),
+        bse.get_references('cc-pvdz', fmt='txt'),
+        bse.get_basis_notes('cc-pvdz'),
+        bse.get_family_notes('dunning'),
+        bse.lookup_basis_by_role('cc-pvdz', 'rifit'),
+        bse.get_basis_etag('cc-pvdz', fmt='nwchem'),
+        bse.get_basis_many(['sto-3g', {'name': 'cc-pvdz', 'fmt': 'psi4', 'header': False}]),
+    ]
+
+
+def test_aio_iter_basis():
+    '''Test obtaining a formatted basis set in chunks'''
+
+    async def _get_chunks():
+        return [x async for x in aio.async_iter_basis('aug-cc-pvtz', 'gaussian94', deterministic=True)]
+
+    chunks = asyncio.run(_get_chunks())
+    assert len(chunks) > 1
+    assert ''.join(chunks) == bse.get_basis('aug-cc-pvtz', fmt='gaussian94', deterministic=True)
+
+
+def test_aio_errors():
+    '''Test that errors are raised from the coroutines'''
+
+    async def _get_bad():
+        return await aio.async_get_basis('not_a_basis')
+
+    with pytest.raises(KeyError, match='not_a_basis'):
+        asyncio.run(_get_bad())
+
+
+def test_aio_cancel(monkeypatch):
+    '''Test that calls waiting for a free thread are cancelled without being run'''
+
+    monkeypatch.setattr(aio, 'max_workers', 1)
+    release = threading.Event()
+    calls = []
+
+    def _blocking(x):
+        release.wait()
+        calls.append(x)
+        return x
+
+    async def _run_calls():
+        t1 = asyncio.ensure_future(aio._run(_blocking, 1))
+        t2 = asyncio.ensure_future(aio._run(_blocking, 2))
+
+        # The event loop is not blocked while the pool is busy
+        await asyncio.sleep(0.01)
+        assert not t1.done()
+
+        t2.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await t2
+
+        release.set()
+        assert await t1 == 1
+
+    try:
+        asyncio.run(_run_calls())
+    finally:
+        aio.shutdown()
+
+    assert calls == [1]
@@ -2,7 +2,13 @@
 Tests for the BSE main API
 """
 
+import json
+import multiprocessing
+import os
 import random
+import types
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import pytest
 
 import basis_set_exchange as bse
@@ -76,6 +82,24 @@ def test_get_basis_4(basis_name, fmt):
     bse.get_basis(basis_name, fmt=fmt)
 
 
+def test_get_basis_modify_result():
+    """Test that modifying a returned basis set does not affect later results
+    """
+    bse.memo.clear_all()
+    ref = bse.get_basis('cc-pvdz', elements=[1, 6])
+    ref_nw = bse.get_basis('cc-pvdz', fmt='nwchem', elements=[1, 8], header=False)
+    bse.memo.clear_all()
+
+    # Composed (and not found in the cache) by this call
+    bs = bse.get_basis('cc-pvdz', elements=[1])
+    bs['basis_set_elements']['1']['element_electron_shells'][0]['shell_exponents'][0] = 'CORRUPTED'
+    bs = bse.get_basis('cc-pvdz', elements=[1])
+    bs['basis_set_elements']['1']['element_electron_shells'].clear()
+
+    assert bse.get_basis('cc-pvdz', elements=[1, 6]) == ref
+    assert bse.get_basis('cc-pvdz', fmt='nwchem', elements=[1, 8], header=False) == ref_nw
+
+
 @pytest.mark.parametrize('basis_name', bs_names_sample)
 def test_get_basis_memo(basis_name):
     """For a sample of basis sets, test memoization
@@ -113,6 +137,103 @@ def test_lookup_by_role(primary_basis, role, expected):
     assert bs.lower() == expected.lower()
 
 
+@pytest.mark.parametrize('substr', [None, 'a', '31g', 'aug', 'cc-pv', 'zzz'])
+@pytest.mark.parametrize('family', [None, 'dunning', 'pople'])
+@pytest.mark.parametrize('role', [None, 'orbital', 'rifit'])
+@pytest.mark.parametrize('function_types', [None, 'gto', ['gto', 'ecp']])
+@pytest.mark.parametrize('elements', [None, 'H', 'H-Ne,Xe'])
+def test_filter_basis_sets(substr, family, role, function_types, elements):
+    """Test filtering basis sets against a simple search of the metadata
+    """
+    md = bse.filter_basis_sets(substr, family, role, function_types=function_types, elements=elements)
+
+    if isinstance(function_types, str):
+        function_types = [function_types]
+    if elements is not None:
+        elements = bse.misc.expand_elements(elements, True)
+
+    expected = []
+    for k, v in bs_metadata.items():
+        if family and v['family'] != family:
+            continue
+        if role and v['role'] != role:
+            continue
+        if substr and not (substr in k or substr in v['display_name']):
+            continue
+        if function_types and not set(function_types) <= set(v['functiontypes']):
+            continue
+        if elements and not set(elements) <= set(v['versions'][v['latest_version']]['elements']):
+            continue
+        expected.append(k)
+
+    assert list(md.keys()) == expected
+    for k, v in md.items():
+        assert v == bs_metadata[k]
+
+
+@pytest.mark.parametrize('family', [None, 'dunning', 'pople'])
+@pytest.mark.parametrize('role', [None, 'orbital', 'rifit'])
+@pytest.mark.parametrize('elements', ['H', 'H-Ne,Xe', 'U,Pu', [1, 6, 118]])
+def test_lookup_by_elements(family, role, elements):
+    """Test looking up basis sets by element coverage against the metadata
+    """
+    found = bse.lookup_basis_by_elements(elements, family, role)
+    missing = bse.lookup_basis_by_elements(elements, family, role, missing=True)
+    elements = bse.misc.expand_elements(elements, True)
+
+    expected_missing = {}
+    for k, v in bs_metadata.items():
+        if family and v['family'] != family:
+            continue
+        if role and v['role'] != role:
+            continue
+        bs_elements = v['versions'][v['latest_version']]['elements']
+        expected_missing[k] = [el for el in elements if el not in bs_elements]
+
+    assert missing == expected_missing
+    assert found == [k for k, v in expected_missing.items() if not v]
+    assert found == list(bse.filter_basis_sets(family=family, role=role, elements=elements).keys())
+
+
+@pytest.mark.parametrize('version', ['0', 1])
+@pytest.mark.parametrize('elements', ['H', 'H-Ne,Xe', 'U,Pu'])
+def test_lookup_by_elements_version(version, elements):
+    """Test looking up basis sets by the element coverage of a given version
+    """
+    missing = bse.lookup_basis_by_elements(elements, missing=True, version=version)
+    elements = bse.misc.expand_elements(elements, True)
+
+    md_index = bse.api._get_metadata_index(data_dir)
+    expected_missing = {}
+    for k, v in bs_metadata.items():
+        if str(version) not in v['versions']:
+            continue
+        bs_elements = v['versions'][str(version)]['elements']
+        expected_missing[k] = [el for el in elements if el not in bs_elements]
+        assert md_index.element_coverage(k, version) == bse.metaindex.element_bitset(bs_elements)
+
+    assert expected_missing
+    assert missing == expected_missing
+    assert bse.lookup_basis_by_elements(elements, version=version) == [k for k, v in expected_missing.items() if not v]
+
+
+def test_metadata_index_cache(tmp_path, monkeypatch):
+    """Test that the metadata index is only rebuilt when the metadata changes
+    """
+    monkeypatch.setattr(bse.memo, 'memoize_enabled', False)
+    md_path = str(tmp_path / 'METADATA.json')
+
+    with open(md_path, 'w') as f:
+        json.dump({k: bs_metadata[k] for k in ('sto-3g', 'cc-pvdz')}, f)
+    index = bse.metaindex.get_index(str(tmp_path))
+    assert list(index) == ['sto-3g', 'cc-pvdz']
+    assert bse.metaindex.get_index(str(tmp_path)) is index
+
+    with open(md_path, 'w') as f:
+        json.dump({'sto-3g': bs_metadata['sto-3g']}, f)
+    assert list(bse.metaindex.get_index(str(tmp_path))) == ['sto-3g']
+
+
 @pytest.mark.parametrize('basis_name', bs_names)
 def test_notes(basis_name):
     """Test getting family, family notes, and basis set notes
@@ -120,3 +241,152 @@ def test_notes(basis_name):
     bse.get_basis_notes(basis_name)
     fam = bse.get_basis_family(basis_name)
     bse.get_family_notes(fam)
+
+
+@pytest.mark.parametrize('basis_name', bs_names_sample)
+def test_get_basis_elements_subset(basis_name):
+    """For a sample of basis sets, test that composing only some elements
+       gives the same data as composing everything
+    """
+    this_metadata = bs_metadata[basis_name]
+    latest = this_metadata['latest_version']
+    avail_elements = this_metadata['versions'][latest]['elements']
+    nelements = random.randint(1, len(avail_elements))
+    selected_elements = random.sample(avail_elements, nelements)
+
+    bs_full = bse.get_basis(basis_name)
+    bs_sub = bse.get_basis(basis_name, elements=selected_elements)
+
+    expected_elements = [k for k in bs_full['basis_set_elements'] if k in selected_elements]
+    assert list(bs_sub['basis_set_elements'].keys()) == expected_elements
+    for k, v in bs_sub['basis_set_elements'].items():
+        assert v == bs_full['basis_set_elements'][k]
+
+
+@pytest.mark.parametrize('basis_name', bs_names_sample)
+def test_get_basis_readonly(basis_name):
+    """For a sample of basis sets, test getting read-only basis sets
+    """
+    bs1 = bse.get_basis(basis_name, readonly=True)
+    bs2 = bse.get_basis(basis_name, readonly=True)
+
+    # Should be shared, and be the same as the regular data
+    assert bs1 is bs2
+    assert bse.misc.thaw(bs1) == bse.get_basis(basis_name)
+
+    with pytest.raises(TypeError):
+        bs1['basis_set_name'] = 'something'
+
+    # Manipulations and conversion work with read-only data
+    bs3 = bse.get_basis(basis_name, uncontract_general=True, readonly=True)
+    assert bse.misc.thaw(bs3) == bse.manip.uncontract_general(bs1)
+    assert bse.converters.convert_basis(bs1, 'json') == bse.get_basis(basis_name, fmt='json')
+
+
+@pytest.mark.parametrize('basis_name', bs_names_sample)
+def test_get_basis_deterministic(basis_name):
+    """For a sample of basis sets, test deterministic output and its etag
+    """
+    bs1 = bse.get_basis(basis_name, fmt='nwchem', deterministic=True)
+    assert 'Accessed' not in bs1
+    assert bs1 == bse.get_basis(basis_name, fmt='nwchem', deterministic=True)
+
+    etag = bse.get_basis_etag(basis_name, fmt='nwchem')
+    assert etag == bse.get_basis_etag(basis_name, fmt='NWCHEM')
+    assert etag != bse.get_basis_etag(basis_name, fmt='nwchem', header=False)
+    assert etag != bse.get_basis_etag(basis_name, fmt='nwchem', uncontract_general=True)
+    assert etag != bse.get_basis_etag(basis_name, fmt='gaussian94')
+    assert etag != bse.get_basis_etag(basis_name)
+
+
+def test_get_basis_etag_threads():
+    """Test computing etags (and the digests of files) from many threads at once
+    """
+    with bse.fileio._file_digests_lock:
+        bse.fileio._file_digests.clear()
+
+    with ThreadPoolExecutor(8) as executor:
+        etags = list(executor.map(bse.get_basis_etag, bs_names_sample * 4))
+
+    assert etags == [bse.get_basis_etag(x) for x in bs_names_sample * 4]
+
+
+@pytest.mark.parametrize('basis_name', bs_names_sample)
+def test_table_basis_files(basis_name):
+    """For a sample of basis sets, test that the files found for the etag are those used for composing
+    """
+    file_relpath = bs_metadata[basis_name]['versions'][bs_metadata[basis_name]['latest_version']]['file_relpath']
+    used_files = set()
+    bse.compose._compose_table_basis(file_relpath, data_dir, None, used_files)
+
+    files = bse.compose.table_basis_files(file_relpath, data_dir)
+    assert set(os.path.join(data_dir, x) for x in files) == used_files
+
+
+@pytest.mark.parametrize('basis_name', bs_names_sample)
+@pytest.mark.parametrize('use_executor', [False, True])
+def test_get_basis_many(basis_name, use_executor):
+    """For a sample of basis sets, test that a batch of requests gives the same results as get_basis
+    """
+    this_metadata = bs_metadata[basis_name]
+    all_elements = this_metadata['versions'][this_metadata['latest_version']]['elements']
+    role_basis = [bse.lookup_basis_by_role(basis_name, role) for role in this_metadata['auxiliaries']]
+
+    requests = [basis_name]
+    for fmt in bs_formats + [None]:
+        for elements in [None, random.sample(all_elements, min(3, len(all_elements)))]:
+            requests.append({'name': basis_name, 'elements': elements, 'fmt': fmt, 'deterministic': True})
+            requests.append({'name': basis_name, 'elements': elements, 'fmt': fmt, 'uncontract_spdf': True,
+                             'header': False})
+        requests.append({'name': basis_name, 'fmt': fmt, 'optimize_general': True, 'readonly': True})
+    requests += [{'name': x, 'fmt': 'nwchem', 'deterministic': True} for x in role_basis]
+
+    if use_executor:
+        with ThreadPoolExecutor(4) as executor:
+            results = bse.get_basis_many(requests, executor=executor)
+    else:
+        results = bse.get_basis_many(requests)
+
+    assert len(results) == len(requests)
+    for req, result in zip(requests, results):
+        if isinstance(req, str):
+            req = {'name': req}
+
+        expected = bse.get_basis(**req)
+        if req.get('fmt') is None:
+            assert isinstance(result, types.MappingProxyType) == bool(req.get('readonly'))
+            assert bse.misc.thaw(result) == bse.misc.thaw(expected)
+        elif req.get('deterministic') or not req.get('header', True):
+            assert result == expected
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='fork is not available')
+def test_get_basis_process_pool():
+    """Test using a process pool after the parent process has composed (and prefetched) a basis set
+    """
+    bse.memo.clear_all()
+    bse.get_basis('def2-tzvp')
+    assert bse.compose._prefetch_executor is not None
+
+    requests = ['sto-3g', {'name': 'def2-svp', 'readonly': True},
+                {'name': 'cc-pvdz', 'fmt': 'nwchem', 'elements': [1], 'deterministic': True}]
+    with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context('fork')) as executor:
+        results = bse.get_basis_many(requests, executor=executor)
+        nw = bse.get_basis('aug-cc-pvtz', fmt='nwchem', header=False, executor=executor)
+
+    assert results[0] == bse.get_basis('sto-3g')
+    assert bse.misc.thaw(results[1]) == bse.get_basis('def2-svp')
+    assert results[2] == bse.get_basis('cc-pvdz', fmt='nwchem', elements=[1], deterministic=True)
+    assert nw == bse.get_basis('aug-cc-pvtz', fmt='nwchem', header=False)
+
+
+def test_get_basis_many_errors():
+    """Test that bad requests to get_basis_many raise errors
+    """
+    with pytest.raises(KeyError, match='not_a_basis'):
+        bse.get_basis_many(['cc-pvdz', 'not_a_basis'])
+    with pytest.raises(RuntimeError, match='Unknown basis set format'):
+        bse.get_basis_many([{'name': 'cc-pvdz', 'fmt': 'not_a_format'}])
+    with pytest.raises(TypeError):
+        bse.get_basis_many([{'name': 'cc-pvdz', 'executor': None}])
+    assert bse.get_basis_many([]) == []
@@ -0,0 +1,85 @@
+"""
+Tests of reading data from a bundle file
+"""
+
+import pytest
+
+import basis_set_exchange as bse
+from basis_set_exchange import bundle, fileio
+
+from .common_testvars import data_dir, bs_names_sample, bs_formats, ref_formats
+
+
+@pytest.fixture(scope='module')
+def bundle_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('bundle') / 'bse_data.sqlite')
+    bundle.create_bundle(path, data_dir)
+    return path
+
+
+def test_bundle_backend(bundle_path, monkeypatch):
+    assert bundle.is_bundle(bundle_path)
+    assert fileio.data_backend(bundle_path) == 'bundle'
+    assert fileio.data_backend(data_dir) == 'directory'
+
+    # The header of the file is only read again if the file changes
+    opened = []
+
+    def _open(*args, **kwargs):
+        opened.append(args[0])
+        return open(*args, **kwargs)
+
+    monkeypatch.setattr(fileio, 'open', _open, raising=False)
+    assert fileio.data_backend(bundle_path) == 'bundle'
+    assert opened == []
+
+
+def test_bundle_metadata(bundle_path):
+    assert bse.get_metadata(bundle_path) == bse.get_metadata()
+    assert bse.get_reference_data(bundle_path) == bse.get_reference_data()
+
+
+@pytest.mark.parametrize('basis_name', bs_names_sample)
+@pytest.mark.parametrize('fmt', bs_formats)
+def test_bundle_get_basis(bundle_path, basis_name, fmt):
+    bs1 = bse.get_basis(basis_name, fmt=fmt, header=False)
+    bs2 = bse.get_basis(basis_name, fmt=fmt, header=False, data_dir=bundle_path)
+    assert bs1 == bs2
+
+    bs1 = bse.get_basis(basis_name, elements='H,Li', fmt=fmt, header=False)
+    bs2 = bse.get_basis(basis_name, elements='H,Li', fmt=fmt, header=False, data_dir=bundle_path)
+    assert bs1 == bs2
+
+
+@pytest.mark.parametrize('basis_name', bs_names_sample)
+@pytest.mark.parametrize('fmt', ref_formats)
+def test_bundle_references(bundle_path, basis_name, fmt):
+    ref1 = bse.get_references(basis_name, fmt=fmt)
+    ref2 = bse.get_references(basis_name, fmt=fmt, data_dir=bundle_path)
+    assert ref1 == ref2
+
+
+@pytest.mark.parametrize('basis_name', bs_names_sample)
+def test_bundle_notes(bundle_path, basis_name):
+    assert bse.get_basis_notes(basis_name) == bse.get_basis_notes(basis_name, data_dir=bundle_path)
+
+    fam = bse.get_basis_family(basis_name)
+    assert bse.get_family_notes(fam) == bse.get_family_notes(fam, data_dir=bundle_path)
+
+
+def test_bundle_read_elements(bundle_path):
+    js = bundle.read_json(bundle_path, 'dunning/cc-pVDZ.1.element.json', ['6', '1', '118'])
+    assert list(js['basis_set_elements'].keys()) == ['1', '6']
+
+
+def test_bundle_replaced(tmp_path):
+    '''Test that a bundle replaced on disk is not read through the old connection'''
+
+    path = str(tmp_path / 'bse_data.sqlite')
+    for content in ('first', 'second version'):
+        src_dir = tmp_path / content.replace(' ', '_')
+        src_dir.mkdir()
+        (src_dir / 'NOTES.test').write_text(content)
+
+        bundle.create_bundle(path, str(src_dir))
+        assert bundle.read_file(path, 'NOTES.test') == content
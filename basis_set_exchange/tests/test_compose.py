@@ -0,0 +1,160 @@
+"""
+Tests of composing basis sets, and of the caches shared between compositions
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from basis_set_exchange import compose, diskcache, fileio, memo, misc
+from .common_testvars import data_dir, bs_metadata, copy_basis_files
+
+
+def _element_relpath(basis_name, element):
+    '''Obtain the path to the elemental file used for an element of a basis set'''
+
+    file_relpath = bs_metadata[basis_name]['versions']['1']['file_relpath']
+    table_bs = fileio.read_data_basis(data_dir, file_relpath)
+    return table_bs['basis_set_elements'][element]['element_entry']
+
+
+def test_elemental_cache_subsets(monkeypatch):
+    '''Test that elements are taken from the cached elemental basis set of a file'''
+
+    el_relpath = _element_relpath('cc-pvdz', '6')
+    compose._elemental_cache.cache_clear()
+
+    bs_all = compose.compose_elemental_basis(el_relpath, data_dir, ['1', '6', '8'])
+    misses = compose._elemental_cache.cache_info()['misses']
+
+    used_files = set()
+    bs = compose.compose_elemental_basis(el_relpath, data_dir, ['6'], used_files)
+    assert compose._elemental_cache.cache_info()['misses'] == misses
+    assert list(bs['basis_set_elements']) == ['6']
+    assert bs['basis_set_elements']['6'] == bs_all['basis_set_elements']['6']
+
+    # Only the files used by the requested elements are reported
+    expected_files = set()
+    compose._compose_elemental_basis(el_relpath, data_dir, ['6'], expected_files)
+    assert used_files == expected_files
+
+    # Only other elements are composed, and each element has its own entry
+    composed = []
+    compose_elemental = compose._compose_elemental_basis
+
+    def _compose_elemental_basis(file_relpath, data_dir, elements, *args):
+        composed.append(sorted(elements))
+        return compose_elemental(file_relpath, data_dir, elements, *args)
+
+    monkeypatch.setattr(compose, '_compose_elemental_basis', _compose_elemental_basis)
+    compose.compose_elemental_basis(el_relpath, data_dir, ['2', '6'])
+    assert composed == [['2']]
+    misses = compose._elemental_cache.cache_info()['misses']
+    bs = compose.compose_elemental_basis(el_relpath, data_dir, ['8', '2', '1'])
+    assert compose._elemental_cache.cache_info()['misses'] == misses
+    assert compose._elemental_cache.cache_info()['entries'] == 4
+    assert list(bs['basis_set_elements']) == ['1', '2', '8']
+    monkeypatch.undo()
+
+    # All the elements of the file
+    bs = compose.compose_elemental_basis(el_relpath, data_dir)
+    assert bs == compose._compose_elemental_basis(el_relpath, data_dir, None, None)
+
+
+def test_shared_compose_cache(tmp_path, monkeypatch):
+    '''Test the caches of data files and elemental basis sets shared between compositions'''
+
+    new_data_dir = str(tmp_path / 'data')
+    monkeypatch.setattr(diskcache, 'cache_dir', None)
+
+    file_relpath = copy_basis_files('sto-3g', new_data_dir)
+    table_bs = fileio.read_data_basis(new_data_dir, file_relpath)
+    el_relpath = table_bs['basis_set_elements']['1']['element_entry']
+
+    bs1 = compose.compose_elemental_basis(el_relpath, new_data_dir)
+    misses = compose._elemental_cache.cache_info()['misses']
+
+    # Returned data is a copy
+    bs1['basis_set_elements']['1']['element_electron_shells'].clear()
+    bs2 = compose.compose_elemental_basis(el_relpath, new_data_dir)
+    assert bs2['basis_set_elements']['1']['element_electron_shells']
+    assert compose._elemental_cache.cache_info()['misses'] == misses
+
+    # Changing a component file causes the basis to be composed again
+    el_bs = fileio.read_data_basis(new_data_dir, el_relpath)
+    component_path = os.path.join(new_data_dir, el_bs['basis_set_elements']['1']['element_components'][0])
+    with open(component_path, 'r') as f:
+        component = json.load(f)
+    component['basis_set_elements']['1']['element_electron_shells'][0]['shell_exponents'][0] = '1.0'
+    with open(component_path, 'w') as f:
+        json.dump(component, f)
+
+    bs3 = compose.compose_elemental_basis(el_relpath, new_data_dir)
+    assert bs3['basis_set_elements']['1']['element_electron_shells'][0]['shell_exponents'][0] == '1.0'
+
+
+@pytest.mark.parametrize('basis_name', ['cc-pvdz', 'aug-cc-pvtz'])
+def test_prefetch_files(basis_name, tmp_path, monkeypatch):
+    '''Test reading the files of a table basis concurrently before composing it'''
+
+    new_data_dir = str(tmp_path / 'data')
+    monkeypatch.setattr(diskcache, 'cache_dir', None)
+    file_relpath = copy_basis_files(basis_name, new_data_dir)
+
+    monkeypatch.setattr(compose, 'prefetch_threads', 0)
+    bs1 = compose.compose_table_basis(file_relpath, new_data_dir)
+
+    # Record the threads that read each file
+    read_threads = {}
+    read_json_basis = fileio.read_json_basis
+
+    def _read_json_basis(file_path):
+        read_threads[file_path] = threading.current_thread()
+        return read_json_basis(file_path)
+
+    monkeypatch.setattr(fileio, 'read_json_basis', _read_json_basis)
+    monkeypatch.setattr(compose, 'prefetch_threads', 4)
+    compose._file_cache.cache_clear()
+    compose._elemental_cache.cache_clear()
+
+    used_files = set()
+    bs2 = compose._compose_table_basis(file_relpath, new_data_dir, None, used_files)
+    assert misc.thaw(bs2) == bs1
+
+    # Each file is read once, and all but the table file are read by other threads
+    assert set(read_threads) == used_files
+    main_reads = [k for k, v in read_threads.items() if v is threading.current_thread()]
+    assert main_reads == [os.path.join(new_data_dir, file_relpath)]
+
+    # Files are read in a pool of threads that is shared by all compositions
+    executor = compose._get_prefetch_executor()
+    assert all(v.name.startswith('bse-prefetch') for k, v in read_threads.items() if k not in main_reads)
+    compose._file_cache.cache_clear()
+    compose._compose_table_basis(file_relpath, new_data_dir, None, set())
+    assert compose._get_prefetch_executor() is executor
+
+
+def _compose_uncached(file_relpath):
+    '''Compose a table basis without using the caches of files and elemental basis sets'''
+
+    compose._file_cache.cache_clear()
+    compose._elemental_cache.cache_clear()
+    return misc.thaw(compose._compose_table_basis(file_relpath, data_dir, None, set()))
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='fork is not available')
+def test_prefetch_files_fork():
+    '''Test prefetching files in a process forked after the pool of threads was created'''
+
+    file_relpath = bs_metadata['def2-tzvp']['versions']['1']['file_relpath']
+
+    memo.clear_all()
+    ref = _compose_uncached(file_relpath)
+    assert compose._prefetch_executor is not None
+
+    # The pool terminates the child when leaving the block, even if it is stuck
+    with multiprocessing.get_context('fork').Pool(1) as pool:
+        assert pool.apply_async(_compose_uncached, (file_relpath, )).get(60) == ref
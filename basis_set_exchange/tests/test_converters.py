@@ -2,13 +2,15 @@
 Tests for the BSE main API
 """
 
+import io
 import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import basis_set_exchange as bse
 import pytest
 
 from basis_set_exchange import lut
-from .common_testvars import bs_formats, ref_formats
+from .common_testvars import bs_formats, ref_formats, bs_names_sample
 
 
 @pytest.mark.parametrize('fmt', bs_formats)
@@ -23,3 +25,86 @@ def test_get_refformat_extensions(fmt):
     """For all basis set formats, get the extension
     """
     bse.refconverters.get_format_extension(fmt)
+
+
+@pytest.mark.parametrize('executor_type', [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_convert_parallel(executor_type):
+    """Test that converting elements in parallel gives the same result
+    """
+    with executor_type(2) as executor:
+        for basis_name in bs_names_sample[:4]:
+            for fmt in [None] + bs_formats:
+                ref = bse.get_basis(basis_name, fmt=fmt, uncontract_general=True, header=False)
+                data = bse.get_basis(basis_name, fmt=fmt, uncontract_general=True, header=False, executor=executor)
+                assert data == ref
+
+
+@pytest.mark.parametrize('fmt', bs_formats)
+def test_convert_stream(fmt):
+    """Test that streaming a basis set gives the same result as get_basis
+    """
+    for basis_name in bs_names_sample[:4]:
+        ref = bse.get_basis(basis_name, fmt=fmt, optimize_general=True, header=False)
+
+        chunks = list(bse.get_basis_stream(basis_name, fmt, optimize_general=True, header=False))
+        assert len(chunks) > 1
+        assert ''.join(chunks) == ref
+
+        out = io.StringIO()
+        bse.get_basis_stream(basis_name, fmt, out, optimize_general=True, header=False)
+        assert out.getvalue() == ref
+
+
+def test_convert_stream_lazy(monkeypatch):
+    """Test that streaming a basis set only transforms elements as they are needed
+    """
+    transformed = []
+    transform_basis = bse.manip.transform_basis
+
+    def _transform_basis(basis, *args, **kwargs):
+        transformed.extend(basis['basis_set_elements'])
+        return transform_basis(basis, *args, **kwargs)
+
+    monkeypatch.setattr(bse.manip, 'transform_basis', _transform_basis)
+
+    chunks = bse.get_basis_stream('aug-cc-pvtz', 'nwchem', make_general=True, header=False)
+    next(chunks)  # Beginning of the electron basis
+    next(chunks)
+    assert transformed == ['1']
+
+    rest = ''.join(chunks)
+    assert len(transformed) > 1
+    assert 'END' in rest
+
+
+def test_convert_stream_badformat():
+    """Test that an unknown format raises an exception before streaming starts
+    """
+    with pytest.raises(RuntimeError, match=r'Unknown basis set format'):
+        bse.get_basis_stream('cc-pvdz', 'not_a_format')
+
+
+@pytest.mark.parametrize('fmt', [x for x in bs_formats if bse.converters.has_element_blocks(x)])
+def test_convert_element_cache(fmt):
+    """Test that output assembled from cached elements is the same as converting the whole basis
+    """
+    for basis_name in bs_names_sample[:4]:
+        bs = bse.get_basis(basis_name, optimize_general=True)
+        ref = bse.converters.convert_basis(bs, fmt)
+
+        # Fill the cache with some of the elements first
+        elements = list(bs['basis_set_elements'].keys())
+        bse.get_basis(basis_name, elements=elements[::2], fmt=fmt, optimize_general=True, header=False)
+        data = bse.get_basis(basis_name, fmt=fmt, optimize_general=True, header=False)
+        assert data == ref
+
+
+def test_convert_element_cache_format_case():
+    """Test that the cached elements are shared by different spellings of a format
+    """
+    bse.memo.clear_all()
+    ref = bse.get_basis('cc-pvdz', elements=[1, 6], fmt='nwchem', header=False)
+    entries = bse.memo.get_stats()['basis_set_exchange.api._convert_element']['entries']
+
+    assert bse.get_basis('cc-pvdz', elements=[1, 6], fmt='NWChem', header=False) == ref
+    assert bse.memo.get_stats()['basis_set_exchange.api._convert_element']['entries'] == entries
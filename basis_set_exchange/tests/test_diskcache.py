@@ -0,0 +1,37 @@
+"""
+Tests of the on-disk cache of composed basis sets
+"""
+
+import os
+
+from basis_set_exchange import compose, diskcache, memo
+from .common_testvars import copy_basis_files
+
+
+def test_diskcache(tmp_path, monkeypatch):
+    '''Test reading, writing, and invalidating disk cache entries'''
+
+    new_data_dir = str(tmp_path / 'data')
+    monkeypatch.setattr(diskcache, 'cache_dir', str(tmp_path / 'cache'))
+    monkeypatch.setattr(memo, 'memoize_enabled', False)
+
+    file_relpath = copy_basis_files('sto-3g', new_data_dir)
+    bs1 = compose.compose_table_basis(file_relpath, new_data_dir)
+    assert len(os.listdir(diskcache.cache_dir)) == 1
+
+    cache_key = ('compose_table_basis', os.path.abspath(new_data_dir), file_relpath, None)
+    assert diskcache.read_entry(cache_key) == bs1
+
+    # Changing a file invalidates the entry
+    meta_path = os.path.join(new_data_dir, 'STO-3G.metadata.json')
+    with open(meta_path, 'a') as f:
+        f.write('\n')
+    assert diskcache.read_entry(cache_key) is None
+
+    # Entry is rewritten
+    bs2 = compose.compose_table_basis(file_relpath, new_data_dir)
+    assert bs2 == bs1
+    assert diskcache.read_entry(cache_key) == bs1
+
+    diskcache.clear()
+    assert len(os.listdir(diskcache.cache_dir)) == 0
@@ -0,0 +1,64 @@
+"""
+Tests of exporting the whole library to files
+"""
+
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import basis_set_exchange as bse
+from basis_set_exchange import compose, export
+from .common_testvars import data_dir, bs_metadata
+
+_export_names = ['sto-3g', '3-21g']
+
+
+def _make_data_dir(new_data_dir):
+    '''Create a data directory containing only a few basis sets'''
+
+    os.makedirs(new_data_dir)
+    for name in _export_names:
+        for ver_data in bs_metadata[name]['versions'].values():
+            for f in compose.table_basis_files(ver_data['file_relpath'], data_dir):
+                new_path = os.path.join(new_data_dir, f)
+                os.makedirs(os.path.dirname(new_path), exist_ok=True)
+                shutil.copy(os.path.join(data_dir, f), new_path)
+
+    shutil.copy(os.path.join(data_dir, 'REFERENCES.json'), new_data_dir)
+    with open(os.path.join(new_data_dir, 'METADATA.json'), 'w') as f:
+        json.dump({k: bs_metadata[k] for k in _export_names}, f)
+
+
+def test_export(tmp_path):
+    '''Test exporting, and re-exporting only what has changed'''
+
+    new_data_dir = str(tmp_path / 'data')
+    dest_dir = str(tmp_path / 'export')
+    _make_data_dir(new_data_dir)
+
+    nversions = sum(len(bs_metadata[k]['versions']) for k in _export_names)
+
+    with ThreadPoolExecutor(2) as executor:
+        stats = export.export_library(dest_dir, ['nwchem', 'json'], ['bib'], new_data_dir, executor)
+    assert stats == {'written': 3 * nversions, 'skipped': 0}
+
+    with open(os.path.join(dest_dir, 'nwchem', 'sto-3g.1.nw')) as f:
+        assert f.read() == bse.get_basis('sto-3g', version=1, fmt='nwchem', data_dir=new_data_dir, deterministic=True)
+    with open(os.path.join(dest_dir, 'references', 'bib', 'sto-3g.1.bib')) as f:
+        assert f.read() == bse.get_references('sto-3g', version=1, fmt='bib', data_dir=new_data_dir)
+
+    stats = export.export_library(dest_dir, ['nwchem', 'json'], ['bib'], new_data_dir)
+    assert stats == {'written': 0, 'skipped': 3 * nversions}
+
+    # Changing the data of a basis set only rewrites its files
+    meta_path = os.path.join(new_data_dir, 'STO-3G.metadata.json')
+    with open(meta_path, 'a') as f:
+        f.write('\n')
+    nsto3g = len(bs_metadata['sto-3g']['versions'])
+
+    stats = export.export_library(dest_dir, ['nwchem', 'json'], ['bib'], new_data_dir)
+    assert stats == {'written': 3 * nsto3g, 'skipped': 3 * (nversions - nsto3g)}
+
+    stats = export.export_library(dest_dir, ['nwchem'], data_dir=new_data_dir, incremental=False)
+    assert stats == {'written': nversions, 'skipped': 0}
@@ -0,0 +1,88 @@
+"""
+Tests of basis set manipulations
+"""
+
+import pytest
+
+from basis_set_exchange import api, manip, misc
+from .common_testvars import bs_names_sample
+
+# yapf: disable
+_transform_lists = [
+    ['optimize_general', 'uncontract_general', 'uncontract_spdf', 'uncontract_segmented', 'make_general'],
+    ['uncontract_general', ('uncontract_spdf', 1), 'sort_basis'],
+    ['make_general', 'optimize_general', 'sort_basis'],
+    ['uncontract_segmented', 'prune_basis']
+]
+# yapf: enable
+
+
+@pytest.mark.parametrize('basis_name', bs_names_sample)
+@pytest.mark.parametrize('transforms', _transform_lists)
+def test_transform_basis(basis_name, transforms):
+    """Test that applying transforms together is the same as applying them one at a time
+    """
+    basis = api.get_basis(basis_name, readonly=True)
+
+    expected = basis
+    for t in transforms:
+        name, args = (t, ()) if isinstance(t, str) else (t[0], t[1:])
+        expected = getattr(manip, name)(expected, *args)
+
+    assert manip.transform_basis(basis, transforms) == expected
+
+    # In place
+    basis = misc.thaw(basis)
+    assert manip.transform_basis(basis, transforms, inplace=True) is basis
+    assert basis == expected
+
+
+def test_transform_basis_unknown():
+    """Test using a transform that doesn't exist
+    """
+    basis = api.get_basis('6-31g')
+    with pytest.raises(RuntimeError, match=r'Unknown basis set transform'):
+        manip.transform_basis(basis, ['uncontract_general', 'not_a_transform'])
+
+
+def test_prune_duplicates():
+    """Test removing duplicate shells, including shells with keys in a different order
+    """
+    sh1 = {
+        'shell_angular_momentum': [0],
+        'shell_exponents': ['1.0', '2.0'],
+        'shell_coefficients': [['0.5', '0.0']]
+    }
+    sh2 = {'shell_angular_momentum': [0], 'shell_exponents': ['1.0'], 'shell_coefficients': [['0.5']]}
+    sh3 = {'shell_coefficients': [['0.5']], 'shell_exponents': ['1.0'], 'shell_angular_momentum': [1]}
+    sh4 = {'shell_coefficients': [['0.5']], 'shell_exponents': ['1.0'], 'shell_angular_momentum': [0]}
+
+    basis = {'basis_set_elements': {'1': {'element_electron_shells': [sh1, sh2, sh3, sh4]}}}
+    pruned = manip.prune_basis(basis)
+    assert pruned['basis_set_elements']['1']['element_electron_shells'] == [sh2, sh3]
+
+
+def test_optimize_general():
+    """Test splitting a general contraction into blocks
+    """
+    shell = {
+        'shell_function_type': 'gto',
+        'shell_harmonic_type': 'spherical',
+        'shell_region': '',
+        'shell_angular_momentum': [0],
+        'shell_exponents': ['4.0', '3.0', '2.0', '1.0'],
+        'shell_coefficients': [['0.1', '0.2', '0.0', '0.0'], ['0.0', '0.0', '0.0', '1.0'],
+                               ['0.0', '0.3', '0.4', '0.0']]
+    }
+
+    basis = {'basis_set_elements': {'1': {'element_electron_shells': [shell]}}}
+    opt = manip.optimize_general(basis)
+
+    block = dict(shell)
+    block['shell_exponents'] = ['4.0', '3.0', '2.0']
+    block['shell_coefficients'] = [['0.1', '0.2', '0.0'], ['0.0', '0.3', '0.4']]
+    single = dict(shell)
+    single['shell_exponents'] = ['1.0']
+    single['shell_coefficients'] = [['1.0000000']]
+
+    assert opt['basis_set_elements']['1']['element_electron_shells'] == [block, single]
@@ -0,0 +1,62 @@
+"""
+Tests of reading data from a memory-mapped library
+"""
+
+import pytest
+
+import basis_set_exchange as bse
+from basis_set_exchange import mapped
+
+from .common_testvars import data_dir, bs_names_sample, bs_formats, ref_formats
+
+
+@pytest.fixture(scope='module')
+def library_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('mapped') / 'bse_data.map')
+    mapped.create_mapped_library(path, data_dir)
+    return path
+
+
+def test_mapped_metadata(library_path):
+    assert mapped.is_mapped(library_path)
+    assert not bse.bundle.is_bundle(library_path)
+    assert bse.get_metadata(library_path) == bse.get_metadata()
+    assert bse.get_reference_data(library_path) == bse.get_reference_data()
+
+
+@pytest.mark.parametrize('basis_name', bs_names_sample)
+@pytest.mark.parametrize('fmt', bs_formats + [None])
+def test_mapped_get_basis(library_path, basis_name, fmt):
+    bs1 = bse.get_basis(basis_name, fmt=fmt, header=False)
+    bs2 = bse.get_basis(basis_name, fmt=fmt, header=False, data_dir=library_path)
+    assert bs1 == bs2
+
+    bs1 = bse.get_basis(basis_name, elements='H,Li', fmt=fmt, header=False)
+    bs2 = bse.get_basis(basis_name, elements='H,Li', fmt=fmt, header=False, data_dir=library_path)
+    assert bs1 == bs2
+
+
+@pytest.mark.parametrize('basis_name', bs_names_sample)
+@pytest.mark.parametrize('fmt', ref_formats)
+def test_mapped_references(library_path, basis_name, fmt):
+    ref1 = bse.get_references(basis_name, fmt=fmt)
+    ref2 = bse.get_references(basis_name, fmt=fmt, data_dir=library_path)
+    assert ref1 == ref2
+
+
+@pytest.mark.parametrize('basis_name', bs_names_sample)
+def test_mapped_notes(library_path, basis_name):
+    assert bse.get_basis_notes(basis_name) == bse.get_basis_notes(basis_name, data_dir=library_path)
+
+    fam = bse.get_basis_family(basis_name)
+    assert bse.get_family_notes(fam) == bse.get_family_notes(fam, data_dir=library_path)
+
+
+def test_mapped_get_basis_many(library_path):
+    requests = [{
+        'name': x,
+        'fmt': fmt,
+        'elements': 'H,Li',
+        'header': False
+    } for x in bs_names_sample for fmt in ['nwchem', None]]
+    assert bse.get_basis_many(requests, data_dir=library_path) == bse.get_basis_many(requests)
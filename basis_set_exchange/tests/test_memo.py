@@ -0,0 +1,249 @@
+"""
+Tests of BSE memoization
+"""
+
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import basis_set_exchange as bse
+from basis_set_exchange import memo
+
+
+def _make_memoized():
+    calls = []
+
+    @memo.BSEMemoize
+    def f(x):
+        calls.append(x)
+        return [x] * 10
+
+    return f, calls
+
+
+def test_memo_lru_entries():
+    '''Test eviction of the least-recently-used entries'''
+    f, calls = _make_memoized()
+    f.max_entries = 2
+
+    f(1)
+    f(2)
+    f(1)  # 1 is now most recently used
+    f(3)  # evicts 2
+    f(1)
+    f(2)
+
+    assert calls == [1, 2, 3, 2]
+    info = f.cache_info()
+    assert info['hits'] == 2
+    assert info['misses'] == 4
+    assert info['evictions'] == 2
+    assert info['entries'] == 2
+
+
+def test_memo_lru_bytes():
+    '''Test limiting the size of the cache'''
+    f, calls = _make_memoized()
+    nbytes = len(pickle.dumps(f.__wrapped__(1)))
+    f.max_bytes = 2 * nbytes
+
+    for x in range(5):
+        f(x)
+
+    info = f.cache_info()
+    assert info['entries'] == 2
+    assert info['bytes'] == 2 * nbytes
+    assert info['evictions'] == 3
+
+    # Too large to store at all
+    f.max_bytes = nbytes - 1
+    f(100)
+    f(100)
+    assert calls.count(100) == 2
+
+
+def test_memo_readonly_bytes():
+    '''Test that frozen copies of results are counted in the size of the cache'''
+    f, calls = _make_memoized()
+    nbytes = len(pickle.dumps([1] * 10))
+
+    f(1)
+    assert f.cache_info()['bytes'] == nbytes
+    assert f.readonly(1) == (1, ) * 10
+    assert f.cache_info()['bytes'] == 2 * nbytes
+
+    # Evicted (along with its frozen copy) to make room for another entry
+    f.max_bytes = 2 * nbytes + 1
+    f(2)
+    assert f.cache_info()['entries'] == 1
+    assert f.cache_info()['bytes'] == nbytes
+
+    f.invalidate(2)
+    assert f.cache_info()['bytes'] == 0
+
+
+def test_memo_invalidate():
+    '''Test removing entries from the cache'''
+    f, calls = _make_memoized()
+
+    r1 = f(1)
+    r1.append(2)
+    assert f(1) == [1] * 10
+
+    f.invalidate(1)
+    f(1)
+    assert calls == [1, 1]
+
+    f.cache_clear()
+    assert f.cache_info() == {'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0, 'bytes': 0}
+
+    f(1)
+    memo.clear_all()
+    assert f.cache_info()['entries'] == 0
+    assert 'basis_set_exchange.compose.compose_table_basis' in memo.get_stats()
+
+
+def test_memo_lookup_store():
+    '''Test looking up and storing results without calling the function'''
+    f, calls = _make_memoized()
+    nbytes = len(pickle.dumps([1] * 10))
+
+    assert f.lookup(1) is None
+    f.store([1] * 10, 1)
+    f.store([1] * 10, 1)  # replaces the existing entry
+    assert f.lookup(1) == [1] * 10
+    assert f(1) == [1] * 10
+    assert calls == []
+
+    info = f.cache_info()
+    assert info['hits'] == 2
+    assert info['misses'] == 1
+    assert info['entries'] == 1
+    assert info['bytes'] == nbytes
+
+
+def test_shared_cache(monkeypatch):
+    '''Test the LRU cache of shared data'''
+    c = memo.BSESharedCache(__name__, 'test_cache')
+    c.max_entries = 2
+
+    value = [1, 2, 3]
+    assert c.get(1) is None
+    c.put(1, value)
+    c.put(2, [2])
+    assert c.get(1) is value  # not copied
+    c.put(3, [3])  # evicts 2
+    assert c.get(2) is None
+    nbytes = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)) + len(pickle.dumps([3], pickle.HIGHEST_PROTOCOL))
+    assert c.cache_info() == {'hits': 1, 'misses': 2, 'evictions': 1, 'entries': 2, 'bytes': nbytes}
+
+    # Limit by the (given) sizes of the entries
+    c.max_entries = None
+    c.max_bytes = 100
+    c.put(4, [4], 60)
+    assert c.cache_info()['entries'] == 3
+    c.put(5, [5], 60)  # evicts 1, 3, and 4
+    c.put(6, [6], 101)  # too big
+    assert c.get(1) is None and c.get(4) is None and c.get(6) is None
+    assert c.get(5) == [5]
+    assert c.cache_info()['bytes'] == 60
+
+    monkeypatch.setattr(memo, 'memoize_enabled', False)
+    c.put(4, [4])
+    assert c.get(1) is None
+    monkeypatch.setattr(memo, 'memoize_enabled', True)
+    assert c.get(4) is None
+
+    memo.clear_all()
+    assert c.cache_info()['entries'] == 0
+    memo._all_memoized.remove(c)
+
+
+def test_memo_single_flight(monkeypatch):
+    '''Test that concurrent calls with the same arguments only call the function once'''
+
+    calls = []
+    lock = threading.Lock()
+    waiting = []
+    all_waiting = threading.Event()
+
+    class _CountingEvent(threading.Event):
+        '''Sets all_waiting once the other 7 calls are waiting for the result'''
+
+        def wait(self, timeout=None):
+            with lock:
+                waiting.append(threading.current_thread())
+                if len(waiting) == 7:
+                    all_waiting.set()
+            return super().wait(timeout)
+
+    class _InFlightCall(memo._InFlightCall):
+        def __init__(self):
+            super().__init__()
+            self.done = _CountingEvent()
+
+    monkeypatch.setattr(memo, '_InFlightCall', _InFlightCall)
+
+    @memo.BSEMemoize
+    def f(x):
+        calls.append(x)
+
+        # Only finish once all the other calls are waiting for this one
+        all_waiting.wait(10)
+        if x < 0:
+            raise ValueError('negative')
+        return [x] * 10
+
+    for x in (1, -1):
+        with ThreadPoolExecutor(8) as executor:
+            futures = [executor.submit(f, x) for _ in range(8)]
+
+        assert all_waiting.is_set()
+        if x > 0:
+            results = [fut.result() for fut in futures]
+            assert all(r == [1] * 10 for r in results)
+            assert len(set(id(r) for r in results)) == 8  # each caller has its own copy
+        else:
+            for fut in futures:
+                with pytest.raises(ValueError, match='negative'):
+                    fut.result()
+
+        assert calls == [x]
+        calls.clear()
+        waiting.clear()
+        all_waiting.clear()
+        f.cache_clear()
+
+
+def test_memo_call_with():
+    '''Test computing results with a different function'''
+    f, calls = _make_memoized()
+
+    assert f.call_with(lambda: [1] * 10, 1) == [1] * 10
+    assert f(1) == [1] * 10
+    assert f.readonly_with(lambda: None, 1) == (1, ) * 10
+    assert calls == []
+
+    # The caller that computes the result also gets a copy
+    shared = [2] * 10
+    r = f.call_with(lambda: shared, 2)
+    assert r == shared and r is not shared
+
+
+def test_memo_concurrent_get_basis():
+    '''Test obtaining the same basis set from many threads at once'''
+
+    memo.clear_all()
+    args = [('def2-tzvp', None), ('def2-tzvp', 'nwchem'), ('cc-pvtz', 'gaussian94')]
+
+    with ThreadPoolExecutor(8) as executor:
+        futures = [
+            executor.submit(bse.get_basis, name, fmt=fmt, uncontract_spdf=True, deterministic=True)
+            for name, fmt in args * 8
+        ]
+        results = [fut.result() for fut in futures]
+
+    for i, (name, fmt) in enumerate(args * 8):
+        assert results[i] == bse.get_basis(name, fmt=fmt, uncontract_spdf=True, deterministic=True)
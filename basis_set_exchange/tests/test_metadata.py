@@ -8,7 +8,7 @@ import os
 import pytest
 import glob
 
-from basis_set_exchange import api, curate, fileio
+from basis_set_exchange import api, curate, fileio, misc
 from .common_testvars import data_dir, all_table_files, all_metadata_files
 
 
@@ -18,6 +18,26 @@ def test_get_metadata():
     api.get_metadata(data_dir)
 
 
+def test_metadata_index():
+    '''Test the read-only metadata index against the full metadata'''
+
+    md = api.get_metadata(data_dir)
+    md_index = api._get_metadata_index(data_dir)
+
+    assert list(md_index.keys()) == list(md.keys())
+    assert md_index is api._get_metadata_index(data_dir)
+
+    for k, v in md.items():
+        assert misc.thaw(md_index[k]) == v
+        assert md_index.get_basis(v['display_name']) is md_index[k]
+
+    rec = md_index['6-31g']
+    with pytest.raises(TypeError):
+        rec['family'] = 'something'
+    with pytest.raises(TypeError):
+        rec['versions']['0']['elements'][0] = '2'
+
+
 def test_metadata_uptodate():
     '''Tests that the METADATA.json file is up to date'''
 
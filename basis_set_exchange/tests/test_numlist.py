@@ -0,0 +1,57 @@
+"""
+Tests of lists of numbers stored as strings
+"""
+
+import copy
+import json
+import pickle
+
+from basis_set_exchange import numlist
+
+
+def test_number_list():
+    """Test that a NumberList behaves as a list of the strings
+    """
+    nl = numlist.NumberList(['1.0E+01', '0.0000000', '-3.5', '2.25'])
+    assert nl == ['1.0E+01', '0.0000000', '-3.5', '2.25']
+    assert json.dumps(nl) == json.dumps(list(nl))
+    assert list(nl.values) == [10.0, 0.0, -3.5, 2.25]
+    assert list(numlist.values(nl)) == numlist.values(list(nl))
+
+    for nl2 in (pickle.loads(pickle.dumps(nl)), copy.deepcopy(nl)):
+        assert isinstance(nl2, numlist.NumberList)
+        assert nl2 == nl
+        assert nl2.values == nl.values
+
+
+def test_select():
+    """Test selecting numbers from plain lists and NumberLists
+    """
+    numbers = ['1.0', '2.0', '3.0', '4.0']
+    assert numlist.select(numbers, [3, 0]) == ['4.0', '1.0']
+
+    nl = numlist.NumberList(numbers)
+    sel = numlist.select(nl, [3, 0])
+    assert isinstance(sel, numlist.NumberList)
+    assert sel == ['4.0', '1.0']
+    assert list(sel.values) == [4.0, 1.0]
+
+
+def test_shell_conversion():
+    """Test converting shells to and from NumberLists
+    """
+    shell = {
+        'shell_angular_momentum': [0],
+        'shell_exponents': ['1.0', '2.0'],
+        'shell_coefficients': [['0.5', '0.5'], ['1.0', '0.0']]
+    }
+
+    nl_shell = numlist.shell_to_number_lists(shell)
+    assert nl_shell == shell
+    assert isinstance(nl_shell['shell_exponents'], numlist.NumberList)
+    assert all(isinstance(x, numlist.NumberList) for x in nl_shell['shell_coefficients'])
+
+    plain_shell = numlist.shell_to_lists(nl_shell)
+    assert plain_shell == shell
+    assert type(plain_shell['shell_exponents']) is list
+    assert all(type(x) is list for x in plain_shell['shell_coefficients'])
@@ -2,13 +2,14 @@
 Tests for reference handling
 """
 
+import copy
 import glob
 import json
 import os
 import pytest
 
-from basis_set_exchange import api, validator, fileio
-from .common_testvars import data_dir, all_component_files
+from basis_set_exchange import api, compose, validator, fileio, references
+from .common_testvars import data_dir, all_component_files, bs_names, bs_metadata
 
 
 @pytest.mark.parametrize('file_path', all_component_files)
@@ -41,3 +42,52 @@ def test_valid_reffile():
     '''
     full_path = os.path.join(data_dir, "REFERENCES.json")
     validator.validate_file('references', full_path)
+
+
+@pytest.mark.parametrize('file_path', all_component_files)
+def test_read_reference_keys(file_path):
+    '''
+    Test reading only the description and references of component files
+    '''
+    keys = ('basis_set_description', 'basis_set_references')
+    js = fileio.read_json_basis(os.path.join(data_dir, file_path))
+    assert fileio.read_data_basis_keys(data_dir, file_path, keys) == {k: js[k] for k in keys}
+
+
+@pytest.mark.parametrize('basis_name', bs_names)
+def test_compose_references(basis_name):
+    '''
+    Test that composing only the references gives the same as composing the whole basis
+    '''
+    ref_data = api.get_reference_data()
+    for ver, ver_data in bs_metadata[basis_name]['versions'].items():
+        file_relpath = ver_data['file_relpath']
+        refs = compose.compose_table_references(file_relpath, data_dir)
+        basis = compose.compose_table_basis(file_relpath, data_dir)
+
+        assert list(refs['basis_set_elements'].keys()) == list(basis['basis_set_elements'].keys())
+        assert references.compact_references(refs, ref_data) == references.compact_references(basis, ref_data)
+
+
+@pytest.mark.parametrize('basis_name', ['def2-universal-jkfit', '6-31g*', 'lanl2dz'])
+def test_compact_references(basis_name):
+    '''
+    Test grouping elements by their references
+    '''
+    basis = api.get_basis(basis_name)
+    el_refs = {k: copy.deepcopy(v['element_references']) for k, v in basis['basis_set_elements'].items()}
+    ref_data = api.get_reference_data()
+    compacted = references.compact_references(basis, ref_data)
+
+    # Input is not modified
+    assert el_refs == {k: v['element_references'] for k, v in basis['basis_set_elements'].items()}
+
+    # Each element is in exactly one group, with its own references
+    all_elements = [el for x in compacted for el in x['elements']]
+    assert sorted(all_elements) == sorted(el_refs.keys())
+
+    for x in compacted:
+        for el in x['elements']:
+            assert [{k: v for k, v in r.items() if k != 'reference_data'} for r in x['reference_info']] == el_refs[el]
+        for r in x['reference_info']:
+            assert list(r['reference_data'].keys()) == r['reference_keys']